@@ -0,0 +1,501 @@
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent import futures
+
+try:
+    import resource  # Peak memory; not available on Windows
+except ImportError:
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PDF_MANAGER = os.path.join(HERE, "PDF MANGER.py")
+IMAGE_CONVERTER = os.path.join(HERE, "PDF MANAGER 2.py")
+
+
+# --- Synthetic inputs ---
+# Written directly, without PyPDF2 or PIL, so generating them costs little
+# and does not depend on the code being measured.
+
+
+def _write_raw_pdf(path, objects):
+    """
+    Writes a PDF whose objects are numbered from 1 in iteration order.
+    Object 1 must be the catalog. Objects are bytes, or (dictionary,
+    stream data) pairs.
+    """
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for obj_id, data in enumerate(objects, 1):
+            offsets.append(f.tell())
+            if isinstance(data, tuple):
+                data = data[0] + b"\nstream\n" + data[1] + b"\nendstream"
+            f.write(b"%d 0 obj\n" % obj_id + data + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        f.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                % (len(offsets) + 1, xref_offset))
+
+
+def _write_png(path, width, height, rows, color_type=0):
+    """Writes an 8-bit PNG from raw rows (gray for color_type 0, RGB for 2)."""
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data)))
+
+    data = b"".join(b"\x00" + row for row in rows)  # Filter type 0 on every row
+    with open(path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n"
+                + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(data, 1)) + chunk(b"IEND", b""))
+
+
+def _write_tiny_inputs(folder):
+    """Writes a one-page PDF and a small PNG without importing PyPDF2 or PIL."""
+    pdf_path = os.path.join(folder, "tiny.pdf")
+    _write_raw_pdf(pdf_path, [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << >> >>"])
+    png_path = os.path.join(folder, "tiny.png")
+    _write_png(png_path, 8, 8, [b"\x80" * 8] * 8)  # 8x8 mid-gray
+    return pdf_path, png_path
+
+
+# Pixel size of the image on every page of the synthetic PDFs with images.
+SYNTHETIC_IMAGE_SIDE = 64
+
+
+def write_synthetic_pdf(path, pages, images=False):
+    """
+    Writes a PDF of `pages` letter-size pages, each with a line of text.
+    With images=True every page also shows its own
+    SYNTHETIC_IMAGE_SIDE-square RGB image (Flate encoded), so no two
+    pages share an image.
+    """
+    stride = 3 if images else 2  # Objects per page
+    kids = b" ".join(b"%d 0 R" % (4 + i * stride) for i in range(pages))
+
+    def objects():
+        yield b"<< /Type /Catalog /Pages 2 0 R >>"
+        yield b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+        yield b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+        side = SYNTHETIC_IMAGE_SIDE
+        for i in range(pages):
+            page_id = 4 + i * stride
+            content = b"BT /F1 24 Tf 72 720 Td (Synthetic page %d) Tj ET" % (i + 1)
+            resources = b"/Font << /F1 3 0 R >>"
+            if images:
+                content += b" q 216 0 0 216 72 432 cm /Im1 Do Q"
+                resources += b" /XObject << /Im1 %d 0 R >>" % (page_id + 2)
+            yield (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                   b"/Resources << %s >> /Contents %d 0 R >>" % (resources, page_id + 1))
+            yield b"<< /Length %d >>" % len(content), content
+            if images:
+                row = bytes((i + x) % 256 for x in range(side * 3))
+                data = zlib.compress(b"".join(row[y:] + row[:y] for y in range(side)), 1)
+                yield (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                       b"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+                       b"/Length %d >>" % (side, side, len(data)), data)
+
+    _write_raw_pdf(path, objects())
+
+
+def write_synthetic_images(folder, count, width=160, height=120):
+    """Writes `count` distinct RGB PNGs into folder; returns their paths in order."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"image_{i + 1:05d}.png")
+        if not os.path.exists(path):
+            row = bytes((i + x) % 256 for x in range(width * 3))
+            _write_png(path, width, height, [row[y:] + row[:y] for y in range(height)], 2)
+        paths.append(path)
+    return paths
+
+
+# --- Startup benchmark ---
+
+
+def _startup_scenarios(folder):
+    """Returns (name, command line) pairs for short, typical invocations."""
+    pdf_path, png_path = _write_tiny_inputs(folder)
+    return [
+        ("manager: --help", [PDF_MANAGER, "--help"]),
+        ("manager: rotate 1 page", [PDF_MANAGER, "rotate", pdf_path, "-a", "90",
+                                    "-o", os.path.join(folder, "rotated.pdf")]),
+        ("manager: module import", ["-c", f"import runpy; runpy.run_path({PDF_MANAGER!r})"]),
+        ("converter: --help", [IMAGE_CONVERTER, "--help"]),
+        ("converter: 1 image", [IMAGE_CONVERTER, "-i", png_path,
+                                "-o", os.path.join(folder, "converted.pdf")]),
+        ("converter: module import", ["-c", f"import runpy; runpy.run_path({IMAGE_CONVERTER!r})"]),
+    ]
+
+
+def _parse_importtime(stderr):
+    """
+    Parses `python -X importtime` output into (total microseconds, the
+    slowest top-level imports as (cumulative microseconds, module) pairs).
+    """
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Column header
+        if not name.startswith("  "):  # Nested imports are indented further
+            top_level.append((int(cumulative), name.strip()))
+    total = sum(us for us, name in top_level)
+    return total, sorted(top_level, reverse=True)
+
+
+def benchmark_startup(runs=5, top=5):
+    """
+    Runs each startup scenario `runs` times in a fresh interpreter with
+    -X importtime and prints the median wall time, the median time spent
+    importing, and the slowest top-level imports of the last run.
+
+    Returns:
+        dict: Scenario name -> {"wall_ms", "import_ms", "top_imports"}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name, command in _startup_scenarios(folder):
+            wall, imports = [], []
+            for _ in range(runs):
+                start = time.perf_counter()
+                completed = subprocess.run([sys.executable, "-X", "importtime"] + command,
+                                           capture_output=True, text=True, cwd=folder)
+                wall.append((time.perf_counter() - start) * 1000)
+                if completed.returncode != 0:
+                    print(f"{name}: failed with exit code {completed.returncode}")
+                    break
+                total, slowest = _parse_importtime(completed.stderr)
+                imports.append(total / 1000)
+            else:
+                results[name] = {"wall_ms": statistics.median(wall),
+                                 "import_ms": statistics.median(imports),
+                                 "top_imports": [(module, us / 1000) for us, module in slowest[:top]]}
+                slow = ", ".join(f"{module} {ms:.0f}" for module, ms in results[name]["top_imports"])
+                print(f"{name:28} {results[name]['wall_ms']:7.1f} ms wall "
+                      f"{results[name]['import_ms']:7.1f} ms imports  ({slow})")
+    return results
+
+
+# --- Operations benchmark ---
+
+
+SUITE_OPERATIONS = ["merge_pdfs", "split_pdf", "extract_images", "remove_pages",
+                    "convert_images_to_pdf"]
+
+
+def _load_tool(path):
+    """Imports one of the tools (their file names are not module names)."""
+    name = os.path.splitext(os.path.basename(path))[0].lower().replace(" ", "_")
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+def _import_deferred(module):
+    """
+    Imports the modules a tool loads on first use (see _LazyModule), so
+    their import time is not counted in the first operation measured.
+    """
+    for value in list(vars(module).values()):
+        if isinstance(value, module._LazyModule):
+            value.__name__  # Any attribute lookup imports the module
+
+
+def _output_size(path):
+    """Size of a file, or the total size of the files in a folder tree."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(path) for name in names)
+
+
+def _max_rss_kb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss  # macOS reports bytes
+
+
+def _run_case(operation, args, output):
+    """
+    Runs one operation in this (fresh) process and measures it. PDFMaster
+    operations report through their metrics callback; the converter is
+    timed here. Returns the measurements as a dict; rss_before_kb is the
+    peak RSS after imports, before the operation started.
+    """
+    failed = []
+
+    def status(message):
+        if message.startswith(("Error", "An unexpected error", "An error occurred")):
+            failed.append(message)
+
+    if operation == "convert_images_to_pdf":
+        module = _load_tool(IMAGE_CONVERTER)
+        _import_deferred(module)
+        converter = module.ImageToPDFConverter(status)
+        rss_before = _max_rss_kb()
+        start, cpu = time.perf_counter(), time.process_time()
+        converter.convert_images_to_pdf(*args)
+        record = {"wall_s": time.perf_counter() - start, "cpu_s": time.process_time() - cpu,
+                  "status": "error" if failed else "ok"}
+    else:
+        records = []
+        module = _load_tool(PDF_MANAGER)
+        _import_deferred(module)
+        pdf_master = module.PDFMaster(status, metrics_callback=records.append)
+        rss_before = _max_rss_kb()
+        getattr(pdf_master, operation)(*args)
+        record = {key: records[0][key] for key in ("wall_s", "cpu_s", "status", "phases")}
+    record["rss_before_kb"] = rss_before
+    record["max_rss_kb"] = _max_rss_kb()
+    record["output_bytes"] = _output_size(output) if os.path.exists(output) else 0
+    record["error"] = failed[0] if failed else None
+    return record
+
+
+def _suite_inputs(data_dir, pages, images):
+    """Creates (or reuses) the synthetic inputs for one size; returns their paths."""
+    kind = "images" if images else "text"
+    first = os.path.join(data_dir, f"{kind}_{pages}.pdf")
+    second = os.path.join(data_dir, f"{kind}_{pages}_b.pdf")
+    if not os.path.exists(first):
+        write_synthetic_pdf(first, pages, images)
+    if not os.path.exists(second):
+        shutil.copyfile(first, second)  # Merged with the first as a separate file
+    return first, second
+
+
+def _suite_cases(data_dir, work_dir, sizes, operations):
+    """Yields (case, operation, args, output path) for every operation and size."""
+    pdf_operations = [operation for operation in operations
+                      if operation != "convert_images_to_pdf"]
+    for pages in sizes:
+        for images in (False, True) if pdf_operations else ():
+            first, second = _suite_inputs(data_dir, pages, images)
+            kind = "images" if images else "text"
+            for operation in pdf_operations:
+                case = {"operation": operation, "pages": pages, "images": images,
+                        "input_bytes": os.path.getsize(first)}
+                output = os.path.join(work_dir, f"{operation}_{kind}_{pages}")
+                if operation == "merge_pdfs":
+                    args = ([first, second], output + ".pdf")
+                elif operation == "split_pdf":
+                    args = (first, output, 10)
+                elif operation == "extract_images":
+                    args = (first, output)
+                else:
+                    args = (first, output + ".pdf", f"1-{pages}:2")  # Every odd page
+                yield case, operation, args, args[1]
+        if "convert_images_to_pdf" in operations:
+            paths = write_synthetic_images(os.path.join(data_dir, "png"), pages)
+            case = {"operation": "convert_images_to_pdf", "pages": pages, "images": True,
+                    "input_bytes": sum(os.path.getsize(path) for path in paths)}
+            output = os.path.join(work_dir, f"convert_images_to_pdf_{pages}.pdf")
+            yield case, "convert_images_to_pdf", (paths, output), output
+
+
+def benchmark_suite(sizes=(10, 100, 1000, 10000, 50000), runs=1, operations=None,
+                    results_path="benchmark_results.json", data_dir=None):
+    """
+    Runs the PDF operations on synthetic documents of each size in `sizes`
+    (pages), without and with one image per page, and the image converter
+    on as many synthetic PNGs. Every run happens in a fresh process, so
+    its peak RSS belongs to that operation alone. merge_pdfs merges two
+    copies of the document, split_pdf writes 10 pages per file and
+    remove_pages removes every odd page.
+
+    The median wall and CPU time of `runs` runs, the highest peak RSS and
+    the output size of each case are written to results_path as JSON.
+    Generated inputs are kept in data_dir when it is given, and reused by
+    later runs.
+
+    Returns:
+        dict: The results file contents.
+    """
+    operations = list(operations or SUITE_OPERATIONS)
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = data_dir or os.path.join(temp_dir, "data")
+        work_dir = os.path.join(temp_dir, "out")
+        os.makedirs(data_dir, exist_ok=True)
+        context = multiprocessing.get_context("spawn")
+        for case, operation, args, output in _suite_cases(data_dir, work_dir, sorted(sizes),
+                                                          operations):
+            measured = []
+            for _ in range(runs):
+                shutil.rmtree(work_dir, ignore_errors=True)
+                os.makedirs(work_dir)
+                with futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    try:
+                        measured.append(executor.submit(_run_case, operation, args, output).result())
+                    except Exception as e:  # Includes a worker killed by running out of memory
+                        measured.append({"status": "error", "error": f"Error: {e}", "wall_s": 0.0,
+                                         "cpu_s": 0.0, "max_rss_kb": None, "rss_before_kb": None,
+                                         "output_bytes": 0})
+                if measured[-1]["status"] != "ok":
+                    break
+            last = measured[-1]
+            case.update(status=last["status"], error=last["error"], runs=len(measured),
+                         wall_s=statistics.median(m["wall_s"] for m in measured),
+                         cpu_s=statistics.median(m["cpu_s"] for m in measured),
+                         max_rss_kb=max((m["max_rss_kb"] or 0) for m in measured) or None,
+                         rss_before_kb=last["rss_before_kb"],
+                         output_bytes=last["output_bytes"], phases=last.get("phases"))
+            results.append(case)
+            kind = "images" if case["images"] else "text"
+            print(f"{operation:22} {case['pages']:6} pages {kind:6} "
+                  f"{case['wall_s']:9.3f} s {case['cpu_s']:9.3f} s CPU "
+                  f"{(case['max_rss_kb'] or 0) / 1024:8.1f} MB peak "
+                  f"{case['output_bytes'] / 1024:10.0f} KB out"
+                  + ("" if case["status"] == "ok" else f"  {case['status'].upper()}: {case['error']}"),
+                  flush=True)
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+              "platform": platform.platform(), "cpu_count": os.cpu_count(), "results": results}
+    with open(results_path, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to: {results_path}")
+    return report
+
+
+def compare_results(baseline_path, current_path, threshold=0.1, min_seconds=0.05,
+                    min_memory_kb=2048):
+    """
+    Compares two results files case by case and prints every measurement
+    (time, peak memory, output size) that grew by more than `threshold`
+    (a fraction) from baseline to current. Time changes below min_seconds
+    and memory changes below min_memory_kb are ignored as noise. Cases
+    that failed in the current run count as regressions.
+
+    Returns:
+        list: (case description, measurement, baseline, current) regressions.
+    """
+    with open(baseline_path) as f:
+        baseline = f.read()
+    with open(current_path) as f:
+        current = f.read()
+    baseline, current = json.loads(baseline)["results"], json.loads(current)["results"]
+
+    def key(case):
+        return case["operation"], case["pages"], case["images"]
+
+    compared = [("wall_s", "time", min_seconds), ("max_rss_kb", "peak memory", min_memory_kb),
+                ("output_bytes", "output size", 0)]
+    previous = {key(case): case for case in baseline}
+    regressions = []
+    for case in current:
+        operation, pages, images = key(case)
+        description = f"{operation} {pages} pages{' with images' if images else ''}"
+        old = previous.pop(key(case), None)
+        if old is None:
+            print(f"  new     {description}")
+            continue
+        if case["status"] != "ok" and old["status"] == "ok":
+            regressions.append((description, "status", old["status"], case["status"]))
+            print(f"  FAILED  {description}: {case['error']}")
+            continue
+        changes, regressed = [], False
+        for field, label, noise in compared:
+            before, after = old.get(field), case.get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if abs(after - before) < noise:
+                change = 0.0
+            changes.append(f"{label} {change:+.0%}")
+            if change > threshold:
+                regressions.append((description, label, before, after))
+                regressed = True
+        print(f"  {'REGRESS' if regressed else 'ok':7} {description}: {', '.join(changes)}")
+    for operation, pages, images in previous:
+        print(f"  missing {operation} {pages} pages{' with images' if images else ''}")
+    print(f"{len(regressions)} regression(s) above {threshold:.0%}.")
+    return regressions
+
+
+def _sizes_arg(text):
+    try:
+        sizes = [int(size) for size in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size list: {text}")
+    if min(sizes) < 1:
+        raise argparse.ArgumentTypeError("sizes must be at least 1 page")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the PDF tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="Time cold starts of short CLI invocations (uses -X importtime).")
+    startup_parser.add_argument("-n", "--runs", type=int, default=5,
+                                help="Runs per scenario; the median is reported (default: 5).")
+    startup_parser.add_argument("--top", type=int, default=5,
+                                help="Slowest top-level imports to list (default: 5).")
+
+    suite_parser = subparsers.add_parser(
+        "suite", help="Time the main operations on synthetic documents of several sizes.")
+    suite_parser.add_argument("--sizes", type=_sizes_arg, default=[10, 100, 1000, 10000, 50000],
+                              help="Comma-separated page counts (default: 10,100,1000,10000,50000).")
+    suite_parser.add_argument("--operations", type=lambda text: text.split(","),
+                              default=SUITE_OPERATIONS,
+                              help="Comma-separated operations (default: all of "
+                                   + ",".join(SUITE_OPERATIONS) + ").")
+    suite_parser.add_argument("-n", "--runs", type=int, default=1,
+                              help="Runs per case; the median time is reported (default: 1).")
+    suite_parser.add_argument("-o", "--output", default="benchmark_results.json",
+                              help="Results file (default: benchmark_results.json).")
+    suite_parser.add_argument("--data-dir",
+                              help="Keep generated inputs here and reuse them in later runs.")
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Flag regressions between two suite results files.")
+    compare_parser.add_argument("baseline", help="Results file of the reference run.")
+    compare_parser.add_argument("current", help="Results file of the run to check.")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Growth that counts as a regression (default: 0.1 = 10%%).")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.05,
+                                help="Ignore time changes smaller than this (default: 0.05).")
+    compare_parser.add_argument("--min-memory-kb", type=int, default=2048,
+                                help="Ignore peak memory changes smaller than this (default: 2048).")
+
+    args = parser.parse_args()
+    if args.command == "startup":
+        benchmark_startup(args.runs, args.top)
+    elif args.command == "suite":
+        unknown = set(args.operations) - set(SUITE_OPERATIONS)
+        if unknown:
+            parser.error(f"unknown operations: {', '.join(sorted(unknown))}")
+        benchmark_suite(args.sizes, args.runs, args.operations, args.output, args.data_dir)
+    else:
+        return 1 if compare_results(args.baseline, args.current, args.threshold,
+                                    args.min_seconds, args.min_memory_kb) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,745 @@
+import csv
+import importlib
+import io
 import os
-from PIL import Image
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
 import argparse
-import tkinter as tk  # Changed import: import tkinter as tk
-# Removed Tk from here, now accessed via tk.Tk
-from tkinter import filedialog, messagebox, ttk
+
+
+class _LazyModule:
+    """
+    Stands in for a module until one of its attributes is used, then
+    imports it and rebinds the global `binding` to the real module, so
+    later lookups cost nothing. importlib's per-module locks make the
+    first use safe from several threads.
+    """
+
+    def __init__(self, name, binding=None):
+        self._name = name
+        self._binding = binding or name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._binding] = module
+        return getattr(module, attr)
+
+
+# Pillow and the process pool load on first use, so the GUI window and
+# CLI argument errors do not wait for them.
+Image = _LazyModule("PIL.Image", "Image")
+futures = _LazyModule("concurrent.futures", "futures")
+tempfile = _LazyModule("tempfile")
+
+# Set by _load_tkinter() when the GUI starts, so the CLI runs without a display.
+tk = filedialog = messagebox = ttk = None
+
+
+def _load_tkinter():
+    global tk, filedialog, messagebox, ttk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
+
+class ConversionCancelled(BaseException):
+    """
+    Raised inside a conversion when its cancel event is set.
+
+    It derives from BaseException so the broad error handlers of the
+    conversion code let it through.
+    """
+
+
+class _PDFStreamWriter:
+    """
+    Writes a PDF one image page at a time.
+
+    Each page is flushed to disk as soon as it is added, so only the page
+    currently being written is held in memory. The page tree, catalog and
+    cross-reference table are written by close().
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, body, stream=None):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode("latin-1"))
+        self._file.write(body.encode("latin-1"))
+        if stream is not None:
+            self._file.write(b"\nstream\n")
+            self._file.write(stream)
+            self._file.write(b"\nendstream")
+        self._file.write(b"\nendobj\n")
+
+    def add_page(self, page):
+        """Writes an encoded image page (see _encode_image) to the output."""
+        image_id, contents_id, page_id = (
+            self._new_id(), self._new_id(), self._new_id())
+
+        self._write_object(
+            image_id,
+            f"<< /Type /XObject /Subtype /Image /Width {page.width} "
+            f"/Height {page.height} /ColorSpace {page.color_space} "
+            f"/BitsPerComponent {page.bits} /Filter {page.filter} "
+            + (f"/Decode {page.decode} " if page.decode else "")
+            + (f"/DecodeParms {page.decode_parms} " if page.decode_parms else "")
+            + f"/Length {len(page.data)} >>",
+            page.data)
+
+        x, y, width, height = page.image_box or (
+            0, 0, page.page_width, page.page_height)
+        contents = (f"q {width:.4f} 0 0 {height:.4f} {x:.4f} {y:.4f} cm "
+                    f"/Im0 Do Q").encode("latin-1")
+        self._write_object(
+            contents_id, f"<< /Length {len(contents)} >>", contents)
+
+        self._write_object(
+            page_id,
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R "
+            f"/MediaBox [0 0 {page.page_width:.4f} {page.page_height:.4f}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+            f"/Contents {contents_id} 0 R >>")
+        self._page_ids.append(page_id)
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def close(self):
+        """Writes the page tree, catalog, xref table and trailer."""
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(
+            self.PAGES_ID,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>")
+        self._write_object(
+            self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>")
+
+        xref_offset = self._file.tell()
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        self._file.write("".join(lines).encode("latin-1"))
+        self._file.write(
+            f"trailer\n<< /Size {size} /Root {self.CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode("latin-1"))
+
+
+_EncodedPage = namedtuple(
+    "_EncodedPage",
+    "width height color_space bits filter data page_width page_height "
+    "decode image_box decode_parms",
+    defaults=(None, None, None))
+
+# Conversion settings shared by every page of a document.
+_PageOptions = namedtuple(
+    "_PageOptions", "dpi page_size quality max_dimension",
+    defaults=(None, None, None, None))
+
+# Portrait page sizes in points (1/72 inch).
+PAGE_SIZES = {
+    "A3": (842, 1191),
+    "A4": (595, 842),
+    "A5": (420, 595),
+    "Letter": (612, 792),
+    "Legal": (612, 1008),
+}
+
+# JPEG modes that can be embedded as a DCTDecode stream without decoding.
+_JPEG_PASSTHROUGH_COLOR_SPACES = {
+    "L": "/DeviceGray",
+    "RGB": "/DeviceRGB",
+    "CMYK": "/DeviceCMYK",
+}
+
+
+def _image_resolution(img):
+    """
+    Returns the (horizontal, vertical) DPI an image file records, using
+    72 DPI for a missing or unusable value.
+    """
+    try:
+        x_dpi, y_dpi = img.info["dpi"]
+        x_dpi, y_dpi = float(x_dpi), float(y_dpi)
+    except (KeyError, TypeError, ValueError):
+        return 72.0, 72.0
+    return (x_dpi if x_dpi >= 1 else 72.0), (y_dpi if y_dpi >= 1 else 72.0)
+
+
+def _page_layout(width, height, options, resolution=(72.0, 72.0)):
+    """
+    Works out where an image of the given pixel size goes.
+
+    Returns (page_width, page_height, image_box, target_size). Without a page
+    size, the page matches the image at its resolution (x, y DPI; 72 DPI is
+    one point per pixel). With a page size, the image is scaled to fit and
+    centred, and the page is turned to landscape for landscape images.
+    target_size is the downsampled pixel size, or None when the image is
+    already within the dpi/max_dimension limits.
+    """
+    if options.page_size:
+        page_width, page_height = PAGE_SIZES[options.page_size]
+        if (width > height) != (page_width > page_height):
+            page_width, page_height = page_height, page_width
+        scale = min(page_width / width, page_height / height)
+        draw_width, draw_height = width * scale, height * scale
+        image_box = ((page_width - draw_width) / 2,
+                     (page_height - draw_height) / 2, draw_width, draw_height)
+    else:
+        page_width = draw_width = width * 72 / resolution[0]
+        page_height = draw_height = height * 72 / resolution[1]
+        image_box = None
+
+    factor = 1.0
+    if options.dpi:
+        factor = min(factor, draw_width / 72 * options.dpi / width,
+                     draw_height / 72 * options.dpi / height)
+    if options.max_dimension:
+        factor = min(factor, options.max_dimension / max(width, height))
+    target_size = None
+    if factor < 1.0:
+        target_size = (max(1, round(width * factor)),
+                       max(1, round(height * factor)))
+    return page_width, page_height, image_box, target_size
+
+
+# TIFF tags needed to copy a CCITT Group 4 strip out of the file.
+_TIFF_PHOTOMETRIC = 262
+_TIFF_FILL_ORDER = 266
+_TIFF_STRIP_OFFSETS = 273
+_TIFF_STRIP_BYTE_COUNTS = 279
+_TIFF_TILE_OFFSETS = 324
+
+
+def _group4_strip(img, path):
+    """
+    Returns the raw CCITT Group 4 data of the current TIFF frame, or None
+    when the frame cannot be embedded as-is (other compression, several
+    strips, tiles or reversed bit order).
+    """
+    if img.format != "TIFF" or img.mode != "1" or img.info.get("compression") != "group4":
+        return None
+    tags = img.tag_v2
+    offsets = tags.get(_TIFF_STRIP_OFFSETS)
+    byte_counts = tags.get(_TIFF_STRIP_BYTE_COUNTS)
+    if (_TIFF_TILE_OFFSETS in tags or tags.get(_TIFF_FILL_ORDER, 1) != 1
+            or not offsets or len(offsets) != 1 or len(byte_counts) != 1):
+        return None
+    with open(path, 'rb') as tiff_file:
+        tiff_file.seek(offsets[0])
+        return tiff_file.read(byte_counts[0])
+
+
+def _encode_image(path, options=_PageOptions(), frame=0):
+    """Encodes one frame of an image file as a PDF page."""
+    with Image.open(path) as img:
+        if frame:
+            img.seek(frame)
+        return _encode_frame(img, path, options)
+
+
+def _encode_frame(img, path, options):
+    """
+    Encodes the current frame of an open image as a PDF page.
+
+    Baseline and progressive JPEGs and CCITT Group 4 TIFF frames that need
+    no downsampling are embedded byte-for-byte. Other bilevel frames stay
+    1-bit and are Flate-compressed. Everything else is decoded, resized if
+    needed and re-encoded as a JPEG page.
+    """
+    page_width, page_height, image_box, target_size = _page_layout(
+        img.width, img.height, options, _image_resolution(img))
+
+    color_space = _JPEG_PASSTHROUGH_COLOR_SPACES.get(img.mode)
+    if img.format == "JPEG" and color_space and not target_size:
+        with open(path, 'rb') as jpeg_file:
+            data = jpeg_file.read()
+        # Adobe CMYK JPEGs store inverted samples.
+        decode = "[1 0 1 0 1 0 1 0]" if (
+            img.mode == "CMYK" and "adobe" in img.info) else None
+        return _EncodedPage(img.width, img.height, color_space, 8,
+                            "/DCTDecode", data, page_width, page_height,
+                            decode, image_box)
+
+    if img.mode == "1":
+        data = None if target_size else _group4_strip(img, path)
+        if data is not None:
+            # CCITT codes runs as white/black; BlackIsZero TIFFs show the
+            # "white" runs as black, which BlackIs1 reproduces.
+            black_is_1 = "true" if img.tag_v2.get(_TIFF_PHOTOMETRIC) == 1 else "false"
+            return _EncodedPage(
+                img.width, img.height, "/DeviceGray", 1, "/CCITTFaxDecode",
+                data, page_width, page_height, None, image_box,
+                f"<< /K -1 /Columns {img.width} /Rows {img.height} "
+                f"/BlackIs1 {black_is_1} >>")
+        bilevel = img
+        if target_size:
+            bilevel = img.convert("L").resize(
+                target_size, Image.Resampling.BILINEAR, reducing_gap=2.0
+            ).convert("1", dither=Image.Dither.NONE)
+        # Pillow packs 1-bit rows MSB first with 1 = white, as PDF expects.
+        return _EncodedPage(bilevel.width, bilevel.height, "/DeviceGray", 1,
+                            "/FlateDecode", zlib.compress(bilevel.tobytes()),
+                            page_width, page_height, None, image_box)
+
+    if target_size:
+        # Lets the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding.
+        img.draft(None, target_size)
+    rgb = img.convert('RGB')
+    if target_size:
+        rgb = rgb.resize(target_size, Image.Resampling.BILINEAR,
+                         reducing_gap=2.0)
+    buffer = io.BytesIO()
+    rgb.save(buffer, format="JPEG", quality=options.quality or 75)
+    return _EncodedPage(rgb.width, rgb.height, "/DeviceRGB", 8, "/DCTDecode",
+                        buffer.getvalue(), page_width, page_height,
+                        None, image_box)
 
 
 class ImageToPDFConverter:
     """
     A class to convert image files (JPG, PNG, etc.) into a single PDF document.
+    Pages are streamed to disk one at a time, so memory use does not grow
+    with the number of images.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, status_callback=None, cancel_event=None):
+        self.status_callback = status_callback if status_callback else print
+        self.cancel_event = cancel_event
 
-    def convert_images_to_pdf(self, image_paths, output_pdf_path):
+    def _update_status(self, message):
+        """Sends a message to the status callback (print by default)."""
+        self.status_callback(message)
+
+    def _check_cancelled(self):
+        """Raises ConversionCancelled if the cancel event has been set."""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise ConversionCancelled()
+
+    def convert_images_to_pdf(self, image_paths, output_pdf_path, workers=1,
+                              dpi=None, page_size=None, quality=None,
+                              max_dimension=None):
         """
         Converts a list of image files into a single PDF document.
 
         Args:
             image_paths (list): A list of paths to the image files.
             output_pdf_path (str): The path for the output PDF file.
+            workers (int): Number of processes used to decode and encode
+                images. Pages are always written in input order.
+            dpi (int): Maximum image resolution on the page. Images above it
+                are downsampled.
+            page_size (str): A key of PAGE_SIZES. Images are fitted to the
+                page. By default each page matches its image at the
+                resolution the file records (72 DPI if none).
+            quality (int): JPEG quality (1-95) for re-encoded pages. Default 75.
+            max_dimension (int): Maximum width/height of an image in pixels.
+
+        Returns:
+            int: The number of pages written, or None if conversion failed.
+
+        Raises:
+            ConversionCancelled: If the cancel event was set. The partial
+                output file is removed first.
         """
         if not image_paths:
-            print("Error: No image files provided for conversion.")
+            self._update_status(
+                "Error: No image files provided for conversion.")
+            return None
+        if page_size and page_size not in PAGE_SIZES:
+            self._update_status(
+                f"Error: Unknown page size '{page_size}'. Choose from: {', '.join(PAGE_SIZES)}.")
+            return None
+        if quality is not None and not 1 <= quality <= 95:
+            self._update_status("Error: JPEG quality must be between 1 and 95.")
+            return None
+        if dpi is not None and dpi < 1:
+            self._update_status("Error: DPI must be a positive whole number.")
+            return None
+        if max_dimension is not None and max_dimension < 1:
+            self._update_status("Error: Maximum dimension must be a positive whole number.")
+            return None
+        options = _PageOptions(dpi, page_size, quality, max_dimension)
+
+        total = len(image_paths)
+        output_opened = False
+        try:
+            with open(output_pdf_path, 'wb') as output_file:
+                output_opened = True
+                writer = _PDFStreamWriter(output_file)
+                for i, path, frame, frames, page in self._iter_encoded_pages(
+                        image_paths, workers, options):
+                    self._check_cancelled()
+                    writer.add_page(page)
+                    frame_note = f" (frame {frame + 1}/{frames})" if frames > 1 else ""
+                    self._update_status(
+                        f"  Added image {i + 1}/{total}: {os.path.basename(path)}{frame_note}")
+
+                if writer.page_count == 0:
+                    raise FileNotFoundError("no readable image files")
+                writer.close()
+
+            self._update_status(
+                f"Successfully converted {writer.page_count} page(s) to PDF: {output_pdf_path}")
+            return writer.page_count
+
+        except ConversionCancelled:
+            if output_opened:
+                self._remove_partial_output(output_pdf_path)
+            self._update_status(f"Conversion cancelled: {output_pdf_path}")
+            raise
+        except FileNotFoundError:
+            if output_opened:
+                self._remove_partial_output(output_pdf_path)
+            self._update_status("Error: One or more image files not found.")
+        except Exception as e:
+            if output_opened:
+                self._remove_partial_output(output_pdf_path)
+            self._update_status(
+                f"An error occurred during image to PDF conversion: {e}")
+        return None
+
+    def _existing_paths(self, image_paths):
+        """Yields (index, path) for each image that exists, warning about the rest."""
+        for i, path in enumerate(image_paths):
+            self._check_cancelled()
+            if not os.path.exists(path):
+                self._update_status(
+                    f"Warning: Image file not found: {path}. Skipping.")
+                continue
+            yield i, path
+
+    def _iter_encoded_pages(self, image_paths, workers, options):
+        """
+        Yields (index, path, frame, frame count, encoded page) in input order.
+
+        Every frame of a multi-frame image (TIFF, GIF, ...) becomes a page.
+        Frames are read one at a time. With more than one worker, frames are
+        encoded in a process pool. At most two pages per worker are in
+        flight, which keeps memory bounded while every worker stays busy.
+        """
+        if workers <= 1:
+            for i, path in self._existing_paths(image_paths):
+                with Image.open(path) as img:
+                    frames = getattr(img, "n_frames", 1)
+                    for frame in range(frames):
+                        if frame:
+                            img.seek(frame)
+                        yield i, path, frame, frames, _encode_frame(img, path, options)
             return
 
-        images = []
+        executor = futures.ProcessPoolExecutor(max_workers=workers)
+        pending = deque()
         try:
-            # Open the first image to determine mode and size for subsequent images
-            first_image = Image.open(image_paths[0]).convert('RGB')
-            images.append(first_image)
+            for i, path in self._existing_paths(image_paths):
+                with Image.open(path) as img:
+                    frames = getattr(img, "n_frames", 1)
+                for frame in range(frames):
+                    pending.append((i, path, frame, frames, executor.submit(
+                        _encode_image, path, options, frame)))
+                    if len(pending) >= workers * 2:
+                        *info, future = pending.popleft()
+                        yield (*info, future.result())
+            while pending:
+                *info, future = pending.popleft()
+                yield (*info, future.result())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def benchmark_workers(self, image_paths, max_workers, **options):
+        """
+        Converts the same images with 1 to max_workers processes and reports
+        throughput for each worker count. Output goes to a temporary file.
+        Keyword options are passed on to convert_images_to_pdf().
 
-            for i, path in enumerate(image_paths[1:]):
-                if not os.path.exists(path):
-                    print(f"Warning: Image file not found: {path}. Skipping.")
-                    continue
+        Returns:
+            list: (workers, seconds, pages_per_second) tuples.
+        """
+        results = []
+        status_callback = self.status_callback
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_pdf_path = os.path.join(temp_dir, "benchmark.pdf")
+            for workers in range(1, max_workers + 1):
+                self.status_callback = lambda message: None
+                start = time.perf_counter()
+                try:
+                    pages = self.convert_images_to_pdf(
+                        image_paths, output_pdf_path, workers, **options)
+                finally:
+                    self.status_callback = status_callback
+                elapsed = time.perf_counter() - start
+                if not pages:
+                    self._update_status(
+                        "Error: Benchmark conversion failed; aborting.")
+                    break
+                results.append((workers, elapsed, pages / elapsed))
+
+        if results:
+            baseline = results[0][1]
+            for workers, elapsed, rate in results:
+                self._update_status(
+                    f"workers={workers}: {elapsed:.2f} s, {rate:.1f} pages/s, "
+                    f"speedup {baseline / elapsed:.2f}x")
+        return results
+
+    def convert_batch(self, jobs, workers=1, **options):
+        """
+        Converts many documents in one run.
 
-                # Open subsequent images and convert to RGB mode
-                img = Image.open(path).convert('RGB')
-                images.append(img)
-                print(f"  Added image: {os.path.basename(path)}")
+        Args:
+            jobs (list): (image_paths, output_pdf_path) pairs, e.g. from
+                find_image_jobs() or read_manifest().
+            workers (int): Number of documents converted concurrently, each
+                in its own process.
+            **options: Passed on to convert_images_to_pdf().
+
+        Returns:
+            dict: Summary with documents, pages, seconds, pages_per_second
+            and a list of (output_pdf_path, error message) failures.
+        """
+        start = time.perf_counter()
+        pages = 0
+        failures = []
+
+        # Two jobs writing one file would lose a document (or, in parallel,
+        # corrupt it), so nothing is converted.
+        outputs = {}
+        for _, output_pdf_path in jobs:
+            key = os.path.normcase(os.path.abspath(output_pdf_path))
+            outputs[key] = outputs.get(key, 0) + 1
+        duplicates = sorted(path for path, count in outputs.items() if count > 1)
+        if duplicates:
+            for output_pdf_path in duplicates:
+                failures.append((output_pdf_path, "Error: Several documents have this output path."))
+                self._update_status(
+                    f"Error: Several documents would be written to {output_pdf_path}.")
+            self._update_status("Batch not started.")
+            return {"documents": len(jobs), "pages": 0, "seconds": 0.0,
+                    "pages_per_second": 0.0, "failures": failures}
+
+        def record(index, output_pdf_path, page_count, error):
+            nonlocal pages
+            if page_count:
+                pages += page_count
+                self._update_status(
+                    f"[{index}/{len(jobs)}] {output_pdf_path}: {page_count} page(s)")
+            else:
+                failures.append((output_pdf_path, error))
+                self._update_status(
+                    f"[{index}/{len(jobs)}] FAILED {output_pdf_path}: {error}")
+
+        self._update_status(
+            f"Converting {len(jobs)} document(s) with {workers} worker(s)...")
+        if workers <= 1:
+            for index, (image_paths, output_pdf_path) in enumerate(jobs, 1):
+                record(index, *_convert_job(image_paths, output_pdf_path, options))
+        else:
+            with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                submitted = [executor.submit(_convert_job, image_paths, output_pdf_path, options)
+                             for image_paths, output_pdf_path in jobs]
+                for index, future in enumerate(futures.as_completed(submitted), 1):
+                    record(index, *future.result())
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "documents": len(jobs),
+            "pages": pages,
+            "seconds": elapsed,
+            "pages_per_second": pages / elapsed if elapsed else 0.0,
+            "failures": failures,
+        }
+        self._update_status(
+            f"Batch finished: {len(jobs) - len(failures)}/{len(jobs)} document(s), "
+            f"{pages} page(s) in {elapsed:.2f} s ({summary['pages_per_second']:.1f} pages/s), "
+            f"{len(failures)} failure(s).")
+        for output_pdf_path, error in failures:
+            self._update_status(f"  Failed: {output_pdf_path}: {error}")
+        return summary
+
+    def _remove_partial_output(self, output_pdf_path):
+        """Deletes an incomplete output file left behind by a failed run."""
+        try:
+            os.remove(output_pdf_path)
+        except OSError:
+            pass
 
-            # Save all opened images as a single PDF
-            first_image.save(output_pdf_path, save_all=True,
-                             append_images=images[1:])
-            print(
-                f"Successfully converted {len(images)} image(s) to PDF: {output_pdf_path}")
+# --- Batch Conversion ---
 
-        except FileNotFoundError:
-            print(f"Error: One or more image files not found.")
-        except Exception as e:
-            print(f"An error occurred during image to PDF conversion: {e}")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp"}
+
+
+def _convert_job(image_paths, output_pdf_path, options):
+    """Converts one batch document. Runs in a worker process."""
+    messages = []
+    output_dir = os.path.dirname(output_pdf_path)
+    try:
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+    except OSError as e:
+        return output_pdf_path, None, f"Error: Could not create {output_dir}: {e}"
+    converter = ImageToPDFConverter(messages.append)
+    page_count = converter.convert_images_to_pdf(
+        image_paths, output_pdf_path, **options)
+    error = None if page_count else (messages[-1] if messages else "Unknown error")
+    return output_pdf_path, page_count, error
+
+
+def find_image_jobs(input_dir, output_dir):
+    """
+    Maps every folder under input_dir that directly contains images to one
+    PDF in output_dir, mirroring the folder tree (a/b -> output_dir/a/b.pdf).
+    Images inside input_dir itself go to output_dir/<input_dir name>.pdf,
+    or <input_dir name>_2.pdf, ... if a subfolder already has that name.
+    Images within a folder are taken in file name order.
+    """
+    jobs = []
+    root_job = None
+    for dirpath, dirnames, filenames in os.walk(input_dir):
+        dirnames.sort()
+        images = sorted(f for f in filenames
+                        if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS)
+        if not images:
+            continue
+        image_paths = [os.path.join(dirpath, f) for f in images]
+        relative = os.path.relpath(dirpath, input_dir)
+        if relative == os.curdir:
+            root_job = len(jobs)
+            jobs.append((image_paths, None))
+            continue
+        jobs.append((image_paths, os.path.join(output_dir, relative + ".pdf")))
+    if root_job is not None:
+        taken = {os.path.normcase(path) for _, path in jobs if path}
+        name = os.path.basename(os.path.abspath(input_dir))
+        output_pdf_path = os.path.join(output_dir, name + ".pdf")
+        suffix = 2
+        while os.path.normcase(output_pdf_path) in taken:
+            output_pdf_path = os.path.join(output_dir, f"{name}_{suffix}.pdf")
+            suffix += 1
+        jobs[root_job] = (jobs[root_job][0], output_pdf_path)
+    return jobs
+
+
+def read_manifest(manifest_path, output_dir=None):
+    """
+    Reads a CSV manifest with one document per line:
+    output.pdf,image1.jpg,image2.png,...
+    Relative output paths are resolved against output_dir when given, and
+    relative image paths against the manifest's folder. Blank lines and
+    lines starting with '#' are ignored.
+    """
+    jobs = []
+    with open(manifest_path, newline='') as manifest_file:
+        for row in csv.reader(manifest_file):
+            row = [field.strip() for field in row if field.strip()]
+            if not row or row[0].startswith('#'):
+                continue
+            output_pdf_path = row[0]
+            image_paths = [os.path.join(os.path.dirname(manifest_path), path)
+                           for path in row[1:]]
+            if output_dir and not os.path.isabs(output_pdf_path):
+                output_pdf_path = os.path.join(output_dir, output_pdf_path)
+            jobs.append((image_paths, output_pdf_path))
+    return jobs
 
 # --- Command Line Interface (CLI) ---
 
 
+def _int_range_arg(minimum, maximum=None):
+    """Returns an argparse type for whole numbers from minimum to maximum."""
+    def parse(text):
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid whole number: {text!r}")
+        if value < minimum or (maximum is not None and value > maximum):
+            raise argparse.ArgumentTypeError(
+                f"{value} is not between {minimum} and {maximum}" if maximum is not None
+                else f"{value} is less than {minimum}")
+        return value
+    return parse
+
+
 def main_cli():
     parser = argparse.ArgumentParser(
-        description="Convert one or more image files to a single PDF.",
+        description="Convert one or more image files to a single PDF,\n"
+                    "or a whole folder tree / manifest of documents in one run.",
         formatter_class=argparse.RawTextHelpFormatter
     )
 
-    parser.add_argument("-i", "--input", nargs='+', required=True,
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("-i", "--input", nargs='+',
                         help="Input image file(s) (e.g., image1.jpg image2.png).")
-    parser.add_argument("-o", "--output", required=True,
+    inputs.add_argument("--input-dir",
+                        help="Batch mode: each folder of images under this directory\n"
+                             "becomes one PDF in --output-dir.")
+    inputs.add_argument("--manifest",
+                        help="Batch mode: CSV file with one document per line:\n"
+                             "output.pdf,image1.jpg,image2.png,...")
+    parser.add_argument("-o", "--output",
                         help="Output PDF file path (e.g., output.pdf).")
+    parser.add_argument("--output-dir",
+                        help="Output folder for batch mode.")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of processes used to decode/encode images (default: 1).\n"
+                             "In batch mode, the number of documents converted at once.")
+    parser.add_argument("--dpi", type=_int_range_arg(1),
+                        help="Downsample images above this resolution on the page.")
+    parser.add_argument("--page-size", choices=list(PAGE_SIZES),
+                        help="Fit every image onto a page of this size.\n"
+                             "By default each page matches its image at the resolution\n"
+                             "the file records (72 DPI if none).")
+    parser.add_argument("--quality", type=_int_range_arg(1, 95),
+                        help="JPEG quality (1-95) for re-encoded pages (default: 75).")
+    parser.add_argument("--max-dimension", type=_int_range_arg(1),
+                        help="Downsample images whose width or height exceeds this many pixels.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare conversion throughput for 1 to --workers processes\n"
+                             "instead of writing --output.")
 
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1.")
+    options = dict(dpi=args.dpi, page_size=args.page_size,
+                   quality=args.quality, max_dimension=args.max_dimension)
     converter = ImageToPDFConverter()
-    converter.convert_images_to_pdf(args.input, args.output)
+    if args.input_dir or args.manifest:
+        if args.output:
+            parser.error("-o/--output cannot be used in batch mode; use --output-dir.")
+        if args.benchmark:
+            parser.error("--benchmark cannot be used in batch mode.")
+        if args.input_dir:
+            if not args.output_dir:
+                parser.error("--input-dir requires --output-dir.")
+            jobs = find_image_jobs(args.input_dir, args.output_dir)
+        else:
+            jobs = read_manifest(args.manifest, args.output_dir)
+        summary = converter.convert_batch(jobs, args.workers, **options)
+        raise SystemExit(1 if summary["failures"] else 0)
+    if args.benchmark:
+        converter.benchmark_workers(args.input, args.workers, **options)
+        return
+    if not args.output:
+        parser.error("the following arguments are required: -o/--output")
+    converter.convert_images_to_pdf(
+        args.input, args.output, args.workers, **options)
 
 # --- GUI Interface ---
 
@@ -78,7 +748,7 @@ class ImageToPDFGUI:
     def __init__(self, master):
         self.master = master
         master.title("Image to PDF Converter")
-        master.geometry("500x350")
+        master.geometry("500x500")
         master.resizable(False, False)
 
         # Styling
@@ -155,25 +825,107 @@ class ImageToPDFGUI:
         ttk.Button(output_frame, text="Save As...", command=self._browse_save_path).grid(
             row=0, column=1, padx=5, pady=5)
 
-        # Convert Button
+        # Output Options
+        options_frame = ttk.LabelFrame(
+            main_frame, text="Output Options", style='TFrame')
+        options_frame.grid(row=2, column=0, columnspan=2,
+                           sticky="ew", pady=10, padx=5)
+
+        ttk.Label(options_frame, text="Page Size:", style='TLabel').grid(
+            row=0, column=0, padx=5, pady=2, sticky="w")
+        self.page_size_var = tk.StringVar(value="Original")
+        ttk.Combobox(options_frame, textvariable=self.page_size_var, state="readonly", width=10,
+                     values=["Original"] + list(PAGE_SIZES)).grid(
+            row=0, column=1, padx=5, pady=2, sticky="w")
+
+        ttk.Label(options_frame, text="Max DPI:", style='TLabel').grid(
+            row=0, column=2, padx=5, pady=2, sticky="w")
+        self.dpi_entry = ttk.Entry(options_frame, width=8, style='TEntry')
+        self.dpi_entry.grid(row=0, column=3, padx=5, pady=2, sticky="w")
+
+        ttk.Label(options_frame, text="JPEG Quality:", style='TLabel').grid(
+            row=1, column=0, padx=5, pady=2, sticky="w")
+        self.quality_entry = ttk.Entry(options_frame, width=8, style='TEntry')
+        self.quality_entry.insert(0, "75")
+        self.quality_entry.grid(row=1, column=1, padx=5, pady=2, sticky="w")
+
+        ttk.Label(options_frame, text="Max Size (px):", style='TLabel').grid(
+            row=1, column=2, padx=5, pady=2, sticky="w")
+        self.max_dimension_entry = ttk.Entry(
+            options_frame, width=8, style='TEntry')
+        self.max_dimension_entry.grid(
+            row=1, column=3, padx=5, pady=2, sticky="w")
+
+        # Convert / Cancel Buttons
         ttk.Button(main_frame, text="Convert Images to PDF", command=self._execute_conversion).grid(
-            row=2, column=0, columnspan=2, pady=15)
+            row=3, column=0, padx=5, pady=15, sticky="e")
+        ttk.Button(main_frame, text="Cancel", command=self._cancel_conversions).grid(
+            row=3, column=1, padx=5, pady=15, sticky="w")
 
         # Status Bar
         self.status_label = ttk.Label(main_frame, text="Ready.", anchor="w", style='TLabel',
                                       background=self.colors["status_bg"], foreground=self.colors["text_light"])
         self.status_label.grid(
-            row=3, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+            row=4, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
 
-        self.converter = ImageToPDFConverter()
+        # Conversions run on worker threads; they report back through this
+        # queue, which the Tk main loop polls.
+        self.events = queue.Queue()
+        self.cancel_events = {}
+        self.next_job_id = 1
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.master.after(100, self._poll_conversions)
 
     def _update_status(self, message):
         self.status_label.config(text=message)
         self.master.update_idletasks()
 
+    def _run_conversion(self, job_id, cancel_event, image_paths, output_pdf_path, options):
+        """Worker thread body. Never touches Tk widgets directly."""
+        converter = ImageToPDFConverter(
+            lambda message: self.events.put(("status", job_id, message)),
+            cancel_event)
+        try:
+            converter.convert_images_to_pdf(image_paths, output_pdf_path, **options)
+        except ConversionCancelled:
+            pass
+        except Exception as e:
+            self.events.put(("status", job_id, f"Unexpected error: {e}"))
+        finally:
+            self.events.put(("finished", job_id, None))
+
+    def _poll_conversions(self):
+        """Applies queued worker messages to the GUI, then polls again."""
+        try:
+            for _ in range(500):
+                kind, job_id, message = self.events.get_nowait()
+                if kind == "finished":
+                    self.cancel_events.pop(job_id, None)
+                    continue
+                if len(self.cancel_events) > 1:
+                    message = f"[job {job_id}] {message}"
+                self._update_status(message)
+        except queue.Empty:
+            pass
+        self.master.after(100, self._poll_conversions)
+
+    def _cancel_conversions(self):
+        if not self.cancel_events:
+            self._update_status("No conversion is running.")
+            return
+        for cancel_event in self.cancel_events.values():
+            cancel_event.set()
+        self._update_status("Cancelling...")
+
+    def _on_close(self):
+        for cancel_event in self.cancel_events.values():
+            cancel_event.set()
+        self.master.destroy()
+
     def _add_images(self):
         filepaths = filedialog.askopenfilenames(
-            filetypes=[("Image files", "*.jpg;*.jpeg;*.png;*.bmp;*.gif")])
+            filetypes=[("Image files", ";".join(
+                "*" + extension for extension in sorted(IMAGE_EXTENSIONS)))])
         if filepaths:
             for fp in filepaths:
                 self.image_listbox.insert(tk.END, os.path.basename(fp))
@@ -192,6 +944,25 @@ class ImageToPDFGUI:
             self.output_entry.delete(0, tk.END)
             self.output_entry.insert(0, filepath)
 
+    def _get_conversion_options(self):
+        """Reads the output option fields. Raises ValueError on bad input."""
+        options = {}
+        page_size = self.page_size_var.get()
+        options['page_size'] = None if page_size == "Original" else page_size
+        for key, entry, label in (('dpi', self.dpi_entry, "Max DPI"),
+                                  ('quality', self.quality_entry, "JPEG Quality"),
+                                  ('max_dimension', self.max_dimension_entry, "Max Size")):
+            text = entry.get().strip()
+            if not text:
+                options[key] = None
+                continue
+            if not text.isdigit() or int(text) < 1:
+                raise ValueError(f"{label} must be a positive whole number.")
+            options[key] = int(text)
+        if options['quality'] is not None and options['quality'] > 95:
+            raise ValueError("JPEG Quality must be between 1 and 95.")
+        return options
+
     def _execute_conversion(self):
         self._update_status("Starting conversion...")
         output_pdf_path = self.output_entry.get()
@@ -207,22 +978,37 @@ class ImageToPDFGUI:
             self._update_status("Conversion failed: No output path.")
             return
 
-        # Pass the GUI's status update method to the converter
-        self.converter.status_callback = self._update_status
-        self.converter.convert_images_to_pdf(self.image_paths, output_pdf_path)
+        try:
+            options = self._get_conversion_options()
+        except ValueError as e:
+            messagebox.showerror("Input Error", str(e))
+            self._update_status("Conversion failed: Invalid output options.")
+            return
 
-        # Reset status callback to default print after operation
-        self.converter.status_callback = print
+        # Convert on a worker thread so the window stays responsive. The
+        # image list is copied, so it can be edited while the job runs.
+        job_id = self.next_job_id
+        self.next_job_id += 1
+        cancel_event = threading.Event()
+        self.cancel_events[job_id] = cancel_event
+        threading.Thread(
+            target=self._run_conversion,
+            args=(job_id, cancel_event, list(self.image_paths),
+                  output_pdf_path, options),
+            daemon=True).start()
 
 
 def main_gui():
+    _load_tkinter()
     root = tk.Tk()
     app = ImageToPDFGUI(root)
     root.mainloop()
 
 
 if __name__ == "__main__":
-    # You can choose to run either the CLI or GUI version here
-    # For a standalone GUI app, uncomment main_gui() and comment out main_cli()
-    main_gui()
-    # main_cli() # Uncomment this line and comment main_gui() to run the CLI version
+    # Run the CLI when arguments are given (e.g. from batch scripts),
+    # otherwise open the GUI.
+    if len(sys.argv) > 1:
+        main_cli()
+    else:
+        main_gui()
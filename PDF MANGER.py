@@ -1,95 +1,3015 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import PyPDF2
 import os
-from PIL import Image  # Used for saving extracted images in common formats
 import io
+import bisect
+import contextlib
+import csv
+import functools
+import glob
+import importlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import queue
+import re
+import shlex
+import sys
+import argparse
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+try:
+    import fcntl  # Only used for reflink copies on Linux
+except ImportError:
+    fcntl = None
+try:
+    import resource  # Only used for peak memory in operation metrics
+except ImportError:
+    resource = None
+
+
+class _LazyModule:
+    """
+    Stands in for a module until one of its attributes is used, then
+    imports it and rebinds the global `binding` to the real module, so
+    later lookups cost nothing. importlib's per-module locks make the
+    first use safe from several threads.
+    """
+
+    def __init__(self, name, binding=None):
+        self._name = name
+        self._binding = binding or name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        globals()[self._binding] = module
+        return getattr(module, attr)
+
+
+# Heavy imports are deferred: the GUI draws before PDF parsing is loaded,
+# and CLI runs that fail argument checks or skip images never load them.
+PyPDF2 = _LazyModule("PyPDF2")
+Image = _LazyModule("PIL.Image", "Image")  # Used for saving extracted images in common formats
+ImageOps = _LazyModule("PIL.ImageOps", "ImageOps")
+futures = _LazyModule("concurrent.futures", "futures")
+hashlib = _LazyModule("hashlib")
+shutil = _LazyModule("shutil")
+tempfile = _LazyModule("tempfile")
+tracemalloc = _LazyModule("tracemalloc")  # Only for metrics with trace_memory
+sqlite3 = _LazyModule("sqlite3")  # Only for the text index
+
+# Set by _load_tkinter() when the GUI starts, so the CLI runs without a display.
+tk = ttk = filedialog = messagebox = None
+
+
+def _load_tkinter():
+    global tk, ttk, filedialog, messagebox
+    import tkinter as tk
+    from tkinter import ttk, filedialog, messagebox
+
+
+class OperationCancelled(BaseException):
+    """
+    Raised inside a PDFMaster operation when its cancel event is set.
+
+    Like KeyboardInterrupt, it derives from BaseException so the operations'
+    own "except Exception" handlers do not report it as an error.
+    """
+
+
+_SharedPdfReader = None  # Defined by _open_shared_reader() once PyPDF2 is loaded
+_shared_reader_lock = threading.Lock()
+
+
+def _open_shared_reader(path):
+    """Opens path as a _SharedPdfReader, defining the class on first use."""
+    global _SharedPdfReader
+    with _shared_reader_lock:
+        if _SharedPdfReader is None:
+            class _SharedPdfReader(PyPDF2.PdfReader):
+                """
+                A PdfReader that several job threads can use at once.
+
+                PdfReader parses objects lazily by seeking in one shared
+                stream, so every stream access is serialized by a lock. The
+                page tree is flattened up front, because flattening fills in
+                reader state.
+                """
+
+                def __init__(self, *args, **kwargs):
+                    self._stream_lock = threading.RLock()
+                    super().__init__(*args, **kwargs)
+                    len(self.pages)
+
+                def get_object(self, indirect_reference):
+                    with self._stream_lock:
+                        return super().get_object(indirect_reference)
+
+                @property
+                def pdf_header(self):
+                    with self._stream_lock:
+                        return super().pdf_header
+    return _SharedPdfReader(path)
+
+
+class PdfReaderCache:
+    """
+    An LRU cache of parsed PdfReader objects shared by PDFMaster operations.
+
+    Entries are keyed by absolute path and checked against the file's size
+    and modification time, so a changed file is parsed again. PdfReader keeps
+    the whole file in memory, so the file size is used as the memory cost of
+    an entry. Files larger than max_bytes are never cached. Readers are safe
+    to share between threads.
+    """
+
+    def __init__(self, max_entries=8, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (size, mtime_ns, reader)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, input_path):
+        """Returns a parsed PdfReader for input_path, parsing it if needed."""
+        path = os.path.abspath(input_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._entries.move_to_end(path)
+                return entry[2]
+
+        reader = _open_shared_reader(path)
+        if self.max_entries > 0 and stat.st_size <= self.max_bytes:
+            with self._lock:
+                self._discard(path)
+                self._entries[path] = (stat.st_size, stat.st_mtime_ns, reader)
+                self._total_bytes += stat.st_size
+                while (len(self._entries) > self.max_entries
+                       or self._total_bytes > self.max_bytes):
+                    self._discard(next(iter(self._entries)))
+        return reader
+
+    def invalidate(self, input_path=None):
+        """Drops the cached reader for input_path, or every reader if None."""
+        with self._lock:
+            if input_path is None:
+                self._entries.clear()
+                self._total_bytes = 0
+            else:
+                self._discard(os.path.abspath(input_path))
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry:
+            self._total_bytes -= entry[0]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PageSelection:
+    """
+    A set of 1-based page numbers, stored as ranges instead of a list, so
+    "1-200000" costs as little as "1". Membership tests take O(log n) in the
+    number of ranges.
+
+    Text form: comma-separated terms, each N, A-B, A- (to the last page) or
+    A-B:STEP (e.g. "1-9:2" for odd pages up to 9). Negative numbers count
+    from the end: -1 is the last page and "5--1" is page 5 to the last page.
+    Selections with negative numbers must be resolve()d against a page count
+    before use; open-ended ones must be resolved before iteration.
+    """
+
+    _TERM = re.compile(r"^(-?\d+)(?:(-)(-?\d+)?)?(?::(\d+))?$")
+
+    def __init__(self, terms=()):
+        # (start, stop, step) tuples; stop is None for open-ended ranges.
+        self._terms = []
+        for start, stop, step in terms:
+            self._check_term(start, stop, step)
+            if stop == start:
+                step = 1
+            self._terms.append((start, stop, step))
+        self._terms.sort(key=lambda term: (term[0] < 0, term[0]))
+        self._from_end = any(start < 0 or (stop is not None and stop < 0)
+                             for start, stop, step in self._terms)
+        self._build_groups()
+
+    @staticmethod
+    def _check_term(start, stop, step):
+        """Raises ValueError for a term no document can satisfy."""
+        if start == 0 or stop == 0:
+            raise ValueError("Page numbers start at 1; use -1 for the last page.")
+        if step < 1:
+            raise ValueError("Range step must be a positive number.")
+        if stop is not None and (0 < stop < start or stop < start < 0):
+            raise ValueError(
+                "Start page cannot be greater than end page in a range.")
+
+    @classmethod
+    def parse_term(cls, part):
+        """
+        Parses one term of the text form into (start, stop, step); stop is
+        None for open-ended ranges. Raises ValueError on bad input.
+        """
+        match = cls._TERM.match(part)
+        if not match:
+            raise ValueError(f"invalid page term '{part}'")
+        start, dash, stop, step = match.groups()
+        start = int(start)
+        if not dash:
+            stop = start
+        elif stop is not None:
+            stop = int(stop)
+        step = int(step) if step else 1
+        cls._check_term(start, stop, step)
+        return start, stop, step
+
+    @classmethod
+    def parse(cls, pages_str):
+        """Parses the text form. Raises ValueError on bad input."""
+        terms = []
+        for part in (pages_str or "").split(','):
+            part = part.strip()
+            if part:
+                terms.append(cls.parse_term(part))
+        return cls(terms)
+
+    @classmethod
+    def from_pages(cls, page_numbers):
+        """Builds a selection from page numbers, joining consecutive runs."""
+        terms = []
+        for number in sorted(set(page_numbers)):
+            if terms and terms[-1][1] == number - 1 and number != 0:
+                terms[-1] = (terms[-1][0], number, 1)
+            else:
+                terms.append((number, number, 1))
+        return cls(terms)
+
+    @classmethod
+    def coerce(cls, pages):
+        """Accepts a PageSelection, its text form, None or page numbers."""
+        if isinstance(pages, cls):
+            return pages
+        if pages is None or isinstance(pages, str):
+            return cls.parse(pages)
+        return cls.from_pages(pages)
+
+    def _build_groups(self):
+        """
+        Sorts the terms into groups with disjoint spans, so a page is looked
+        up by bisecting the group starts. Overlapping terms share a group.
+        """
+        self._groups = []
+        self._starts = []
+        if self._from_end:
+            return
+        for start, stop, step in self._terms:
+            if stop is None:
+                end = math.inf
+            else:
+                end = start + (stop - start) // step * step
+            if self._groups:
+                group_start, group_end, terms = self._groups[-1]
+                contiguous = step == 1 and terms[0][2] == 1 and len(terms) == 1
+                if start <= group_end + contiguous:
+                    if contiguous:
+                        terms = [(group_start, max(group_end, end), 1)]
+                    else:
+                        terms = terms + [(start, end, step)]
+                    self._groups[-1] = (group_start, max(group_end, end), terms)
+                    continue
+            self._groups.append((start, end, [(start, end, step)]))
+        self._starts = [group[0] for group in self._groups]
+
+    def _require_resolved(self, need_end=False):
+        if self._from_end or (need_end and any(
+                stop is None for start, stop, step in self._terms)):
+            raise ValueError(
+                f"Page selection '{self}' must be resolved against a page count first.")
+
+    def resolve(self, num_pages):
+        """
+        Returns the selection for a document of num_pages pages: negative
+        numbers and open ends become page numbers and pages outside
+        1..num_pages are dropped. Raises ValueError for a range that ends
+        before it starts in this document (e.g. "-3-5" in 100 pages).
+        """
+        terms = []
+        for start, stop, step in self._terms:
+            explicit_stop = stop is not None
+            start = start + num_pages + 1 if start < 0 else start
+            stop = num_pages if stop is None else stop
+            stop = stop + num_pages + 1 if stop < 0 else stop
+            if explicit_stop and start > stop:
+                raise ValueError(
+                    f"Start page cannot be greater than end page in a range "
+                    f"({start}-{stop} of {num_pages} pages).")
+            if start < 1:
+                start += -(-(1 - start) // step) * step
+            stop = min(stop, num_pages)
+            if start <= stop:
+                terms.append((start, stop, step))
+        return PageSelection(terms)
+
+    def out_of_range(self, num_pages):
+        """True if an explicit page number lies outside 1..num_pages."""
+        return any(not 1 <= abs(number) <= num_pages
+                   for start, stop, step in self._terms
+                   for number in (start, stop) if number is not None)
+
+    def __contains__(self, page_number):
+        self._require_resolved()
+        index = bisect.bisect_right(self._starts, page_number) - 1
+        if index < 0:
+            return False
+        group_start, group_end, terms = self._groups[index]
+        if page_number > group_end:
+            return False
+        return any(start <= page_number <= end and (page_number - start) % step == 0
+                   for start, end, step in terms)
+
+    def _iter_group(self, terms):
+        if len(terms) == 1:
+            start, end, step = terms[0]
+            return iter(range(start, end + 1, step))
+        merged = heapq.merge(*(range(start, end + 1, step)
+                               for start, end, step in terms))
+        return (number for number, _ in itertools.groupby(merged))
+
+    def __iter__(self):
+        self._require_resolved(need_end=True)
+        for group_start, group_end, terms in self._groups:
+            yield from self._iter_group(terms)
+
+    def __len__(self):
+        self._require_resolved(need_end=True)
+        return sum(len(range(terms[0][0], terms[0][1] + 1, terms[0][2]))
+                   if len(terms) == 1 else sum(1 for _ in self._iter_group(terms))
+                   for group_start, group_end, terms in self._groups)
+
+    def __bool__(self):
+        return bool(self._terms)
+
+    def __str__(self):
+        parts = []
+        for start, stop, step in self._terms:
+            if stop == start:
+                parts.append(str(start))
+                continue
+            part = f"{start}-{'' if stop is None else stop}"
+            parts.append(f"{part}:{step}" if step > 1 else part)
+        return ",".join(parts)
+
+    def __repr__(self):
+        return f"PageSelection('{self}')"
+
+
+def parse_page_ranges(ranges_str):
+    """
+    Parses a comma-separated string of page ranges (e.g. "1-10,11,12-")
+    into a list of (first, last) tuples, in the given order. Terms are
+    PageSelection terms without a step: last is None for "A-" (to the last
+    page) and negative numbers count from the end; see resolve_page_range.
+    Raises ValueError on bad input.
+    """
+    ranges = []
+    for part in ranges_str.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, last, step = PageSelection.parse_term(part)
+        if step != 1:
+            raise ValueError(f"page range '{part}' cannot have a step")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("no page ranges given")
+    return ranges
+
+
+def resolve_page_range(first, last, num_pages):
+    """
+    Returns a (first, last) tuple from parse_page_ranges as page numbers of
+    a num_pages document. Raises ValueError if it lies outside the document.
+    """
+    text = str(first) if last == first else f"{first}-{'' if last is None else last}"
+    first = first + num_pages + 1 if first < 0 else first
+    last = num_pages if last is None else last
+    last = last + num_pages + 1 if last < 0 else last
+    if not 1 <= first <= last <= num_pages:
+        raise ValueError(f"Page range {text} is out of range (1-{num_pages}).")
+    return first, last
+
+
+def _reachable_bytes(obj, seen):
+    """
+    Approximates the bytes a page adds to an output file: the sizes of the
+    streams and objects reachable from obj (not following /Parent) that are
+    not already in seen. Returns (bytes, set of newly reached objects).
+    """
+    total = 0
+    new = set()
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, PyPDF2.generic.IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key in seen or key in new:
+                continue
+            new.add(key)
+            obj = obj.get_object()
+            total += 60  # object header and xref entry
+        if isinstance(obj, PyPDF2.generic.StreamObject):
+            total += len(obj._data)
+        if isinstance(obj, PyPDF2.generic.DictionaryObject):
+            total += 30 * len(obj)
+            stack.extend(value for key, value in obj.items() if key != "/Parent")
+        elif isinstance(obj, PyPDF2.generic.ArrayObject):
+            stack.extend(obj)
+    return total, new
+
+
+# Objects that describe document structure rather than shared resources.
+# Merging two of these would corrupt the page tree, so they are never
+# deduplicated.
+_STRUCTURAL_TYPES = ("/Catalog", "/Pages", "/Page")
+
+
+def _digest_direct_object(digest, obj, fingerprints):
+    """
+    Feeds a direct object into digest, with references replaced by the
+    fingerprints of the objects they point to. Returns the approximate
+    serialized size. /Parent links are skipped.
+    """
+    if isinstance(obj, PyPDF2.generic.IndirectObject):
+        digest.update(b"R" + fingerprints[obj.idnum])
+        return 10
+    if isinstance(obj, PyPDF2.generic.DictionaryObject):
+        size = 4
+        digest.update(b"<<")
+        for key in sorted(obj):
+            if key == "/Parent":
+                continue
+            digest.update(key.encode() + b" ")
+            size += len(key) + 1 + _digest_direct_object(
+                digest, obj.raw_get(key), fingerprints)
+        digest.update(b">>")
+        if isinstance(obj, PyPDF2.generic.StreamObject):
+            digest.update(b"stream")
+            digest.update(obj._data)
+            size += len(obj._data) + 20
+        return size
+    if isinstance(obj, PyPDF2.generic.ArrayObject):
+        size = 2
+        digest.update(b"[")
+        for item in obj:
+            size += 1 + _digest_direct_object(digest, item, fingerprints)
+        digest.update(b"]")
+        return size
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer, None)
+    digest.update(type(obj).__name__.encode() + buffer.getvalue() + b";")
+    return len(buffer.getvalue())
+
+
+class _ReferenceFingerprints(dict):
+    """
+    Content fingerprints of a reader's objects by object number, computed
+    on first lookup with _digest_direct_object (for page fingerprints).
+    An object reached again while it is being fingerprinted gets a
+    fingerprint of its number, which is not stored.
+    """
+
+    def __init__(self, reader):
+        super().__init__()
+        self._reader = reader
+        self._visiting = set()
+
+    def __missing__(self, idnum):
+        if idnum in self._visiting:
+            return b"cycle:%d" % idnum
+        generation = next((generation for generation, objects in self._reader.xref.items()
+                           if idnum in objects), 0)
+        obj = self._reader.get_object(PyPDF2.generic.IndirectObject(idnum, generation,
+                                                                    self._reader))
+        self._visiting.add(idnum)
+        try:
+            digest = hashlib.sha256()
+            _digest_direct_object(digest, obj if obj is not None else
+                                  PyPDF2.generic.NullObject(), self)
+        finally:
+            self._visiting.discard(idnum)
+        self[idnum] = digest.digest()
+        return self[idnum]
+
+
+# Page entries that change how a page looks, besides its contents.
+_PAGE_GEOMETRY_KEYS = ("/MediaBox", "/CropBox", "/Rotate", "/UserUnit")
+
+
+def _page_fingerprint(page, fingerprints):
+    """
+    Returns a SHA-256 that is equal for pages that look the same: their
+    decoded content streams with each line stripped of surrounding
+    whitespace and blank lines dropped, the fingerprints of their
+    resources (see _ReferenceFingerprints) and their page boxes and
+    rotation. Annotations are not compared.
+    """
+    digest = hashlib.sha256()
+    for key in _PAGE_GEOMETRY_KEYS:
+        if key in page:
+            digest.update(key.encode())
+            _digest_direct_object(digest, page.raw_get(key), fingerprints)
+    digest.update(b"/Resources")
+    if "/Resources" in page:
+        _digest_direct_object(digest, page.raw_get("/Resources"), fingerprints)
+    contents = page.get("/Contents")
+    contents = contents.get_object() if contents is not None else []
+    if not isinstance(contents, PyPDF2.generic.ArrayObject):
+        contents = [contents]
+    digest.update(b"/Contents")
+    for stream in contents:
+        for line in stream.get_object().get_data().splitlines():
+            line = line.strip()
+            if line:
+                digest.update(line + b"\n")
+    return digest.digest()
+
+
+def _direct_references(obj):
+    """Yields the idnums referenced by a direct object, except via /Parent."""
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, PyPDF2.generic.IndirectObject):
+            yield obj.idnum
+        elif isinstance(obj, PyPDF2.generic.DictionaryObject):
+            stack.extend(value for key, value in obj.items() if key != "/Parent")
+        elif isinstance(obj, PyPDF2.generic.ArrayObject):
+            stack.extend(obj)
+
+
+def _deduplicate_writer_objects(writer):
+    """
+    Keeps one copy of identical objects (fonts, images, form XObjects,
+    content streams, ...) in a PdfWriter and points all references at it.
+
+    An object's fingerprint is a SHA-256 of its contents with each reference
+    replaced by the fingerprint of the referenced object, so two fonts are
+    equal when their descriptors and font files are equal too. Fingerprints
+    are computed bottom-up with an explicit stack. Objects on a reference
+    cycle, pages, the page tree and the trailer's objects are kept as they
+    are. Removed objects are replaced by null so object numbers stay valid.
+
+    Returns (objects removed, approximate bytes saved).
+    """
+    objects = writer._objects
+    protected = {writer._root.idnum if writer._root else None, writer._info.idnum}
+    fingerprints = {}  # idnum -> digest bytes
+    sizes = {}
+    unique = itertools.count()
+
+    def unique_fingerprint():
+        return b"unique:%d" % next(unique)
+
+    state = {}  # idnum -> "visiting" or "done"
+    for first in range(1, len(objects) + 1):
+        if first in state:
+            continue
+        stack = [(first, None)]
+        while stack:
+            idnum, children = stack.pop()
+            obj = objects[idnum - 1] if 0 < idnum <= len(objects) else None
+            if children is None:
+                if idnum in state:
+                    continue
+                if (obj is None or idnum in protected or (
+                        isinstance(obj, PyPDF2.generic.DictionaryObject)
+                        and obj.get("/Type") in _STRUCTURAL_TYPES)):
+                    fingerprints[idnum] = unique_fingerprint()
+                    state[idnum] = "done"
+                    continue
+                state[idnum] = "visiting"
+                children = set(_direct_references(obj))
+                stack.append((idnum, children))
+                stack.extend((child, None) for child in children if child not in state)
+                continue
+            if any(state.get(child) != "done" for child in children):
+                # A child is still being visited: idnum is on a cycle.
+                fingerprints[idnum] = unique_fingerprint()
+            else:
+                digest = hashlib.sha256()
+                sizes[idnum] = _digest_direct_object(digest, obj, fingerprints)
+                fingerprints[idnum] = digest.digest()
+            state[idnum] = "done"
+
+    canonical = {}  # fingerprint -> first idnum
+    replacements = {}  # duplicate idnum -> reference to the kept copy
+    for idnum in range(1, len(objects) + 1):
+        fingerprint = fingerprints[idnum]
+        if fingerprint in canonical:
+            replacements[idnum] = PyPDF2.generic.IndirectObject(
+                canonical[fingerprint], 0, writer)
+        else:
+            canonical[fingerprint] = idnum
+    if not replacements:
+        return 0, 0
+
+    bytes_saved = 0
+    for idnum in replacements:
+        bytes_saved += sizes.get(idnum, 0)
+        objects[idnum - 1] = PyPDF2.generic.NullObject()
+    for obj in objects:
+        stack = [obj]
+        while stack:
+            obj = stack.pop()
+            if isinstance(obj, PyPDF2.generic.DictionaryObject):
+                for key, value in list(obj.items()):
+                    if isinstance(value, PyPDF2.generic.IndirectObject):
+                        if value.idnum in replacements:
+                            obj[key] = replacements[value.idnum]
+                    else:
+                        stack.append(value)
+            elif isinstance(obj, PyPDF2.generic.ArrayObject):
+                for i, value in enumerate(obj):
+                    if isinstance(value, PyPDF2.generic.IndirectObject):
+                        if value.idnum in replacements:
+                            obj[i] = replacements[value.idnum]
+                    else:
+                        stack.append(value)
+    return len(replacements), bytes_saved
+
+
+# Reader for the source PDF, opened once per split worker process, and the
+# zlib level for optimized output (None writes plain output).
+_split_reader = None
+_split_optimize_level = None
+
+
+def _init_split_worker(input_path, optimize_level=None):
+    global _split_reader, _split_optimize_level
+    _split_reader = PyPDF2.PdfReader(input_path)
+    _split_optimize_level = optimize_level
+
+
+def _write_split_chunk(first, last, output_filename):
+    """Writes pages first..last (1-based) of the worker's source PDF."""
+    writer = PyPDF2.PdfWriter()
+    for i in range(first - 1, last):
+        writer.add_page(_split_reader.pages[i])
+    with open(output_filename, 'wb') as output_pdf:
+        if _split_optimize_level is None:
+            writer.write(output_pdf)
+        else:
+            _write_optimized(writer, output_pdf, _split_optimize_level)
+    return output_filename
+
+
+# Image filters whose stream data is already a complete image file.
+_RAW_IMAGE_FILTERS = {"/DCTDecode": ".jpg", "/JPXDecode": ".jp2"}
+# Image dictionary entries that change how the stream data is rendered.
+_IMAGE_FINGERPRINT_KEYS = ("/Width", "/Height", "/BitsPerComponent", "/ColorSpace",
+                           "/Filter", "/DecodeParms", "/Decode", "/ImageMask",
+                           "/Mask", "/SMask")
+
+
+def _image_fingerprint(image):
+    """Hashes an image XObject's encoded stream and decoding parameters."""
+    digest = hashlib.sha256()
+    for key in _IMAGE_FINGERPRINT_KEYS:
+        if key in image:
+            digest.update(f"{key}={image.raw_get(key)!r};".encode())
+    digest.update(image._data)
+    return digest.hexdigest()
+
+
+def _single_filter(stream):
+    """Returns a stream's /Filter, unwrapping a one-element filter array."""
+    filters = stream.get("/Filter")
+    if isinstance(filters, PyPDF2.generic.ArrayObject) and len(filters) == 1:
+        filters = filters[0]
+    return filters
+
+
+def _raw_image_extension(image):
+    """Returns the file extension if the image stream can be written as is."""
+    return _RAW_IMAGE_FILTERS.get(_single_filter(image))
+
+
+def _save_image_xobject(image, output_base):
+    """
+    Decodes an image XObject (see _decode_image_xobject) and writes it to
+    output_base + extension: fax images as Group 4 TIFF, CMYK images as
+    TIFF and everything else as PNG. Raises ValueError for sample formats
+    the decoder does not handle.
+    """
+    pil_image = _decode_image_xobject(image)
+    if _single_filter(image) == "/CCITTFaxDecode":
+        output_filename = output_base + ".tif"
+        pil_image.convert("1").save(output_filename, "TIFF", compression="group4")
+    elif pil_image.mode == "CMYK":
+        output_filename = output_base + ".tif"
+        pil_image.save(output_filename, "TIFF", compression="tiff_lzw")
+    else:
+        output_filename = output_base + ".png"
+        pil_image.save(output_filename, "PNG")
+    return output_filename
+
+
+# PIL modes for image color spaces, and for ICCBased spaces by component count.
+_COLOR_SPACE_MODES = {"/DeviceGray": "L", "/CalGray": "L", "/DeviceRGB": "RGB",
+                      "/CalRGB": "RGB", "/DeviceCMYK": "CMYK"}
+_ICC_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+# PIL raw modes for samples packed below 8 bits per component.
+_PACKED_RAW_MODES = {("L", 1): "1", ("L", 2): "L;2", ("L", 4): "L;4",
+                     ("P", 1): "P;1", ("P", 2): "P;2", ("P", 4): "P;4"}
+
+
+def _color_space_mode(color_space):
+    """Returns the PIL mode for a non-indexed color space, or None."""
+    if isinstance(color_space, PyPDF2.generic.ArrayObject):
+        if color_space[0] == "/ICCBased":
+            return _ICC_MODES.get(int(color_space[1].get_object().get("/N", 0)))
+        color_space = color_space[0]
+    return _COLOR_SPACE_MODES.get(color_space)
+
+
+def _decode_image_xobject(image, draft_size=None):
+    """
+    Decodes an image XObject into a PIL image. A JPEG is decoded at a
+    reduced scale when that still gives at least draft_size pixels.
+    Raises ValueError for sample formats it does not handle.
+    """
+    size = (int(image["/Width"]), int(image["/Height"]))
+    filters = _single_filter(image)
+    decode = [float(value) for value in image.get("/Decode", [])]
+    invert = decode == [1.0, 0.0]
+    if decode and not invert and decode != [0.0, 1.0] * (len(decode) // 2):
+        raise ValueError(f"unsupported /Decode {decode}")
+
+    if filters in ("/DCTDecode", "/JPXDecode"):
+        pil_image = Image.open(io.BytesIO(image._data))
+        if draft_size and filters == "/DCTDecode":
+            pil_image.draft(pil_image.mode, draft_size)
+    elif filters == "/CCITTFaxDecode":
+        pil_image = Image.open(io.BytesIO(image.get_data()))  # PyPDF2 wraps the data as TIFF
+        parms = image.get("/DecodeParms") or {}
+        if parms.get("/BlackIs1"):
+            invert = not invert
+    else:
+        color_space = image.get("/ColorSpace")
+        bits = int(image.get("/BitsPerComponent", 8))
+        palette = None
+        if isinstance(color_space, PyPDF2.generic.ArrayObject) and color_space[0] == "/Indexed":
+            base_mode = _color_space_mode(color_space[1].get_object())
+            lookup = color_space[3].get_object()
+            lookup = lookup.get_data() if isinstance(lookup, PyPDF2.generic.StreamObject) else (
+                lookup.original_bytes if hasattr(lookup, "original_bytes") else bytes(lookup))
+            if base_mode == "L":
+                palette = b"".join(bytes((value,)) * 3 for value in lookup)
+            elif base_mode == "RGB":
+                palette = lookup
+            mode = "P" if palette is not None else None
+        elif image.get("/ImageMask"):
+            mode = "L"  # Stencil masks have no color space; 0 bits are painted
+        else:
+            mode = _color_space_mode(color_space)
+        raw_mode = mode if bits == 8 else _PACKED_RAW_MODES.get((mode, bits))
+        if raw_mode is None:
+            raise ValueError(f"unsupported image format ({color_space}, {bits} bits)")
+        pil_image = Image.frombytes("1" if raw_mode == "1" else mode, size,
+                                    image.get_data(), "raw", raw_mode)
+        if palette is not None:
+            pil_image.putpalette(palette)
+
+    pil_image.load()
+    if invert:
+        if pil_image.mode not in ("1", "L"):
+            raise ValueError(f"unsupported /Decode for a {pil_image.mode} image")
+        pil_image = ImageOps.invert(pil_image.convert("L"))
+    return pil_image
+
+
+def _recompress_image(image, page_side, target_dpi, jpeg_quality):
+    """
+    Re-encodes an image XObject for PDFMaster.compress_images. page_side
+    is the longer side, in points, of the largest page showing the image;
+    the image is assumed to fill it, which never overstates its resolution.
+
+    Images with only black and white pixels are stored losslessly as CCITT
+    Group 4 at full resolution. Other images are downsampled to target_dpi
+    if above it and stored as JPEG; JPEG and JPEG 2000 images that need no
+    downsampling, stencil masks and color-key masked images are kept.
+    Returns (data, entries) for _replace_image_data, or None to keep the
+    image, including when re-encoding would not make it smaller.
+    """
+    if image.get("/ImageMask") or isinstance(image.get("/Mask"), PyPDF2.generic.ArrayObject):
+        return None
+    width, height = int(image["/Width"]), int(image["/Height"])
+    scale = min(1.0, target_dpi * page_side / 72 / max(width, height))
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if scale == 1.0 and _single_filter(image) in ("/DCTDecode", "/JPXDecode"):
+        return None
+
+    pil_image = _decode_image_xobject(image, size)
+    if pil_image.mode not in ("1", "L", "RGB"):
+        pil_image = pil_image.convert("L" if pil_image.mode in ("LA", "I", "I;16", "F") else "RGB")
+    colors = pil_image.getcolors(2) or []
+    bilevel = pil_image.mode == "1" or (colors and all(
+        color in (0, 255, (0, 0, 0), (255, 255, 255)) for _, color in colors))
+
+    buffer = io.BytesIO()
+    NameObject, NumberObject = PyPDF2.generic.NameObject, PyPDF2.generic.NumberObject
+    if bilevel:
+        # Black pixels become 1 bits, which the encoder writes as black runs.
+        ink = pil_image.convert("L").point([255] + [0] * 255, "1")
+        ink.save(buffer, "TIFF", compression="group4", tiffinfo={278: ink.height})
+        tiff = Image.open(buffer)  # Find the single strip holding the G4 data
+        offset, length = tiff.tag_v2[273][0], tiff.tag_v2[279][0]
+        data = buffer.getvalue()[offset:offset + length]
+        parms = PyPDF2.generic.DictionaryObject({
+            NameObject("/K"): NumberObject(-1), NameObject("/Columns"): NumberObject(ink.width),
+            NameObject("/Rows"): NumberObject(ink.height)})
+        entries = {"/Filter": NameObject("/CCITTFaxDecode"), "/DecodeParms": parms,
+                   "/ColorSpace": NameObject("/DeviceGray"), "/BitsPerComponent": NumberObject(1)}
+    else:
+        if pil_image.mode == "1":
+            pil_image = pil_image.convert("L")
+        if pil_image.size != size:
+            # reducing_gap box-reduces first, much faster for large scale factors
+            pil_image = pil_image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        pil_image.save(buffer, "JPEG", quality=jpeg_quality, optimize=True)
+        data = buffer.getvalue()
+        entries = {"/Filter": NameObject("/DCTDecode"),
+                   "/ColorSpace": NameObject("/DeviceGray" if pil_image.mode == "L" else "/DeviceRGB"),
+                   "/BitsPerComponent": NumberObject(8)}
+    if len(data) >= len(image._data):
+        return None
+    width, height = (ink if bilevel else pil_image).size
+    entries["/Width"], entries["/Height"] = NumberObject(width), NumberObject(height)
+    return data, entries
+
+
+def _replace_image_data(image, data, entries):
+    """Swaps re-encoded data into an image XObject owned by a PdfWriter."""
+    for key in ("/Filter", "/DecodeParms", "/Decode"):
+        image.pop(key, None)
+    for key, value in entries.items():
+        image[PyPDF2.generic.NameObject(key)] = value
+    image._data = data
+    if hasattr(image, "decoded_self"):
+        image.decoded_self = None
+
+
+def _image_xobjects(resources, seen=None):
+    """
+    Yields (object number, image) for the image XObjects of a resource
+    dictionary, descending into form XObjects once each.
+    """
+    seen = set() if seen is None else seen
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if not xobjects:
+        return
+    xobjects = xobjects.get_object()
+    for name in xobjects:
+        reference = xobjects.raw_get(name)
+        if not isinstance(reference, PyPDF2.generic.IndirectObject) or reference.idnum in seen:
+            continue
+        xobject = reference.get_object()
+        if xobject.get("/Subtype") == "/Image":
+            yield reference.idnum, xobject
+        elif xobject.get("/Subtype") == "/Form":
+            seen.add(reference.idnum)
+            yield from _image_xobjects(xobject.get("/Resources"), seen)
+
+
+def parse_pipeline(text):
+    """
+    Parses the text form of a pipeline into steps for PDFMaster.run_pipeline.
+
+    Steps are separated by '|':
+        merge FILE [FILE ...]    append all pages of each file
+        remove PAGES             drop pages, e.g. 2,5-7
+        rotate ANGLE [PAGES]     rotate pages (all pages if omitted)
+        extract PAGES            keep only these pages
+        replace PAGE FILE        replace a page with page 1 of FILE
+        add POSITION FILE        insert page 1 of FILE at POSITION
+
+    Example: "merge a.pdf b.pdf | remove 3 | rotate 90 1-2"
+    Raises ValueError on bad input.
+    """
+    steps = []
+    for chunk in text.split('|'):
+        words = shlex.split(chunk)
+        if not words:
+            raise ValueError("Empty pipeline step.")
+        op, args = words[0].lower(), words[1:]
+        if op == "merge" and args:
+            steps.append({"op": op, "inputs": args})
+        elif op in ("remove", "extract") and len(args) == 1:
+            steps.append({"op": op, "pages": PageSelection.parse(args[0])})
+        elif op == "rotate" and len(args) in (1, 2):
+            steps.append({"op": op, "angle": int(args[0]),
+                          "pages": PageSelection.parse(args[1] if len(args) == 2 else "")})
+        elif op in ("replace", "add") and len(args) == 2:
+            steps.append({"op": op, "page": int(args[0]), "source": args[1]})
+        else:
+            raise ValueError(f"Invalid pipeline step: '{chunk.strip()}'")
+    return steps
+
+
+def _recompress_stream(stream, level):
+    """
+    Flate-compresses a stream's data at level if it is unfiltered or only
+    Flate-encoded. Returns (data, added_flate): the original data and False
+    if the stream has other filters or would not get smaller.
+    """
+    filters = stream.get("/Filter")
+    if isinstance(filters, PyPDF2.generic.ArrayObject) and len(filters) == 1:
+        filters = filters[0]
+    if filters is None:
+        raw = stream._data
+    elif filters == "/FlateDecode":
+        try:
+            raw = zlib.decompress(stream._data)
+        except zlib.error:
+            return stream._data, False
+    else:
+        return stream._data, False
+    data = zlib.compress(raw, level)
+    if len(data) >= len(stream._data):
+        return stream._data, False
+    return data, filters is None
+
+
+def _serialize_stream(stream, data, added_flate):
+    """Serializes a stream object with replacement data, without changing it."""
+    entries = PyPDF2.generic.DictionaryObject(
+        (key, value) for key, value in stream.items() if key != "/Length")
+    if added_flate:
+        entries[PyPDF2.generic.NameObject("/Filter")] = PyPDF2.generic.NameObject("/FlateDecode")
+    entries[PyPDF2.generic.NameObject("/Length")] = PyPDF2.generic.NumberObject(len(data))
+    buffer = io.BytesIO()
+    entries.write_to_stream(buffer, None)
+    buffer.write(b"\nstream\n" + data + b"\nendstream")
+    return buffer.getvalue()
+
+
+class _ObjectStreamWriter:
+    """
+    Writes the objects of a compact (PDF 1.5) file. Stream objects are
+    written directly; other objects are packed into Flate-compressed object
+    streams of up to OBJECTS_PER_STREAM objects. close() writes a compressed
+    xref stream in place of a classic xref table and trailer.
+    """
+
+    OBJECTS_PER_STREAM = 100
+
+    def __init__(self, fileobj, level, new_id):
+        self._file = fileobj
+        self._level = level
+        self._new_id = new_id  # Allocates object numbers for object streams
+        self._entries = {}  # object id -> (type, field 2, field 3) xref entry
+        self._pending = []
+
+    def write_object(self, obj_id, data, is_stream):
+        if not is_stream:
+            self._pending.append((obj_id, data))
+            if len(self._pending) == self.OBJECTS_PER_STREAM:
+                self._flush()
+            return
+        self._entries[obj_id] = (1, self._file.tell(), 0)
+        self._file.write(b"%d 0 obj\n" % obj_id + data + b"\nendobj\n")
+
+    def _flush(self):
+        if not self._pending:
+            return
+        stream_id = self._new_id()
+        offsets, body = [], io.BytesIO()
+        for index, (obj_id, data) in enumerate(self._pending):
+            offsets.append(b"%d %d" % (obj_id, body.tell()))
+            body.write(data + b"\n")
+            self._entries[obj_id] = (2, stream_id, index)
+        header = b" ".join(offsets) + b"\n"
+        data = zlib.compress(header + body.getvalue(), self._level)
+        self._entries[stream_id] = (1, self._file.tell(), 0)
+        self._file.write(
+            b"%d 0 obj\n<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n"
+            % (stream_id, len(self._pending), len(header), len(data))
+            + data + b"\nendstream\nendobj\n")
+        self._pending = []
+
+    def close(self, trailer):
+        """Writes the xref stream; trailer holds the /Root, /Info, ... entries."""
+        self._flush()
+        xref_id = self._new_id()
+        xref_offset = self._file.tell()
+        self._entries[xref_id] = (1, xref_offset, 0)
+        width = 4 if xref_offset < 2 ** 32 else 8
+        rows = []
+        for obj_id in range(xref_id + 1):
+            kind, field2, field3 = self._entries.get(obj_id, (0, 0, 65535 if obj_id == 0 else 0))
+            rows.append(bytes((kind,)) + field2.to_bytes(width, "big") + field3.to_bytes(2, "big"))
+        data = zlib.compress(b"".join(rows), self._level)
+        self._file.write(
+            b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 %d 2]\n" % (xref_id, xref_id + 1, width)
+            + trailer + b"/Filter /FlateDecode /Length %d >>\nstream\n" % len(data)
+            + data + b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % xref_offset)
+
+
+def _write_optimized(writer, fileobj, level=6, workers=1):
+    """
+    Writes a PdfWriter's document compactly: object streams, an xref stream,
+    and unfiltered or Flate streams recompressed at the given zlib level.
+    Compression runs on `workers` threads (zlib releases the GIL), with a
+    bounded number of streams in flight. The writer's objects are not
+    changed, since some of them belong to (cached) readers.
+
+    Returns an estimate of the size PdfWriter.write would have produced.
+    """
+    if not writer._root:
+        writer._root = writer._add_object(writer._root_object)
+    writer._sweep_indirect_references(writer._root)
+    objects = writer._objects
+    ids = itertools.count(len(objects) + 1)
+    fileobj.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    body = _ObjectStreamWriter(fileobj, level, lambda: next(ids))
+    plain_size = 15 + 20 * len(objects)  # Header and classic xref table
+
+    def finish(idnum, obj, future):
+        nonlocal plain_size
+        if future is None:
+            buffer = io.BytesIO()
+            obj.write_to_stream(buffer, None)
+            body.write_object(idnum, buffer.getvalue(), False)
+            plain_size += len(buffer.getvalue()) + 20
+            return
+        data, added_flate = future.result()
+        serialized = _serialize_stream(obj, data, added_flate)
+        body.write_object(idnum, serialized, True)
+        plain_size += len(serialized) - len(data) + len(obj._data) + 20
+
+    pending = deque()
+    executor = futures.ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for idnum, obj in enumerate(objects, 1):
+            if obj is None:
+                continue
+            future = None
+            if isinstance(obj, PyPDF2.generic.StreamObject):
+                future = executor.submit(_recompress_stream, obj, level)
+            pending.append((idnum, obj, future))
+            if len(pending) >= max(1, workers) * 4:
+                finish(*pending.popleft())
+        while pending:
+            finish(*pending.popleft())
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    trailer = b"/Root %d 0 R\n" % writer._root.idnum
+    if writer._info is not None:
+        trailer += b"/Info %d 0 R\n" % writer._info.idnum
+    if hasattr(writer, "_ID"):
+        buffer = io.BytesIO()
+        writer._ID.write_to_stream(buffer, None)
+        trailer += b"/ID " + buffer.getvalue() + b"\n"
+    body.close(trailer)
+    return plain_size
+
+
+class _PDFObjectCopier:
+    """
+    Writes PDF objects to a file, copying in objects of PdfReaders under new
+    object numbers. A reference to an object that has not been copied yet
+    allocates its number and queues it; _write_queued() writes the queue.
+    Subclasses write the document structure around the copied objects.
+
+    With a compression_level, streams are recompressed (see
+    _recompress_stream) and objects go through an _ObjectStreamWriter.
+    """
+
+    def __init__(self, fileobj, next_id, compression_level=None):
+        self._file = fileobj
+        self._offsets = {}  # object id -> (file offset, generation)
+        self._next_id = next_id
+        self._ref_map = {}
+        self._queue = deque()
+        self._compression_level = compression_level
+        self._body = None
+        if compression_level is not None:
+            self._body = _ObjectStreamWriter(fileobj, compression_level, self._new_id)
+
+    def _new_id(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _write_object(self, obj_id, data, generation=0, is_stream=False):
+        if self._body is not None:
+            self._body.write_object(obj_id, data, is_stream)
+            return
+        self._offsets[obj_id] = (self._file.tell(), generation)
+        self._file.write(b"%d %d obj\n" % (obj_id, generation) + data + b"\nendobj\n")
+
+    def _output_id(self, reference):
+        """Maps a source reference to an output object, queueing new ones."""
+        key = (id(reference.pdf), reference.idnum, reference.generation)
+        obj_id = self._ref_map.get(key)
+        if obj_id is None:
+            obj_id = self._ref_map[key] = self._new_id()
+            self._queue.append((reference, obj_id))
+        return obj_id
+
+    def _write_value(self, out, obj):
+        if isinstance(obj, PyPDF2.generic.IndirectObject):
+            out.write(b"%d 0 R" % self._output_id(obj))
+        elif isinstance(obj, PyPDF2.generic.DictionaryObject):
+            is_stream = isinstance(obj, PyPDF2.generic.StreamObject)
+            if is_stream:
+                data, added_flate = obj._data, False
+                if self._compression_level is not None:
+                    data, added_flate = _recompress_stream(obj, self._compression_level)
+            out.write(b"<<")
+            for key, value in obj.items():
+                if is_stream and key == "/Length":
+                    continue
+                out.write(b"\n")
+                key.write_to_stream(out, None)
+                out.write(b" ")
+                self._write_value(out, value)
+            if is_stream:
+                if added_flate:
+                    out.write(b"\n/Filter /FlateDecode")
+                out.write(b"\n/Length %d\n>>\nstream\n" % len(data))
+                out.write(data)
+                out.write(b"\nendstream")
+            else:
+                out.write(b"\n>>")
+        elif isinstance(obj, PyPDF2.generic.ArrayObject):
+            out.write(b"[")
+            for i, item in enumerate(obj):
+                if i:
+                    out.write(b" ")
+                self._write_value(out, item)
+            out.write(b"]")
+        else:
+            obj.write_to_stream(out, None)
+
+    def _serialize(self, obj):
+        buffer = io.BytesIO()
+        self._write_value(buffer, obj)
+        return buffer.getvalue()
+
+    def _write_page(self, page_id, page, parent):
+        """Writes a page dictionary with its /Parent replaced by parent (bytes)."""
+        body = self._serialize(PyPDF2.generic.DictionaryObject(
+            (key, value) for key, value in page.items() if key != "/Parent"))
+        self._write_object(page_id, body[:-2] + b"/Parent " + parent + b"\n>>")
+
+    def _write_queued(self):
+        while self._queue:
+            reference, obj_id = self._queue.popleft()
+            obj = reference.get_object()
+            self._write_object(obj_id, b"null" if obj is None else self._serialize(obj),
+                               is_stream=isinstance(obj, PyPDF2.generic.StreamObject))
+
+
+class _StreamingPDFMerger(_PDFObjectCopier):
+    """
+    Appends the pages of PdfReaders to an output file, one source at a time.
+
+    The objects a page needs are copied to the output as soon as the page is
+    added, with object numbers remapped, so memory use is bounded by a single
+    source. Pages are grouped under intermediate /Pages nodes that are
+    written as they fill up; the root node, catalog and cross-reference
+    table are written by close(). Inherited page attributes are copied onto
+    each page. Document-level data (outlines, forms, named destinations) is
+    not carried over. With a compression_level the output is optimized as
+    in _write_optimized, but streams are compressed on the writing thread.
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    PAGES_PER_NODE = 256
+
+    def __init__(self, fileobj, compression_level=None):
+        fileobj.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        super().__init__(fileobj, 3, compression_level)
+        self._nodes = []  # (object id, page count) of written /Pages nodes
+        self._node_id = None
+        self._node_kids = []
+        self.page_count = 0
+
+    def _page_parent(self):
+        """Returns the /Pages node for the next page, writing full nodes."""
+        if self._node_id is None or len(self._node_kids) == self.PAGES_PER_NODE:
+            self._flush_node()
+            self._node_id = self._new_id()
+        return self._node_id
+
+    def _flush_node(self):
+        if not self._node_kids:
+            return
+        kids = b" ".join(b"%d 0 R" % kid for kid in self._node_kids)
+        self._write_object(self._node_id, b"<< /Type /Pages /Parent %d 0 R /Kids [%s] /Count %d >>"
+                           % (self.PAGES_ID, kids, len(self._node_kids)))
+        self._nodes.append((self._node_id, len(self._node_kids)))
+        self._node_kids = []
+
+    def add_reader(self, reader, check_cancelled=None):
+        """Copies every page of reader, and everything the pages use."""
+        self._ref_map = {}
+        self._queue = deque()
+        pages = reader.pages
+        # Page objects are written explicitly, so they get numbers up front;
+        # links between pages then resolve to the output pages.
+        page_ids = []
+        for page in pages:
+            page_id = self._new_id()
+            if page.indirect_reference is not None:
+                self._ref_map[(id(reader), page.indirect_reference.idnum,
+                               page.indirect_reference.generation)] = page_id
+            page_ids.append(page_id)
+        # Any reference to the source page tree points at the output tree.
+        for reference in _page_tree_nodes(reader):
+            self._ref_map[(id(reader), reference.idnum,
+                           reference.generation)] = self.PAGES_ID
+
+        for page, page_id in zip(pages, page_ids):
+            if check_cancelled:
+                check_cancelled()
+            self._write_page(page_id, page, b"%d 0 R" % self._page_parent())
+            self._node_kids.append(page_id)
+            self.page_count += 1
+            self._write_queued()
+        self._ref_map = {}
+
+    def close(self):
+        """Writes the page tree root, catalog, xref table and trailer."""
+        self._flush_node()
+        kids = b" ".join(b"%d 0 R" % node_id for node_id, count in self._nodes)
+        self._write_object(self.PAGES_ID, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                           % (kids, self.page_count))
+        self._write_object(self.CATALOG_ID, b"<< /Type /Catalog /Pages %d 0 R >>"
+                           % self.PAGES_ID)
+        if self._body is not None:
+            self._body.close(b"/Root %d 0 R\n" % self.CATALOG_ID)
+            return
+        xref_offset = self._file.tell()
+        self._file.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next_id)
+        for obj_id in range(1, self._next_id):
+            offset = self._offsets.get(obj_id)
+            self._file.write(b"0000000000 65535 f \n" if offset is None
+                             else b"%010d 00000 n \n" % offset[0])
+        self._file.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                         % (self._next_id, self.CATALOG_ID, xref_offset))
+
+
+class _IncrementalPDFUpdate(_PDFObjectCopier):
+    """
+    Appends an incremental update to the end of a PDF file: new versions of
+    changed objects, a cross-reference section for just those objects and a
+    trailer that links to the previous section with /Prev. The rest of the
+    file is left as it is. Objects of other documents (e.g. a replacement
+    page) are copied in under new object numbers.
+
+    The new section is an xref stream if the file's last one was, and a
+    classic xref table otherwise.
+    """
+
+    def __init__(self, fileobj, reader, previous_xref, xref_stream):
+        # PyPDF2 drops /Size from the trailers of xref streams, so new object
+        # numbers start after the highest number in use.
+        next_id = int(reader.trailer.get("/Size", 0))
+        for idnum in itertools.chain(reader.xref_objStm, *reader.xref.values()):
+            next_id = max(next_id, idnum + 1)
+        super().__init__(fileobj, next_id)
+        self._reader = reader
+        self._previous_xref = previous_xref
+        self._xref_stream = xref_stream
+        self._null_id = None
+        self._file.write(b"\n")  # The original may not end with a newline
+
+    def _write_value(self, out, obj):
+        # References within the updated document keep their numbers.
+        if isinstance(obj, PyPDF2.generic.IndirectObject) and obj.pdf is self._reader:
+            out.write(b"%d %d R" % (obj.idnum, obj.generation))
+        else:
+            super()._write_value(out, obj)
+
+    def update_object(self, reference, obj):
+        """Writes obj as the new version of the object at reference."""
+        self._write_object(reference.idnum, self._serialize(obj), reference.generation)
+
+    def import_page(self, page, parent):
+        """
+        Copies a page of another document under parent (a reference in this
+        document) and returns a reference to the new page. Attributes the
+        page would otherwise inherit from its new parents are set on it.
+        """
+        source = page.pdf
+        source_ref = page.indirect_reference
+        page = PyPDF2.generic.DictionaryObject(page)
+        page.setdefault(PyPDF2.generic.NameObject("/Resources"),
+                        PyPDF2.generic.DictionaryObject())
+        page.setdefault(PyPDF2.generic.NameObject("/Rotate"), PyPDF2.generic.NumberObject(0))
+        if "/MediaBox" in page:
+            page.setdefault(PyPDF2.generic.NameObject("/CropBox"), page.raw_get("/MediaBox"))
+        page_id = self._new_id()
+        # Back-references (an annotation's /P, a field's /Parent, a /Dest)
+        # must not pull in the source's page tree and its other pages: the
+        # page itself maps to the new page, /Pages nodes to parent and other
+        # pages to a null object.
+        for reference in _page_tree_nodes(source):
+            self._ref_map.setdefault((id(source), reference.idnum, reference.generation),
+                                     parent.idnum)
+        for other in source.pages:
+            other_ref = other.indirect_reference
+            if other_ref is not None and other_ref != source_ref:
+                if self._null_id is None:
+                    self._null_id = self._new_id()
+                    self._write_object(self._null_id, b"null")
+                self._ref_map.setdefault((id(source), other_ref.idnum, other_ref.generation),
+                                         self._null_id)
+        if source_ref is not None:
+            self._ref_map[(id(source), source_ref.idnum, source_ref.generation)] = page_id
+        self._write_page(page_id, page, self._serialize(parent))
+        self._write_queued()
+        return PyPDF2.generic.IndirectObject(page_id, 0, self._reader)
+
+    def _xref_subsections(self):
+        """Yields (first id, [(offset, generation), ...]) for runs of ids."""
+        run_start, run = None, []
+        for obj_id in sorted(self._offsets):
+            if run and obj_id != run_start + len(run):
+                yield run_start, run
+                run = []
+            if not run:
+                run_start = obj_id
+            run.append(self._offsets[obj_id])
+        if run:
+            yield run_start, run
+
+    def close(self):
+        """Writes the cross-reference section and trailer."""
+        trailer = b""
+        for key in ("/Root", "/Info", "/ID"):
+            if key in self._reader.trailer:
+                trailer += key.encode() + b" " + self._serialize(
+                    self._reader.trailer.raw_get(key)) + b"\n"
+        trailer += b"/Prev %d\n" % self._previous_xref
+
+        if not self._xref_stream:
+            xref_offset = self._file.tell()
+            # Starting with the free-list head keeps readers from treating
+            # the section as wrongly numbered.
+            self._file.write(b"xref\n0 1\n0000000000 65535 f \n")
+            for first, entries in self._xref_subsections():
+                self._file.write(b"%d %d\n" % (first, len(entries)))
+                for offset, generation in entries:
+                    self._file.write(b"%010d %05d n \n" % (offset, generation))
+            self._file.write(b"trailer\n<< /Size %d\n" % self._next_id + trailer + b">>\n")
+        else:
+            xref_id = self._new_id()
+            xref_offset = self._file.tell()
+            self._offsets[xref_id] = (xref_offset, 0)
+            offset_width = 4 if xref_offset < 2 ** 32 else 8
+            rows, index = [], []
+            for first, entries in self._xref_subsections():
+                index.append(b"%d %d" % (first, len(entries)))
+                for offset, generation in entries:
+                    rows.append(b"\x01" + offset.to_bytes(offset_width, "big")
+                                + generation.to_bytes(2, "big"))
+            data = zlib.compress(b"".join(rows))
+            self._file.write(
+                b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 %d 2] /Index [%s]\n"
+                % (xref_id, self._next_id, offset_width, b" ".join(index))
+                + trailer + b"/Filter /FlateDecode /Length %d >>\nstream\n" % len(data)
+                + data + b"\nendstream\nendobj\n")
+        self._file.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+
+def _page_tree_nodes(reader):
+    """Yields the references of the indirect /Pages nodes of a reader's page tree."""
+    stack = [reader.trailer["/Root"].get_object().raw_get("/Pages")]
+    while stack:
+        reference = stack.pop()
+        node = reference.get_object()
+        if node.get("/Type", "/Pages") != "/Pages":
+            continue
+        if isinstance(reference, PyPDF2.generic.IndirectObject):
+            yield reference
+        stack.extend(node.get("/Kids", []))
+
+
+def _find_last_xref(path):
+    """
+    Returns (offset, is_stream) for the last cross-reference section of a
+    PDF file, read from its startxref line. Raises ValueError if missing.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 2048))
+        tail = f.read()
+        position = tail.rfind(b"startxref")
+        if position < 0:
+            raise ValueError("no startxref found")
+        offset = int(tail[position + 9:].split()[0])
+        f.seek(offset)
+        return offset, not f.read(32).lstrip().startswith(b"xref")
+
+
+_FICLONE = 0x40049409  # Linux ioctl that makes a copy-on-write clone
+
+
+def _clone_file(source_path, target_path):
+    """
+    Copies a file. The copy shares the source's disk blocks (a reflink)
+    where the filesystem supports it; otherwise the kernel copies it.
+    """
+    if fcntl is not None:
+        with open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), _FICLONE, source.fileno())
+                return
+            except OSError:
+                pass
+    shutil.copyfile(source_path, target_path)
+
+
+def _page_reference(page):
+    """Returns the reference of a reader page; incremental updates need one."""
+    if page.indirect_reference is None:
+        raise ValueError("page is not an indirect object and cannot be updated")
+    return page.indirect_reference
+
+
+def _editable_pages_node(reference):
+    """
+    Returns a copy of a /Pages node with its own copy of /Kids, so that
+    edits do not touch the reader's objects.
+    """
+    node = PyPDF2.generic.DictionaryObject(reference.get_object())
+    node[PyPDF2.generic.NameObject("/Kids")] = PyPDF2.generic.ArrayObject(node["/Kids"])
+    return node
+
+
+def _open_merge_source(path):
+    """Opens a PDF for a streaming merge; returns (file handle, reader)."""
+    handle = open(path, 'rb')
+    try:
+        reader = PyPDF2.PdfReader(handle)
+        len(reader.pages)
+    except BaseException:
+        handle.close()
+        raise
+    return handle, reader
+
+
+# --- Metadata scan ---
+# Reads page counts and other basic properties from the cross-reference
+# data and a handful of objects, without parsing the whole file.
+
+_OBJECT_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_REFERENCE = rb"(\d+)\s+\d+\s+R"
+_IMAGE_SUBTYPE = re.compile(rb"/Subtype\s*/Image\b")
+_SOFT_MASK = re.compile(rb"/SMask\s*" + _REFERENCE)
+# Longest object dictionary searched for /Subtype /Image when counting images.
+_IMAGE_HEADER_BYTES = 4096
+
+
+class _FastScanError(ValueError):
+    """The file's structure needs a full parse (see scan_pdf_metadata)."""
+
+
+def _dict_entry(text, key, pattern=rb"(\d+)"):
+    """Returns the first group of `pattern` after /key in text, or None."""
+    match = re.search(rb"/" + key + rb"(?![\w.#-])\s*" + pattern, text)
+    return match.group(1) if match else None
+
+
+def _png_unpredict(data, columns):
+    """Reverses the PNG row predictors (/Predictor 10-15) of a decoded stream."""
+    rows, previous = [], bytearray(columns)
+    for start in range(0, len(data), columns + 1):
+        kind, row = data[start], bytearray(data[start + 1:start + 1 + columns])
+        if kind == 1:
+            for i in range(1, len(row)):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:
+            for i in range(len(row)):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind == 3:
+            for i in range(len(row)):
+                row[i] = (row[i] + ((row[i - 1] if i else 0) + previous[i]) // 2) & 0xFF
+        elif kind == 4:  # Paeth
+            for i in range(len(row)):
+                left, up = (row[i - 1] if i else 0), previous[i]
+                up_left = previous[i - 1] if i else 0
+                estimate = left + up - up_left
+                if abs(estimate - left) <= min(abs(estimate - up), abs(estimate - up_left)):
+                    row[i] = (row[i] + left) & 0xFF
+                elif abs(estimate - up) <= abs(estimate - up_left):
+                    row[i] = (row[i] + up) & 0xFF
+                else:
+                    row[i] = (row[i] + up_left) & 0xFF
+        elif kind != 0:
+            raise _FastScanError(f"unknown PNG predictor {kind}")
+        rows.append(bytes(row))
+        previous = row
+    return b"".join(rows)
+
+
+class _XrefScanner:
+    """
+    Reads a PDF's cross-reference sections (tables and streams, following
+    /Prev and /XRefStm) from a memory-mapped file, and the objects they
+    point to. Raises _FastScanError for anything it does not handle.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offsets = {}  # object number -> file offset
+        self.compressed = {}  # object number -> (object stream number, index)
+        self.trailer = b""  # Trailer dictionary of the newest section
+        self._object_streams = {}  # object stream number -> (decoded data, offsets)
+
+        tail = data[max(0, len(data) - 2048):]
+        position = tail.rfind(b"startxref")
+        if position < 0:
+            raise _FastScanError("no startxref found")
+        offset = int(tail[position + 9:].split()[0])
+        seen = set()
+        while offset is not None:
+            if offset in seen or not 0 < offset < len(data):
+                raise _FastScanError(f"bad cross-reference offset {offset}")
+            seen.add(offset)
+            offset = self._read_section(offset)
+
+    def _read_section(self, offset):
+        """Reads one section (older entries never replace newer ones); returns /Prev."""
+        if self.data[offset:offset + 4] == b"xref":
+            trailer = self._read_table(offset)
+            xref_stream = _dict_entry(trailer, b"XRefStm")
+            if xref_stream is not None:  # Hybrid file: more objects in a stream
+                self._read_stream_section(int(xref_stream))
+        else:
+            trailer = self._read_stream_section(offset)
+        if not self.trailer:
+            self.trailer = trailer
+        previous = _dict_entry(trailer, b"Prev")
+        return int(previous) if previous is not None else None
+
+    def _read_table(self, offset):
+        data = self.data
+        position = offset + 4
+        trailer_start = data.find(b"trailer", position)
+        if trailer_start < 0:
+            raise _FastScanError("no trailer after xref table")
+        lines = data[position:trailer_start].split()
+        i = 0
+        while i < len(lines):
+            first, count = int(lines[i]), int(lines[i + 1])
+            i += 2
+            for obj_id in range(first, first + count):
+                entry_offset, kind = int(lines[i]), lines[i + 2]
+                i += 3
+                if kind == b"n" and obj_id not in self.offsets and obj_id not in self.compressed:
+                    self.offsets[obj_id] = entry_offset
+        end = data.find(b"startxref", trailer_start)
+        return data[trailer_start:end if end > 0 else len(data)]
+
+    def _read_stream(self, offset):
+        """Returns (dictionary text, decoded data) of the stream object at offset."""
+        data = self.data
+        if not _OBJECT_HEADER.match(data, offset):
+            raise _FastScanError(f"no object at offset {offset}")
+        start = data.find(b"stream", offset)
+        if start < 0:
+            raise _FastScanError("stream keyword not found")
+        header = data[offset:start]
+        start += 6
+        start += 2 if data[start:start + 2] == b"\r\n" else 1
+        length = re.search(rb"/Length\s+(\d+)\b(?!\s+\d+\s+R)", header)
+        if length:
+            raw = data[start:start + int(length.group(1))]
+        else:  # Indirect /Length
+            raw = data[start:data.find(b"endstream", start)].rstrip(b"\r\n")
+        filters = re.findall(rb"/(\w+Decode)\b", header)
+        if filters == [b"FlateDecode"]:
+            try:
+                raw = zlib.decompressobj().decompress(raw)
+            except zlib.error as e:
+                raise _FastScanError(f"bad stream data: {e}")
+        elif filters:
+            raise _FastScanError(f"unsupported filter {filters[0].decode()}")
+        predictor = _dict_entry(header, b"Predictor")
+        if predictor is not None and int(predictor) >= 10:
+            columns = int(_dict_entry(header, b"Columns") or 1)
+            raw = _png_unpredict(raw, columns)
+        elif predictor is not None and int(predictor) > 1:
+            raise _FastScanError("unsupported TIFF predictor")
+        return header, raw
+
+    def _read_stream_section(self, offset):
+        header, data = self._read_stream(offset)
+        widths = [int(w) for w in _dict_entry(header, b"W", rb"\[([^\]]*)\]").split()]
+        index = _dict_entry(header, b"Index", rb"\[([^\]]*)\]")
+        if index is not None:
+            index = [int(n) for n in index.split()]
+        else:
+            index = [0, int(_dict_entry(header, b"Size"))]
+        row_size = sum(widths)
+        position = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for obj_id in range(first, first + count):
+                row = data[position:position + row_size]
+                position += row_size
+                fields, start = [], 0
+                for width in widths:
+                    fields.append(int.from_bytes(row[start:start + width], "big"))
+                    start += width
+                kind = fields[0] if widths[0] else 1
+                if obj_id in self.offsets or obj_id in self.compressed:
+                    continue
+                if kind == 1:
+                    self.offsets[obj_id] = fields[1]
+                elif kind == 2:
+                    self.compressed[obj_id] = (fields[1], fields[2])
+        return header
+
+    def object(self, obj_id):
+        """Returns the text of an object's value (a stream's dictionary only)."""
+        if obj_id in self.offsets:
+            offset = self.offsets[obj_id]
+            match = _OBJECT_HEADER.match(self.data, offset)
+            if not match or int(match.group(1)) != obj_id:
+                raise _FastScanError(f"object {obj_id} not at its xref offset")
+            end = self.data.find(b"endobj", match.end())
+            if end < 0:
+                raise _FastScanError(f"object {obj_id} has no endobj")
+            stream = self.data.find(b"stream", match.end(), end)
+            return self.data[match.end():stream if stream > 0 else end]
+        if obj_id in self.compressed:
+            stream_id, index = self.compressed[obj_id]
+            if stream_id not in self.offsets:
+                raise _FastScanError(f"object stream {stream_id} not found")
+            if stream_id not in self._object_streams:
+                header, data = self._read_stream(self.offsets[stream_id])
+                count = int(_dict_entry(header, b"N"))
+                first = int(_dict_entry(header, b"First"))
+                numbers = [int(n) for n in data[:first].split()[:count * 2]]
+                self._object_streams[stream_id] = (
+                    data, [first + offset for offset in numbers[1::2]] + [len(data)])
+            data, offsets = self._object_streams[stream_id]
+            return data[offsets[index]:offsets[index + 1]]
+        raise _FastScanError(f"object {obj_id} not in the cross-reference data")
+
+    def count_images(self):
+        """Counts image XObjects among the objects in use, except soft masks."""
+        data = self.data
+        images, masks = set(), set()
+        for obj_id, offset in self.offsets.items():
+            # Searched in place; slicing the map would copy every header.
+            limit = data.find(b"endobj", offset, offset + _IMAGE_HEADER_BYTES)
+            if limit < 0:
+                limit = offset + _IMAGE_HEADER_BYTES
+            stream = data.find(b"stream", offset, limit)
+            if stream > 0 and _IMAGE_SUBTYPE.search(data, offset, stream):
+                images.add(obj_id)
+                mask = _SOFT_MASK.search(data, offset, stream)
+                if mask:
+                    masks.add(int(mask.group(1)))
+        return len(images - masks)
+
+
+def _scan_fast(data, count_images):
+    """Reads pages, encryption and images from the xref data; see scan_pdf_metadata."""
+    scanner = _XrefScanner(data)
+    root = _dict_entry(scanner.trailer, b"Root", _REFERENCE)
+    if root is None:
+        raise _FastScanError("trailer has no /Root")
+    pages_ref = _dict_entry(scanner.object(int(root)), b"Pages", _REFERENCE)
+    if pages_ref is None:
+        raise _FastScanError("catalog has no /Pages")
+    count = _dict_entry(scanner.object(int(pages_ref)), b"Count")
+    if count is None:
+        raise _FastScanError("page tree root has no /Count")
+    return {"pages": int(count),
+            "encrypted": _dict_entry(scanner.trailer, b"Encrypt", rb"()") is not None,
+            "images": scanner.count_images() if count_images else None}
+
+
+def _scan_full(path, count_images):
+    """Gets the same properties as _scan_fast from a full PdfReader parse."""
+    reader = PyPDF2.PdfReader(path, strict=False)
+    encrypted = reader.is_encrypted
+    if encrypted:
+        reader.decrypt("")  # Many encrypted files have an empty user password
+    images = None
+    if count_images:
+        # Streams are never stored in object streams, so only the objects
+        # in reader.xref can be images.
+        image_ids, masks = set(), set()
+        for generation, objects in reader.xref.items():
+            for idnum in objects:
+                try:
+                    obj = reader.get_object(PyPDF2.generic.IndirectObject(idnum, generation, reader))
+                except Exception:
+                    continue
+                if isinstance(obj, PyPDF2.generic.StreamObject) and obj.get("/Subtype") == "/Image":
+                    image_ids.add(idnum)
+                    mask = obj.raw_get("/SMask") if "/SMask" in obj else None
+                    if isinstance(mask, PyPDF2.generic.IndirectObject):
+                        masks.add(mask.idnum)
+        images = len(image_ids - masks)
+    return {"pages": len(reader.pages), "encrypted": encrypted, "images": images}
+
+
+SCAN_FIELDS = ["path", "size", "mtime", "version", "pages", "encrypted", "images",
+               "method", "error"]
+
+
+def scan_pdf_metadata(path, count_images=True):
+    """
+    Returns basic properties of a PDF file as a dict with the SCAN_FIELDS
+    keys: size in bytes, modification time (epoch seconds), header
+    version, page count, whether it is encrypted and the number of image
+    XObjects (None unless count_images).
+
+    The page count comes from the /Count of the page tree root, found
+    through the last cross-reference section (method "xref"). Only that
+    section, the chain of older ones, the catalog and the page tree root
+    are read; counting images also reads the start of every object. Files
+    whose xref data is damaged or uses rare encodings are parsed in full
+    with PyPDF2 instead (method "parse"). Errors are reported in "error"
+    rather than raised.
+    """
+    result = dict.fromkeys(SCAN_FIELDS)
+    result["path"] = path
+    try:
+        stat = os.stat(path)
+        result["size"], result["mtime"] = stat.st_size, stat.st_mtime
+        with open(path, 'rb') as f:
+            version = re.match(rb"%PDF-(\d\.\d)", f.read(1024).lstrip())
+            result["version"] = version.group(1).decode() if version else None
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    result.update(_scan_fast(data, count_images), method="xref")
+            except Exception:  # Damaged or unusual structure: parse it properly
+                result["method"] = "parse"
+                result.update(_scan_full(path, count_images))
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+
+def _scan_library_paths(paths):
+    """Yields the given files, and the .pdf files under any given folder."""
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(dirpath, name)
+        else:
+            yield path
+
+
+# --- Full-text index ---
+
+# Page rows of the text index use file id << _PAGE_BITS | page number as
+# their rowid, so all pages of a file form one rowid range.
+_PAGE_BITS = 20
+
+
+def _extract_page_texts(path):
+    """
+    Returns (text of each page, error message or None) for a PDF. Pages
+    whose text cannot be extracted are empty. Runs in worker processes.
+    """
+    try:
+        reader = PyPDF2.PdfReader(path, strict=False)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        texts = []
+        for page in reader.pages:
+            try:
+                texts.append(page.extract_text() or "")
+            except Exception:
+                texts.append("")
+        return texts, None
+    except Exception as e:
+        return [], str(e) or type(e).__name__
+
+
+class TextIndex:
+    """
+    A SQLite FTS5 index of the text of PDF pages, filled by
+    PDFMaster.index_text. Each file is recorded with its size and
+    modification time, so a refresh only extracts changed files. Use it
+    from one thread at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, "
+                "path TEXT UNIQUE NOT NULL, size INTEGER, mtime_ns INTEGER, "
+                "page_count INTEGER, error TEXT)")
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5("
+                "text, tokenize = 'unicode61 remove_diacritics 2')")
+
+    def files(self):
+        """Maps every indexed path to its (size, mtime_ns) when it was indexed."""
+        return {path: (size, mtime_ns) for path, size, mtime_ns in
+                self._connection.execute("SELECT path, size, mtime_ns FROM files")}
+
+    def replace_file(self, path, size, mtime_ns, texts, error=None):
+        """Stores the page texts of a file in place of any older version."""
+        if len(texts) >= 1 << _PAGE_BITS:
+            raise ValueError(f"too many pages to index ({len(texts)})")
+        with self._connection:
+            row = self._connection.execute(
+                "SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                file_id = row[0]
+                self._delete_pages(file_id)
+                self._connection.execute(
+                    "UPDATE files SET size = ?, mtime_ns = ?, page_count = ?, error = ? WHERE id = ?",
+                    (size, mtime_ns, len(texts), error, file_id))
+            else:
+                file_id = self._connection.execute(
+                    "INSERT INTO files (path, size, mtime_ns, page_count, error) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (path, size, mtime_ns, len(texts), error)).lastrowid
+            self._connection.executemany(
+                "INSERT INTO pages (rowid, text) VALUES (?, ?)",
+                ((file_id << _PAGE_BITS | page_num, text)
+                 for page_num, text in enumerate(texts, 1) if text.strip()))
+
+    def remove_file(self, path):
+        """Drops a file and its pages from the index."""
+        with self._connection:
+            row = self._connection.execute(
+                "SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._delete_pages(row[0])
+                self._connection.execute("DELETE FROM files WHERE id = ?", row)
+
+    def _delete_pages(self, file_id):
+        self._connection.execute("DELETE FROM pages WHERE rowid >= ? AND rowid < ?",
+                                 (file_id << _PAGE_BITS, (file_id + 1) << _PAGE_BITS))
+
+    def search(self, query, limit=20):
+        """
+        Returns up to `limit` (path, page number, snippet) matches for an
+        FTS5 query (words, "phrases", AND/OR/NOT, prefix*), best first.
+        Text that is not a valid query is searched for as plain words.
+        """
+        sql = ("SELECT files.path, pages.rowid & ?, "
+               "snippet(pages, 0, '[', ']', '...', 12) FROM pages "
+               "JOIN files ON files.id = pages.rowid >> ? "
+               "WHERE pages MATCH ? ORDER BY rank LIMIT ?")
+        mask = (1 << _PAGE_BITS) - 1
+        try:
+            return self._connection.execute(sql, (mask, _PAGE_BITS, query, limit)).fetchall()
+        except sqlite3.OperationalError:
+            words = " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+            return self._connection.execute(sql, (mask, _PAGE_BITS, words, limit)).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+
+def _cpu_seconds():
+    """CPU time of this process and its finished child processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _max_rss_kb(who):
+    """Peak resident set size in KB (resource.RUSAGE_SELF or _CHILDREN), or None."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(who).ru_maxrss
+    return max_rss // 1024 if sys.platform == "darwin" else max_rss  # macOS reports bytes
+
+
+# Operations that currently trace Python allocations; tracemalloc is
+# process-wide, so it is stopped only when the last of them finishes.
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+class _OperationMetrics:
+    """
+    Measurements of one PDFMaster operation, reported as a dict by
+    finish(). Times are in seconds, sizes in KB and bytes.
+
+    CPU time and peak RSS are process-wide, so they include any other
+    operations running at the same time; the peak RSS is the high-water
+    mark since the process started. With trace_memory the peak of traced
+    Python allocations during the operation is recorded too, at the cost
+    of slowing allocation-heavy code down.
+    """
+
+    def __init__(self, operation, trace_memory=False):
+        global _tracing_users
+        self.record = {"operation": operation, "status": "ok", "start": time.time(),
+                       "pages": 0, "bytes_in": 0, "bytes_out": 0}
+        self.phases = {}
+        self.trace_memory = trace_memory
+        if trace_memory:
+            with _tracing_lock:
+                if _tracing_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _tracing_users += 1
+                tracemalloc.reset_peak()
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_seconds()
+
+    def count(self, pages=0, bytes_in=0, bytes_out=0):
+        self.record["pages"] += pages
+        self.record["bytes_in"] += bytes_in
+        self.record["bytes_out"] += bytes_out
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Adds the time spent in the with block to phase `name`."""
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            totals["wall_s"] += time.perf_counter() - wall
+            totals["cpu_s"] += _cpu_seconds() - cpu
+
+    def finish(self):
+        global _tracing_users
+        wall = time.perf_counter() - self._wall
+        cpu = _cpu_seconds() - self._cpu
+        self.record.update(wall_s=wall, cpu_s=cpu,
+                           max_rss_kb=_max_rss_kb(resource.RUSAGE_SELF) if resource else None,
+                           max_rss_children_kb=(
+                               _max_rss_kb(resource.RUSAGE_CHILDREN) if resource else None))
+        if self.trace_memory:
+            with _tracing_lock:
+                self.record["traced_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+                _tracing_users -= 1
+                if _tracing_users == 0:
+                    tracemalloc.stop()
+        phases = dict(self.phases)
+        phases["other"] = {"wall_s": wall - sum(p["wall_s"] for p in self.phases.values()),
+                           "cpu_s": cpu - sum(p["cpu_s"] for p in self.phases.values())}
+        self.record["phases"] = phases
+        return self.record
+
+
+class JsonLinesMetrics:
+    """
+    A PDFMaster metrics_callback that appends each record to a file as one
+    line of JSON. path "-" writes to stderr. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self._file = sys.stderr if path == "-" else open(path, 'a')
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stderr:
+            self._file.close()
+
+
+# Part of every result cache key. Bump it when an operation's output for
+# the same input and arguments changes, so older cached results are unused.
+_RESULT_CACHE_VERSION = 1
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def _file_digest(path):
+    """SHA-256 of a file, read in blocks so large files are never held in memory."""
+    digest = hashlib.sha256()
+    buffer = bytearray(_HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def _file_state(path):
+    """Returns (size, mtime_ns) of a file, or None if there is none."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _folder_state(folder):
+    """Maps each file under folder (relative path) to its (size, mtime_ns)."""
+    state = {}
+    for dirpath, _, filenames in os.walk(folder):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            state[os.path.relpath(path, folder)] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+
+def _cache_token(value, digests):
+    """
+    Turns an argument into JSON data for a cache key. Input file paths
+    become their content digests; page selections their text form.
+    """
+    if isinstance(value, str):
+        return {"sha256": digests[value]} if value in digests else value
+    if isinstance(value, (list, tuple)):
+        return [_cache_token(item, digests) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _cache_token(item, digests) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return str(value)
+
+
+def _input_paths(value):
+    """Input file paths in an argument: a path, a list of them or pipeline steps."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):  # A pipeline step (see parse_pipeline)
+        return list(value.get("inputs", ())) + ([value["source"]] if "source" in value else [])
+    return [path for item in value for path in _input_paths(item)]
+
+
+class ResultCache:
+    """
+    An on-disk cache of operation outputs, shared by PDFMaster instances
+    and processes that use the same directory.
+
+    An entry is keyed by a SHA-256 of the operation name, its arguments and
+    the contents of its input files (see _cached_result), so a renamed or
+    copied input still hits while an edited one misses. Inputs are hashed
+    in blocks; digests are remembered per path, size and modification time.
+
+    Entries are written to a temporary folder and renamed into place, so
+    readers never see half-written ones. When the cache grows beyond
+    max_bytes the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._digests = {}  # absolute path -> (size, mtime_ns, digest)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def digest(self, path):
+        """Returns the SHA-256 of the file at path, hashing it only if it changed."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._digests.get(path)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            return entry[2]
+        digest = _file_digest(path)
+        with self._lock:
+            self._digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def restore(self, key, output_path):
+        """
+        Copies the cached output for key to output_path (a file, a folder
+        for operations that write several files, or a list of files).
+        Returns False on a miss.
+        """
+        entry = self._entry_path(key)
+        manifest_path = os.path.join(entry, "manifest.json")
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("outputs") is not None:
+                for index in manifest["outputs"]:
+                    _clone_file(os.path.join(entry, "outputs", str(index)), output_path[index])
+            elif manifest["files"] is None:
+                _clone_file(os.path.join(entry, "output"), output_path)
+            else:
+                for name in manifest["files"]:
+                    target = os.path.join(output_path, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    _clone_file(os.path.join(entry, "files", name), target)
+            os.utime(manifest_path)  # Marks the entry as recently used
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            return False  # Missing, or evicted by another process while copying
+        return True
+
+    def store(self, key, output_path, files=None):
+        """
+        Caches output_path for key: the file itself, or when files (paths
+        relative to the output_path folder) are given, those files. For a
+        list of output files, files holds the indices of those written.
+        """
+        outputs = None
+        if isinstance(output_path, (list, tuple)):
+            outputs, files = files, None
+            size = sum(os.path.getsize(output_path[index]) for index in outputs)
+        elif files is None:
+            size = os.path.getsize(output_path)
+        else:
+            size = sum(os.path.getsize(os.path.join(output_path, name)) for name in files)
+        if size > self.max_bytes:
+            return
+        entry = self._entry_path(key)
+        temp_entry = os.path.join(self.directory,
+                                  f".tmp-{os.getpid()}-{threading.get_ident()}-{key[:16]}")
+        try:
+            os.makedirs(temp_entry)
+            if outputs is not None:
+                os.makedirs(os.path.join(temp_entry, "outputs"))
+                for index in outputs:
+                    _clone_file(output_path[index],
+                                os.path.join(temp_entry, "outputs", str(index)))
+            elif files is None:
+                _clone_file(output_path, os.path.join(temp_entry, "output"))
+            else:
+                for name in files:
+                    target = os.path.join(temp_entry, "files", name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    _clone_file(os.path.join(output_path, name), target)
+            with open(os.path.join(temp_entry, "manifest.json"), 'w') as f:
+                json.dump({"files": files, "outputs": outputs, "size": size}, f)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(temp_entry, entry)
+        except OSError:
+            pass  # Another process stored the same result first, or the disk is full
+        finally:
+            shutil.rmtree(temp_entry, ignore_errors=True)
+        self._evict()
+
+    def _entries(self):
+        """Returns (last use, size, path) for every complete entry."""
+        entries = []
+        for manifest_path in glob.glob(os.path.join(self.directory, "??", "*", "manifest.json")):
+            try:
+                last_use = os.stat(manifest_path).st_mtime
+                with open(manifest_path) as f:
+                    size = json.load(f)["size"]
+            except (OSError, ValueError, KeyError):
+                continue
+            entries.append((last_use, size, os.path.dirname(manifest_path)))
+        return entries
+
+    def _evict(self):
+        """Deletes the least recently used entries until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Deletes every cached result."""
+        for _, _, entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def __len__(self):
+        return len(self._entries())
+
+
+def _bind_arguments(method, args, kwargs):
+    """Maps a method's parameter names (after self) to the given or default values."""
+    code = method.__code__
+    names = code.co_varnames[1:code.co_argcount]
+    defaults = method.__defaults__ or ()
+    bound = dict(zip(names[len(names) - len(defaults):], defaults))
+    bound.update(zip(names, args))
+    bound.update(kwargs)
+    return bound
+
+
+def _cached_result(inputs, output, folder=False, ignore=()):
+    """
+    Serves a PDFMaster operation from its result_cache when one is set.
+
+    inputs names the parameters that hold input files (paths, lists of
+    paths or pipeline steps) and output the one that holds the output file
+    or list of output files, or with folder=True the output folder. Parameters in `ignore` only
+    change how fast the output is made, so they are left out of the key.
+    Folder outputs are named after the inputs, so for them the input file
+    names are part of the key too. Only runs that report no error are
+    cached.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self.result_cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = _bind_arguments(method, args, kwargs)
+            output_path = bound.pop(output)
+            with self._phase("cache"):
+                try:
+                    paths = [path for name in inputs for path in _input_paths(bound[name])]
+                    digests = {path: cache.digest(path) for path in paths}
+                except OSError:
+                    paths = None
+            if paths is None:
+                return method(self, *args, **kwargs)  # Reports the missing input itself
+            with self._phase("cache"):
+                key_data = {
+                    "version": _RESULT_CACHE_VERSION, "operation": method.__name__,
+                    "optimize_level": self.optimize_level,
+                    "arguments": {name: _cache_token(value, digests)
+                                  for name, value in bound.items() if name not in ignore}}
+                if folder:
+                    key_data["names"] = [os.path.basename(path) for path in paths]
+                key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+                multiple = isinstance(output_path, (list, tuple))
+                if cache.restore(key, output_path):
+                    for path in (output_path if multiple else [output_path]):
+                        self.reader_cache.invalidate(path)
+                    self._update_status(
+                        f"Reused the cached result of an identical {method.__name__} run: "
+                        f"{', '.join(output_path) if multiple else output_path}")
+                    return None
+                if folder:
+                    before = _folder_state(output_path)
+                elif multiple:
+                    before = [_file_state(path) for path in output_path]
+                else:
+                    before = _file_state(output_path)
+
+            errors = self._errors_reported
+            result = method(self, *args, **kwargs)
+            if self._errors_reported == errors:
+                with self._phase("cache"):
+                    # Only what this run wrote is cached; a run that wrote
+                    # nothing (e.g. nothing to remove) is not.
+                    try:
+                        if multiple:
+                            written = [index for index, path in enumerate(output_path)
+                                       if _file_state(path) not in (None, before[index])]
+                            if written:
+                                cache.store(key, output_path, written)
+                        elif not folder:
+                            if _file_state(output_path) not in (None, before):
+                                cache.store(key, output_path)
+                        else:
+                            written = sorted(name for name, state in
+                                             _folder_state(output_path).items()
+                                             if before.get(name) != state)
+                            if written:
+                                cache.store(key, output_path, written)
+                    except OSError as e:
+                        self._update_status(f"Warning: Could not cache the result: {e}")
+            return result
+        return wrapper
+    return decorator
+
+
+def _instrumented(method):
+    """
+    Wraps a PDFMaster operation to pass a metrics record (see
+    _OperationMetrics) to the metrics_callback when one is set. Operations
+    called from inside another one add to the outer record. An operation
+    that reported an error through the status callback gets status
+    "error", a cancelled one "cancelled".
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics_callback is None or self._metrics is not None:
+            return method(self, *args, **kwargs)
+        self._metrics = _OperationMetrics(method.__name__, self.trace_memory)
+        try:
+            return method(self, *args, **kwargs)
+        except OperationCancelled:
+            self._metrics.record["status"] = "cancelled"
+            raise
+        except BaseException:
+            self._metrics.record["status"] = "error"
+            raise
+        finally:
+            metrics, self._metrics = self._metrics, None
+            self.metrics_callback(metrics.finish())
+    return wrapper
 
 
 class PDFMaster:
     """
     A class to perform various PDF manipulation tasks using PyPDF2.
     Methods are adapted to report status via a callback.
+    Parsed input files are shared between operations through a
+    PdfReaderCache, so cached readers must never be modified.
+
+    Set optimize_level to a zlib level (1-9) to write optimized output (see
+    _write_optimized), compressed on optimize_workers threads.
+
+    With a metrics_callback, every operation passes it a dict of wall and
+    CPU time, peak memory, pages and input/output file bytes, with times
+    per phase ("read", "write", ...; the rest is "other"). See
+    _OperationMetrics; JsonLinesMetrics writes the dicts to a file.
+
+    With a result_cache (a ResultCache), an operation repeated on inputs
+    with the same contents and the same arguments copies the stored output
+    instead of running again.
     """
 
-    def __init__(self, status_callback=None):
-        self.status_callback = status_callback if status_callback else print
+    def __init__(self, status_callback=None, reader_cache=None, cancel_event=None,
+                 optimize_level=None, optimize_workers=None, metrics_callback=None,
+                 trace_memory=False, result_cache=None):
+        self.status_callback = status_callback if status_callback else print
+        self.reader_cache = reader_cache if reader_cache is not None else PdfReaderCache()
+        self.cancel_event = cancel_event
+        self.optimize_level = optimize_level
+        self.optimize_workers = optimize_workers or os.cpu_count() or 1
+        self.metrics_callback = metrics_callback
+        self.trace_memory = trace_memory
+        self.result_cache = result_cache
+        self._metrics = None  # _OperationMetrics of the running operation
+        self._errors_reported = 0
+
+    def _update_status(self, message):
+        """Sends a message to the GUI's status area."""
+        if message.startswith(("Error", "An unexpected error")):
+            self._errors_reported += 1
+            if self._metrics is not None:
+                self._metrics.record["status"] = "error"
+        self.status_callback(message)
+
+    def _phase(self, name):
+        """Context manager timing a phase of the running operation."""
+        if self._metrics is None:
+            return contextlib.nullcontext()
+        return self._metrics.phase(name)
+
+    def _count(self, pages=0, bytes_in=0, bytes_out=0):
+        """Adds to the page and byte counts of the running operation."""
+        if self._metrics is not None:
+            self._metrics.count(pages, bytes_in, bytes_out)
+
+    def _read_input(self, path):
+        """Returns the (cached) PdfReader for path, counting it as input."""
+        with self._phase("read"):
+            reader = self.reader_cache.get(path)
+        self._count(bytes_in=os.path.getsize(path))
+        return reader
+
+    def _check_cancelled(self):
+        """Raises OperationCancelled if the cancel event has been set."""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise OperationCancelled()
+
+    def _write_output(self, writer, output_path):
+        """Writes a PdfWriter to output_path and drops any stale cached reader."""
+        with self._phase("write"), open(output_path, 'wb') as output_pdf:
+            if self.optimize_level is None:
+                writer.write(output_pdf)
+            else:
+                start = time.perf_counter()
+                plain_size = _write_optimized(writer, output_pdf, self.optimize_level,
+                                              self.optimize_workers)
+                self._report_optimized(plain_size, output_pdf.tell(), start)
+            self._count(pages=len(writer.pages), bytes_out=output_pdf.tell())
+        self.reader_cache.invalidate(output_path)
+
+    def _report_optimized(self, plain_size, output_size, start):
+        self._update_status(
+            f"  Optimized output: {plain_size / 1024:.0f} KB unoptimized -> "
+            f"{output_size / 1024:.0f} KB, Flate level {self.optimize_level}, "
+            f"{time.perf_counter() - start:.2f} s.")
+
+    def _get_pdf_reader_writer(self, input_path):
+        """Helper to get a (cached) PdfReader and a new PdfWriter."""
+        try:
+            reader = self._read_input(input_path)
+            writer = PyPDF2.PdfWriter()
+            return reader, writer
+        except PyPDF2.errors.PdfReadError:
+            self._update_status(
+                f"Error: Could not read PDF file at {input_path}. It might be encrypted or corrupted.")
+            return None, None
+        except FileNotFoundError:
+            self._update_status(f"Error: File not found at {input_path}.")
+            return None, None
+        except Exception as e:
+            self._update_status(
+                f"An unexpected error occurred while opening {input_path}: {e}")
+            return None, None
+
+    @_instrumented
+    def scan_metadata(self, input_paths, output_path, workers=1, count_images=True):
+        """
+        Writes the page count and other basic properties of many PDFs (see
+        scan_pdf_metadata) to output_path: JSON lines if its name ends in
+        .jsonl, CSV otherwise. Folders in input_paths are searched for .pdf
+        files. Files are scanned on a pool of `workers` processes; rows are
+        written in input order as they come in. Files that cannot be read
+        get a row with an error.
+        """
+        paths = list(_scan_library_paths(input_paths))
+        self._update_status(f"Scanning {len(paths)} PDF files...")
+        start = time.perf_counter()
+        methods = {"xref": 0, "parse": 0, None: 0}
+        executor = None
+        try:
+            with open(output_path, 'w', newline='') as output_file:
+                if output_path.lower().endswith(".jsonl"):
+                    def write(row):
+                        output_file.write(json.dumps(row) + "\n")
+                else:
+                    csv_writer = csv.DictWriter(output_file, SCAN_FIELDS)
+                    csv_writer.writeheader()
+                    write = csv_writer.writerow
+                options = itertools.repeat(count_images)
+                if workers <= 1:
+                    results = map(scan_pdf_metadata, paths, options)
+                else:
+                    executor = futures.ProcessPoolExecutor(max_workers=workers)
+                    chunksize = max(1, min(256, len(paths) // (workers * 8)))
+                    results = executor.map(scan_pdf_metadata, paths, options, chunksize=chunksize)
+                for done, result in enumerate(results, 1):
+                    self._check_cancelled()
+                    write(result)
+                    methods[None if result["error"] else result["method"]] += 1
+                    if done % 1000 == 0:
+                        self._update_status(f"  Scanned {done}/{len(paths)} files...")
+                self._count(bytes_out=output_file.tell())
+            self._update_status(
+                f"Scanned {len(paths)} files in {time.perf_counter() - start:.1f} s "
+                f"({methods['xref']} from cross-reference data, {methods['parse']} parsed "
+                f"in full, {methods[None]} unreadable). Results: {output_path}")
+        except Exception as e:
+            self._update_status(f"Error scanning PDFs: {e}")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _page_fingerprints(self, path):
+        """Returns the fingerprint of every page of path (see _page_fingerprint)."""
+        reader = self._read_input(path)
+        fingerprints = _ReferenceFingerprints(reader)
+        result = []
+        with self._phase("fingerprint"):
+            for page in reader.pages:
+                self._check_cancelled()
+                result.append(_page_fingerprint(page, fingerprints))
+        return reader, result
+
+    @_instrumented
+    def find_duplicate_pages(self, input_paths, report_path=None):
+        """
+        Finds pages that look the same (see _page_fingerprint) within and
+        across the input PDFs, using one dict of fingerprints, so the work
+        grows linearly with the number of pages. With report_path, writes a
+        CSV row for every page that repeats an earlier one (in input order)
+        with the page it repeats.
+        """
+        self._update_status(f"Looking for duplicate pages in {len(input_paths)} PDF(s)...")
+        first_seen = {}  # fingerprint -> (path, page number)
+        duplicates = []  # (path, page number, original path, original page number, fingerprint)
+        try:
+            for path in input_paths:
+                _, fingerprints = self._page_fingerprints(path)
+                self._count(pages=len(fingerprints))
+                for page_num, fingerprint in enumerate(fingerprints, 1):
+                    if fingerprint in first_seen:
+                        duplicates.append((path, page_num) + first_seen[fingerprint]
+                                          + (fingerprint.hex(),))
+                    else:
+                        first_seen[fingerprint] = (path, page_num)
+                self._update_status(f"  Fingerprinted {len(fingerprints)} pages of {path}.")
+            if report_path:
+                with open(report_path, 'w', newline='') as report_file:
+                    report_writer = csv.writer(report_file)
+                    report_writer.writerow(["path", "page", "duplicate_of_path",
+                                            "duplicate_of_page", "fingerprint"])
+                    report_writer.writerows(duplicates)
+            groups = len({row[-1] for row in duplicates})
+            self._update_status(
+                f"Found {len(duplicates)} duplicate pages of {groups} distinct pages"
+                + (f". Report: {report_path}" if report_path else "."))
+            return duplicates
+        except Exception as e:
+            self._update_status(f"Error finding duplicate pages: {e}")
+
+    @_instrumented
+    @_cached_result(("input_paths",), "output_paths")
+    def remove_duplicate_pages(self, input_paths, output_paths, across_documents=False):
+        """
+        Writes each input PDF to the matching output path without the pages
+        that repeat an earlier page of the same document (the first copy is
+        kept). With across_documents=True, pages that appeared in an
+        earlier input are removed too. Pages are compared by fingerprint
+        (see find_duplicate_pages).
+        """
+        self._update_status(f"Removing duplicate pages from {len(input_paths)} PDF(s)...")
+        first_seen = set()
+        removed_total = 0
+        try:
+            for input_path, output_path in zip(input_paths, output_paths):
+                reader, fingerprints = self._page_fingerprints(input_path)
+                seen = first_seen if across_documents else set()
+                writer = PyPDF2.PdfWriter()
+                removed = 0
+                for page, fingerprint in zip(reader.pages, fingerprints):
+                    if fingerprint in seen:
+                        removed += 1
+                    else:
+                        seen.add(fingerprint)
+                        writer.add_page(page)
+                removed_total += removed
+                if not writer.pages:
+                    self._update_status(
+                        f"  Warning: Every page of {input_path} appears in an earlier "
+                        f"document. Output PDF not created.")
+                    continue
+                self._write_output(writer, output_path)
+                self._update_status(
+                    f"  {input_path}: removed {removed} of {len(fingerprints)} pages "
+                    f"-> {output_path}")
+            self._update_status(
+                f"Duplicate pages removed successfully ({removed_total} pages in total).")
+        except Exception as e:
+            self._update_status(f"Error removing duplicate pages: {e}")
+
+    @_instrumented
+    def index_text(self, input_paths, index_path, workers=1, prune=True):
+        """
+        Adds the text of each page of the input PDFs to the TextIndex at
+        index_path. Folders in input_paths are searched for .pdf files.
+        Only files that are new or whose size or modification time changed
+        are extracted, on a pool of `workers` processes with at most two
+        files per worker in flight. With prune=True, indexed files that no
+        longer exist are removed from the index.
+        """
+        paths = [os.path.abspath(path) for path in _scan_library_paths(input_paths)]
+        self._update_status(f"Updating text index '{index_path}'...")
+        start = time.perf_counter()
+        executor = None
+        try:
+            index = TextIndex(index_path)
+        except Exception as e:
+            self._update_status(f"Error opening text index: {e}")
+            return
+        try:
+            known = index.files()
+            changed = []
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError as e:
+                    self._update_status(f"  Warning: Skipping {path}: {e}")
+                    continue
+                if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append((path, stat.st_size, stat.st_mtime_ns))
+            removed = 0
+            if prune:
+                for path in known:
+                    if not os.path.exists(path):
+                        index.remove_file(path)
+                        removed += 1
+            self._update_status(
+                f"  {len(changed)} new or changed files, {len(paths) - len(changed)} "
+                f"up to date, {removed} removed.")
+
+            pages = 0
 
-    def _update_status(self, message):
-        """Sends a message to the GUI's status area."""
-        self.status_callback(message)
+            def finish(path, size, mtime_ns, texts, error):
+                nonlocal pages
+                with self._phase("write"):
+                    index.replace_file(path, size, mtime_ns, texts, error)
+                self._count(pages=len(texts), bytes_in=size)
+                pages += len(texts)
+                if error:
+                    self._update_status(f"  Warning: Could not read {path}: {error}")
+                else:
+                    self._update_status(f"  Indexed: {path} ({len(texts)} pages)")
 
-    def _get_pdf_reader_writer(self, input_path):
-        """Helper to get PdfReader and PdfWriter objects."""
-        try:
-            reader = PyPDF2.PdfReader(input_path)
-            writer = PyPDF2.PdfWriter()
-            return reader, writer
-        except PyPDF2.errors.PdfReadError:
+            if workers <= 1:
+                for path, size, mtime_ns in changed:
+                    self._check_cancelled()
+                    with self._phase("extract"):
+                        result = _extract_page_texts(path)
+                    finish(path, size, mtime_ns, *result)
+            else:
+                executor = futures.ProcessPoolExecutor(max_workers=workers)
+                pending = deque()
+                for path, size, mtime_ns in changed:
+                    self._check_cancelled()
+                    pending.append((path, size, mtime_ns,
+                                    executor.submit(_extract_page_texts, path)))
+                    if len(pending) >= workers * 2:
+                        path, size, mtime_ns, future = pending.popleft()
+                        finish(path, size, mtime_ns, *future.result())
+                while pending:
+                    self._check_cancelled()
+                    path, size, mtime_ns, future = pending.popleft()
+                    finish(path, size, mtime_ns, *future.result())
             self._update_status(
-                f"Error: Could not read PDF file at {input_path}. It might be encrypted or corrupted.")
-            return None, None
-        except FileNotFoundError:
-            self._update_status(f"Error: File not found at {input_path}.")
-            return None, None
+                f"Text index updated in {time.perf_counter() - start:.1f} s: "
+                f"{len(changed)} files ({pages} pages) indexed. Index: {index_path}")
         except Exception as e:
-            self._update_status(
-                f"An unexpected error occurred while opening {input_path}: {e}")
-            return None, None
+            self._update_status(f"Error updating text index: {e}")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            index.close()
+
+    @_instrumented
+    @_cached_result(("input_paths",), "output_path", ignore=("max_open_files",))
+    def merge_pdfs(self, input_paths, output_path, deduplicate=False,
+                   streaming=False, max_open_files=8):
+        """
+        Merges multiple PDF files into a single PDF.
+
+        With deduplicate=True identical resources (fonts, images, form
+        XObjects, ...) copied in from different inputs are stored only once.
+        With streaming=True pages are written to the output as each input is
+        read, with at most max_open_files inputs open at once; use it for
+        thousands of inputs. See _merge_streaming.
+        """
+        if streaming:
+            if deduplicate:
+                self._update_status(
+                    "Warning: Deduplication is not available for streaming merges.")
+            self._merge_streaming(input_paths, output_path, max_open_files)
+            return
 
-    def merge_pdfs(self, input_paths, output_path):
-        """Merges multiple PDF files into a single PDF."""
-        pdf_merger = PyPDF2.PdfMerger()
+        writer = PyPDF2.PdfWriter()
         self._update_status(f"Attempting to merge {len(input_paths)} PDFs...")
         try:
             for path in input_paths:
+                self._check_cancelled()
                 if not os.path.exists(path):
                     self._update_status(
                         f"Warning: Input file not found: {path}. Skipping.")
                     continue
-                pdf_merger.append(path)
+                writer.append(self._read_input(path))
 
-            with open(output_path, 'wb') as output_file:
-                pdf_merger.write(output_file)
+            if deduplicate:
+                self._check_cancelled()
+                start = time.perf_counter()
+                with self._phase("deduplicate"):
+                    removed, bytes_saved = _deduplicate_writer_objects(writer)
+                self._update_status(
+                    f"  Removed {removed} duplicate objects, saving about "
+                    f"{bytes_saved / 1024:.0f} KB in {time.perf_counter() - start:.2f} s.")
+            self._write_output(writer, output_path)
             self._update_status(f"PDFs merged successfully to: {output_path}")
         except Exception as e:
             self._update_status(f"Error merging PDFs: {e}")
         finally:
-            pdf_merger.close()
+            writer.close()
+
+    def _merge_streaming(self, input_paths, output_path, max_open_files):
+        """
+        Merges inputs through _StreamingPDFMerger. Inputs are opened and
+        their page trees parsed on background threads, ahead of the input
+        being written, with at most max_open_files files open in total. Each
+        input is closed and released as soon as its pages are written.
+        Outlines and form fields of the inputs are not kept.
+        """
+        paths = []
+        for path in input_paths:
+            if os.path.exists(path):
+                paths.append(path)
+            else:
+                self._update_status(
+                    f"Warning: Input file not found: {path}. Skipping.")
+        max_open_files = max(1, max_open_files)
+        self._update_status(
+            f"Streaming merge of {len(paths)} PDFs (up to {max_open_files} open)...")
+
+        output_opened = False
+        executor = futures.ThreadPoolExecutor(max_workers=min(4, max_open_files))
+        pending = deque()
+        try:
+            with open(output_path, 'wb') as output_pdf:
+                output_opened = True
+                merger = _StreamingPDFMerger(output_pdf, self.optimize_level)
+                next_path = iter(paths)
+                for path in itertools.islice(next_path, max_open_files):
+                    pending.append((path, executor.submit(_open_merge_source, path)))
+                while pending:
+                    self._check_cancelled()
+                    path, future = pending.popleft()
+                    with self._phase("read"):
+                        handle, reader = future.result()
+                    try:
+                        with self._phase("write"):
+                            merger.add_reader(reader, self._check_cancelled)
+                    finally:
+                        handle.close()
+                    self._update_status(f"  Added {path} ({len(reader.pages)} pages).")
+                    self._count(bytes_in=os.path.getsize(path))
+                    del reader
+                    for path in itertools.islice(next_path, 1):
+                        pending.append((path, executor.submit(_open_merge_source, path)))
+                with self._phase("write"):
+                    merger.close()
+                self._count(pages=merger.page_count, bytes_out=output_pdf.tell())
+            self.reader_cache.invalidate(output_path)
+            if self.optimize_level is not None:
+                self._update_status(
+                    f"  Optimized output: {os.path.getsize(output_path) / 1024:.0f} KB, "
+                    f"Flate level {self.optimize_level}.")
+            self._update_status(
+                f"PDFs merged successfully to: {output_path} ({merger.page_count} pages)")
+        except BaseException as e:
+            executor.shutdown(wait=True, cancel_futures=True)
+            for path, future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    future.result()[0].close()
+            if output_opened and os.path.exists(output_path):
+                os.remove(output_path)
+            if not isinstance(e, Exception):
+                raise
+            self._update_status(f"Error merging PDFs: {e}")
+        finally:
+            executor.shutdown(cancel_futures=True)
 
-    def split_pdf(self, input_path, output_folder):
-        """Splits a PDF file into individual pages, saving each as a new PDF."""
+    @_instrumented
+    @_cached_result(("input_path",), "output_folder", folder=True, ignore=("workers",))
+    def split_pdf(self, input_path, output_folder, pages_per_file=1,
+                  max_bytes=None, ranges=None, workers=1):
+        """
+        Splits a PDF file into chunks, saving each as a new PDF.
+
+        By default every page becomes its own file. Otherwise pages are grouped
+        every pages_per_file pages, by an approximate max_bytes budget per file
+        (based on the stream sizes each page pulls in), or by explicit ranges
+        given as (first, last) tuples from parse_page_ranges. With workers > 1
+        the chunks are written by a process pool, and each worker parses the
+        source file once.
+        """
         reader, _ = self._get_pdf_reader_writer(input_path)
         if not reader:
             return
 
+        num_pages = len(reader.pages)
+        try:
+            chunks = self._split_chunks(reader, pages_per_file, max_bytes, ranges)
+        except ValueError as e:
+            self._update_status(f"Error: {e}")
+            return
+
         os.makedirs(output_folder, exist_ok=True)
         base_name = os.path.splitext(os.path.basename(input_path))[0]
-        num_pages = len(reader.pages)
+        jobs = []
+        for first, last in chunks:
+            suffix = f"page_{first}" if first == last else f"pages_{first}-{last}"
+            jobs.append((first, last, os.path.join(
+                output_folder, f"{base_name}_{suffix}.pdf")))
         self._update_status(
-            f"Splitting '{input_path}' into {num_pages} pages...")
+            f"Splitting '{input_path}' ({num_pages} pages) into {len(jobs)} files...")
 
         try:
-            for i in range(num_pages):
-                writer = PyPDF2.PdfWriter()
-                writer.add_page(reader.pages[i])
-                output_filename = os.path.join(
-                    output_folder, f"{base_name}_page_{i + 1}.pdf")
-                with open(output_filename, 'wb') as output_pdf:
-                    writer.write(output_pdf)
-                self._update_status(f"  Saved: {output_filename}")
+            if workers <= 1:
+                for first, last, output_filename in jobs:
+                    writer = PyPDF2.PdfWriter()
+                    for i in range(first - 1, last):
+                        self._check_cancelled()
+                        writer.add_page(reader.pages[i])
+                    self._write_output(writer, output_filename)
+                    self._update_status(f"  Saved: {output_filename}")
+            else:
+                # The worker processes parse the input again and write the files
+                with self._phase("workers"):
+                    executor = futures.ProcessPoolExecutor(
+                        max_workers=workers, initializer=_init_split_worker,
+                        initargs=(input_path, self.optimize_level))
+                    try:
+                        chunksize = max(1, len(jobs) // (workers * 4))
+                        results = executor.map(_write_split_chunk, *zip(*jobs), chunksize=chunksize)
+                        for (first, last, _), output_filename in zip(jobs, results):
+                            self._check_cancelled()
+                            self._count(pages=last - first + 1,
+                                        bytes_out=os.path.getsize(output_filename))
+                            self.reader_cache.invalidate(output_filename)
+                            self._update_status(f"  Saved: {output_filename}")
+                    finally:
+                        executor.shutdown(cancel_futures=True)
             self._update_status(
-                f"PDF split successfully into {num_pages} files in: {output_folder}")
+                f"PDF split successfully into {len(jobs)} files in: {output_folder}")
         except Exception as e:
             self._update_status(f"Error splitting PDF: {e}")
 
-    def rotate_pages(self, input_path, output_path, pages_to_rotate, rotation_angle):
-        """Rotates specified pages in a PDF file."""
+    def _split_chunks(self, reader, pages_per_file=1, max_bytes=None, ranges=None):
+        """Returns the (first, last) page ranges, 1-based, for split_pdf."""
+        num_pages = len(reader.pages)
+        if ranges:
+            return [resolve_page_range(first, last, num_pages) for first, last in ranges]
+        if max_bytes:
+            chunks = []
+            start, used, seen = 1, 0, set()
+            for page_num, page in enumerate(reader.pages, 1):
+                page_bytes, new = _reachable_bytes(page, seen)
+                if page_num > start and used + page_bytes > max_bytes:
+                    chunks.append((start, page_num - 1))
+                    start, used, seen = page_num, 0, set()
+                    page_bytes, new = _reachable_bytes(page, seen)
+                seen |= new
+                used += page_bytes
+            chunks.append((start, num_pages))
+            return chunks
+        if pages_per_file < 1:
+            raise ValueError("Pages per file must be at least 1.")
+        return [(first, min(first + pages_per_file - 1, num_pages))
+                for first in range(1, num_pages + 1, pages_per_file)]
+
+    def benchmark_split(self, input_path, workers=1, **chunking):
+        """
+        Times the original one-file-per-page serial split against split_pdf
+        with the given workers and chunking options (pages_per_file,
+        max_bytes or ranges). Output goes to temporary folders.
+
+        Returns:
+            dict: Seconds and number of files for "baseline" and "candidate".
+        """
+        results = {}
+        status_callback, result_cache = self.status_callback, self.result_cache
+        configs = (("baseline", {"workers": 1}),
+                   ("candidate", dict(chunking, workers=workers)))
+        for name, options in configs:
+            with tempfile.TemporaryDirectory() as output_folder:
+                self.status_callback = lambda message: None
+                self.result_cache = None  # Both runs must do the work
+                start = time.perf_counter()
+                try:
+                    self.split_pdf(input_path, output_folder, **options)
+                finally:
+                    self.status_callback, self.result_cache = status_callback, result_cache
+                results[name] = {"seconds": time.perf_counter() - start,
+                                 "files": len(os.listdir(output_folder))}
+            self._update_status(
+                f"{name}: {results[name]['files']} files in {results[name]['seconds']:.2f} s")
+        if results["candidate"]["seconds"]:
+            self._update_status(
+                f"Speedup: {results['baseline']['seconds'] / results['candidate']['seconds']:.2f}x")
+        return results
+
+    def _save_incremental(self, input_path, output_path, edit, *args):
+        """
+        Saves an edit as an incremental update (see _IncrementalPDFUpdate).
+        output_path starts as a clone of input_path; if both are the same
+        file the update is appended in place. edit(update, reader, *args)
+        writes the changed objects and returns how many pages it changed.
+        Nothing is saved when that is 0 or the edit fails.
+
+        Returns the number of changed pages.
+        """
+        previous_xref, xref_stream = _find_last_xref(input_path)
+        in_place = os.path.exists(output_path) and os.path.samefile(input_path, output_path)
+        original_size = os.path.getsize(input_path)
+        handle, reader = _open_merge_source(input_path)
+        changed = 0
+        saved = False
+        try:
+            if "/Encrypt" in reader.trailer:
+                raise ValueError("encrypted PDFs cannot be updated incrementally")
+            if not in_place:
+                _clone_file(input_path, output_path)
+            self._count(bytes_in=original_size)
+            try:
+                with self._phase("write"), open(output_path, 'ab') as output_pdf:
+                    update = _IncrementalPDFUpdate(output_pdf, reader, previous_xref, xref_stream)
+                    changed = edit(update, reader, *args)
+                    if changed:
+                        update.close()
+                        saved = True
+                        self._count(pages=changed, bytes_out=output_pdf.tell())
+            finally:
+                if not saved:
+                    if in_place:
+                        os.truncate(output_path, original_size)
+                    elif os.path.exists(output_path):
+                        os.remove(output_path)
+        finally:
+            handle.close()
+            self.reader_cache.invalidate(output_path)
+        return changed
+
+    def _rotate_incremental(self, update, reader, pages_to_rotate, rotation_angle):
+        pages_to_rotate = PageSelection.coerce(pages_to_rotate)
+        rotate_all = not pages_to_rotate
+        pages_to_rotate = pages_to_rotate.resolve(len(reader.pages))
+        rotated_count = 0
+        for i, page in enumerate(reader.pages):
+            self._check_cancelled()
+            if not rotate_all and (i + 1) not in pages_to_rotate:
+                continue
+            rotated = PyPDF2.generic.DictionaryObject(page)
+            rotation = int(page["/Rotate"]) if "/Rotate" in page else 0
+            rotated[PyPDF2.generic.NameObject("/Rotate")] = PyPDF2.generic.NumberObject(
+                (rotation + rotation_angle) % 360)
+            update.update_object(_page_reference(page), rotated)
+            rotated_count += 1
+            self._update_status(
+                f"  Page {i + 1} rotated by {rotation_angle} degrees.")
+        return rotated_count
+
+    def _remove_incremental(self, update, reader, pages_to_remove):
+        pages_to_remove = PageSelection.coerce(pages_to_remove).resolve(len(reader.pages))
+        removed = {}  # parent idnum -> (parent reference, removed page idnums)
+        count_changes = {}  # /Pages node idnum -> (reference, pages removed below it)
+        for i, page in enumerate(reader.pages):
+            self._check_cancelled()
+            if (i + 1) not in pages_to_remove:
+                continue
+            parent = page.raw_get("/Parent")
+            removed.setdefault(parent.idnum, (parent, set()))[1].add(
+                _page_reference(page).idnum)
+            while parent is not None:
+                reference, count = count_changes.get(parent.idnum, (parent, 0))
+                count_changes[parent.idnum] = (reference, count + 1)
+                node = parent.get_object()
+                parent = node.raw_get("/Parent") if "/Parent" in node else None
+            self._update_status(f"  Removed page {i + 1}.")
+
+        for idnum, (reference, count) in count_changes.items():
+            node = _editable_pages_node(reference)
+            node[PyPDF2.generic.NameObject("/Count")] = PyPDF2.generic.NumberObject(
+                node["/Count"] - count)
+            if idnum in removed:
+                page_ids = removed[idnum][1]
+                node[PyPDF2.generic.NameObject("/Kids")] = PyPDF2.generic.ArrayObject(
+                    kid for kid in node["/Kids"] if kid.idnum not in page_ids)
+            update.update_object(reference, node)
+        return sum(len(page_ids) for parent, page_ids in removed.values())
+
+    def _replace_incremental(self, update, reader, replacement_page, page_number):
+        num_pages = len(reader.pages)
+        if not 1 <= page_number <= num_pages:
+            raise ValueError(
+                f"Page number {page_number} is out of range (1-{num_pages}).")
+        page = reader.pages[page_number - 1]
+        old_id = _page_reference(page).idnum
+        parent = page.raw_get("/Parent")
+        new_page = update.import_page(replacement_page, parent)
+        node = _editable_pages_node(parent)
+        node[PyPDF2.generic.NameObject("/Kids")] = PyPDF2.generic.ArrayObject(
+            new_page if kid.idnum == old_id else kid for kid in node["/Kids"])
+        update.update_object(parent, node)
+        self._update_status(f"  Replaced page {page_number}.")
+        return 1
+
+    @_instrumented
+    @_cached_result(("input_path",), "output_path")
+    def rotate_pages(self, input_path, output_path, pages_to_rotate, rotation_angle,
+                     incremental=False):
+        """
+        Rotates specified pages in a PDF file. pages_to_rotate is a
+        PageSelection, its text form or a list of page numbers; an empty
+        selection rotates every page. With incremental=True only the
+        rotated pages are appended to a copy of the input (see
+        _save_incremental).
+        """
         if rotation_angle not in [90, 180, 270]:
             self._update_status(
                 "Error: Rotation angle must be 90, 180, or 270 degrees.")
             return
 
+        if incremental:
+            self._update_status(
+                f"Rotating pages in '{input_path}' (incremental update)...")
+            try:
+                if self._save_incremental(input_path, output_path, self._rotate_incremental,
+                                          pages_to_rotate, rotation_angle):
+                    self._update_status(
+                        f"Pages rotated successfully to: {output_path}")
+                else:
+                    self._update_status(
+                        "No pages were rotated. Output PDF not created.")
+            except Exception as e:
+                self._update_status(f"Error rotating pages: {e}")
+            return
+
         reader, writer = self._get_pdf_reader_writer(input_path)
         if not reader:
             return
@@ -98,23 +3018,31 @@ class PDFMaster:
         self._update_status(f"Rotating pages in '{input_path}'...")
 
         try:
+            pages_to_rotate = PageSelection.coerce(pages_to_rotate)
+            rotate_all = not pages_to_rotate
+            pages_to_rotate = pages_to_rotate.resolve(num_pages)
             for i in range(num_pages):
-                page = reader.pages[i]
-                if not pages_to_rotate or (i + 1) in pages_to_rotate:
+                self._check_cancelled()
+                # Rotate the writer's copy; the reader may be cached.
+                page = writer.add_page(reader.pages[i])
+                if rotate_all or (i + 1) in pages_to_rotate:
                     page.rotate(rotation_angle)
                     self._update_status(
                         f"  Page {i + 1} rotated by {rotation_angle} degrees.")
-                writer.add_page(page)
 
-            with open(output_path, 'wb') as output_pdf:
-                writer.write(output_pdf)
+            self._write_output(writer, output_path)
             self._update_status(
                 f"Pages rotated successfully to: {output_path}")
         except Exception as e:
             self._update_status(f"Error rotating pages: {e}")
 
+    @_instrumented
+    @_cached_result(("input_path",), "output_path")
     def extract_pages(self, input_path, output_path, page_numbers):
-        """Extracts specific pages from a PDF file into a new PDF."""
+        """
+        Extracts specific pages from a PDF file into a new PDF. page_numbers
+        is a PageSelection, its text form or a list of page numbers.
+        """
         reader, writer = self._get_pdf_reader_writer(input_path)
         if not reader:
             return
@@ -124,17 +3052,17 @@ class PDFMaster:
             f"Extracting pages {page_numbers} from '{input_path}'...")
 
         try:
-            for page_num in page_numbers:
-                if 1 <= page_num <= num_pages:
-                    writer.add_page(reader.pages[page_num - 1])
-                    self._update_status(f"  Added page {page_num}.")
-                else:
-                    self._update_status(
-                        f"Warning: Page {page_num} is out of range (1-{num_pages}). Skipping.")
+            page_numbers = PageSelection.coerce(page_numbers)
+            if page_numbers.out_of_range(num_pages):
+                self._update_status(
+                    f"Warning: Pages outside 1-{num_pages} are skipped.")
+            for page_num in page_numbers.resolve(num_pages):
+                self._check_cancelled()
+                writer.add_page(reader.pages[page_num - 1])
+                self._update_status(f"  Added page {page_num}.")
 
             if len(writer.pages) > 0:
-                with open(output_path, 'wb') as output_pdf:
-                    writer.write(output_pdf)
+                self._write_output(writer, output_path)
                 self._update_status(
                     f"Pages extracted successfully to: {output_path}")
             else:
@@ -143,6 +3071,8 @@ class PDFMaster:
         except Exception as e:
             self._update_status(f"Error extracting pages: {e}")
 
+    @_instrumented
+    @_cached_result(("main_pdf_path", "page_to_add_path"), "output_path")
     def add_page_from_pdf(self, main_pdf_path, page_to_add_path, output_path, insert_at_page_num):
         """Adds a page from another PDF into the main PDF at a specified position."""
         main_reader, main_writer = self._get_pdf_reader_writer(main_pdf_path)
@@ -165,6 +3095,7 @@ class PDFMaster:
 
         try:
             for i in range(num_main_pages):
+                self._check_cancelled()
                 if i == insert_at_page_num - 1:
                     main_writer.add_page(page_to_insert)
                     self._update_status(
@@ -176,14 +3107,39 @@ class PDFMaster:
                 self._update_status(
                     f"  Inserted new page at the end (position {num_main_pages + 1}).")
 
-            with open(output_path, 'wb') as output_pdf:
-                main_writer.write(output_pdf)
+            self._write_output(main_writer, output_path)
             self._update_status(f"Page added successfully to: {output_path}")
         except Exception as e:
             self._update_status(f"Error adding page: {e}")
 
-    def replace_page(self, main_pdf_path, page_to_replace_with_path, output_path, page_number_to_replace):
-        """Replaces a specific page in the main PDF with a page from another PDF."""
+    @_instrumented
+    @_cached_result(("main_pdf_path", "page_to_replace_with_path"), "output_path")
+    def replace_page(self, main_pdf_path, page_to_replace_with_path, output_path,
+                     page_number_to_replace, incremental=False):
+        """
+        Replaces a specific page in the main PDF with a page from another PDF.
+        With incremental=True only the new page and its parent node are
+        appended to a copy of the main PDF (see _save_incremental).
+        """
+        if incremental:
+            replace_reader, _ = self._get_pdf_reader_writer(page_to_replace_with_path)
+            if not replace_reader:
+                return
+            if not replace_reader.pages:
+                self._update_status(
+                    f"Error: No pages found in {page_to_replace_with_path}.")
+                return
+            self._update_status(
+                f"Replacing page {page_number_to_replace} in '{main_pdf_path}' (incremental update)...")
+            try:
+                self._save_incremental(main_pdf_path, output_path, self._replace_incremental,
+                                       replace_reader.pages[0], page_number_to_replace)
+                self._update_status(
+                    f"Page replaced successfully to: {output_path}")
+            except Exception as e:
+                self._update_status(f"Error replacing page: {e}")
+            return
+
         main_reader, main_writer = self._get_pdf_reader_writer(main_pdf_path)
         if not main_reader:
             return
@@ -210,6 +3166,7 @@ class PDFMaster:
 
         try:
             for i in range(num_main_pages):
+                self._check_cancelled()
                 if (i + 1) == page_number_to_replace:
                     main_writer.add_page(replacement_page)
                     self._update_status(
@@ -217,15 +3174,22 @@ class PDFMaster:
                 else:
                     main_writer.add_page(main_reader.pages[i])
 
-            with open(output_path, 'wb') as output_pdf:
-                main_writer.write(output_pdf)
+            self._write_output(main_writer, output_path)
             self._update_status(
                 f"Page replaced successfully to: {output_path}")
         except Exception as e:
             self._update_status(f"Error replacing page: {e}")
 
-    def extract_images(self, input_path, output_folder):
-        """Extracts images from a PDF file."""
+    @_instrumented
+    @_cached_result(("input_path",), "output_folder", folder=True, ignore=("workers",))
+    def extract_images(self, input_path, output_folder, deduplicate=False, workers=1):
+        """
+        Extracts images from a PDF file.
+
+        With deduplicate=True each distinct image is written only once, and
+        index.csv in the output folder maps every page's images to the files.
+        See _extract_unique_images.
+        """
         reader, _ = self._get_pdf_reader_writer(input_path)
         if not reader:
             return
@@ -235,24 +3199,32 @@ class PDFMaster:
         self._update_status(f"Extracting images from '{input_path}'...")
 
         try:
-            for page_num, page in enumerate(reader.pages):
-                for image_idx, image in enumerate(page.images):
-                    try:
-                        pil_image = Image.open(io.BytesIO(image.data))
-                        output_filename = os.path.join(
-                            output_folder, f"page_{page_num + 1}_img_{image_idx + 1}.{pil_image.format.lower()}")
-                        pil_image.save(output_filename)
-                        image_count += 1
-                        self._update_status(f"  Extracted: {output_filename}")
-                    except Exception as img_e:
-                        self._update_status(
-                            f"  Warning: Could not extract image {image_idx + 1} from page {page_num + 1}. Error: {img_e}")
-                        output_filename = os.path.join(
-                            output_folder, f"page_{page_num + 1}_img_{image_idx + 1}.raw")
-                        with open(output_filename, 'wb') as f:
-                            f.write(image.data)
-                        self._update_status(
-                            f"  Saved raw image data to: {output_filename}")
+            with self._phase("images"):
+                if deduplicate:
+                    self._extract_unique_images(reader, output_folder, workers)
+                    return
+                for page_num, page in enumerate(reader.pages):
+                    self._check_cancelled()
+                    self._count(pages=1)
+                    for image_idx, image in enumerate(page.images):
+                        try:
+                            pil_image = Image.open(io.BytesIO(image.data))
+                            output_filename = os.path.join(
+                                output_folder, f"page_{page_num + 1}_img_{image_idx + 1}.{pil_image.format.lower()}")
+                            pil_image.save(output_filename)
+                            self._count(bytes_out=os.path.getsize(output_filename))
+                            image_count += 1
+                            self._update_status(f"  Extracted: {output_filename}")
+                        except Exception as img_e:
+                            self._update_status(
+                                f"  Warning: Could not extract image {image_idx + 1} from page {page_num + 1}. Error: {img_e}")
+                            output_filename = os.path.join(
+                                output_folder, f"page_{page_num + 1}_img_{image_idx + 1}.raw")
+                            with open(output_filename, 'wb') as f:
+                                f.write(image.data)
+                            self._count(bytes_out=len(image.data))
+                            self._update_status(
+                                f"  Saved raw image data to: {output_filename}")
 
             if image_count > 0:
                 self._update_status(
@@ -263,8 +3235,203 @@ class PDFMaster:
         except Exception as e:
             self._update_status(f"Error extracting images: {e}")
 
-    def remove_pages(self, input_path, output_path, pages_to_remove):
-        """Removes specified pages from a PDF file."""
+    def _extract_unique_images(self, reader, output_folder, workers):
+        """
+        Writes every distinct image of reader once, as image_N.<ext>.
+
+        Images are identified by a SHA-256 of their encoded stream and
+        decoding parameters; an image object shared by many pages is hashed
+        only once. JPEG and JPEG 2000 streams are written without decoding.
+        Other images are decoded on a pool of `workers` threads, with at most
+        two images per worker in flight.
+        """
+        files = {}  # fingerprint -> output file name
+        fingerprints = {}  # (idnum, generation) -> fingerprint
+        index_rows = []  # (page number, image name, fingerprint)
+        pending = deque()
+
+        def finish(entry):
+            fingerprint, image, output_base, future = entry
+            try:
+                output_filename = future.result()
+            except Exception as img_e:
+                output_filename = output_base + ".raw"
+                with open(output_filename, 'wb') as f:
+                    f.write(image._data)
+                self._update_status(
+                    f"  Warning: Could not decode {os.path.basename(output_base)}. "
+                    f"Saved raw image data. Error: {img_e}")
+            files[fingerprint] = output_filename
+            self._count(bytes_out=os.path.getsize(output_filename))
+            self._update_status(f"  Extracted: {output_filename}")
+
+        executor = futures.ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            for page_num, page in enumerate(reader.pages, 1):
+                self._check_cancelled()
+                self._count(pages=1)
+                resources = page.get("/Resources")
+                xobjects = resources.get_object().get("/XObject") if resources else None
+                if not xobjects:
+                    continue
+                xobjects = xobjects.get_object()
+                for name in xobjects:
+                    image = xobjects[name].get_object()
+                    if image.get("/Subtype") != "/Image":
+                        continue
+                    reference = xobjects.raw_get(name)
+                    key = None
+                    if isinstance(reference, PyPDF2.generic.IndirectObject):
+                        key = (reference.idnum, reference.generation)
+                    fingerprint = fingerprints.get(key)
+                    if fingerprint is None:
+                        fingerprint = _image_fingerprint(image)
+                        if key:
+                            fingerprints[key] = fingerprint
+                    index_rows.append((page_num, name[1:], fingerprint))
+                    if fingerprint in files:
+                        continue
+
+                    output_base = os.path.join(output_folder, f"image_{len(files) + 1}")
+                    extension = _raw_image_extension(image)
+                    if extension:
+                        files[fingerprint] = output_base + extension
+                        with open(files[fingerprint], 'wb') as f:
+                            f.write(image._data)
+                        self._count(bytes_out=len(image._data))
+                        self._update_status(f"  Extracted: {files[fingerprint]}")
+                        continue
+                    files[fingerprint] = None  # Reserved until the worker is done
+                    pending.append((fingerprint, image, output_base, executor.submit(
+                        _save_image_xobject, image, output_base)))
+                    if len(pending) >= max(1, workers) * 2:
+                        finish(pending.popleft())
+            while pending:
+                self._check_cancelled()
+                finish(pending.popleft())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+        if not files:
+            self._update_status("No images found or extracted from the PDF.")
+            return
+        index_path = os.path.join(output_folder, "index.csv")
+        with open(index_path, 'w', newline='') as index_file:
+            index_writer = csv.writer(index_file)
+            index_writer.writerow(["page", "image", "file", "sha256"])
+            for page_num, name, fingerprint in index_rows:
+                index_writer.writerow(
+                    [page_num, name, os.path.basename(files[fingerprint]), fingerprint])
+        self._update_status(
+            f"Successfully extracted {len(files)} distinct images "
+            f"({len(index_rows)} on pages) to: {output_folder}. Index: {index_path}")
+
+    @_instrumented
+    @_cached_result(("input_path",), "output_path", ignore=("workers",))
+    def compress_images(self, input_path, output_path, target_dpi=150, jpeg_quality=75,
+                        workers=1):
+        """
+        Shrinks the images of a PDF: images above target_dpi are downsampled
+        and stored as JPEG at jpeg_quality, black-and-white images are stored
+        losslessly as CCITT Group 4 (see _recompress_image). An image shared
+        by many pages is re-encoded once. Images are re-encoded on a pool of
+        `workers` threads, with at most two images per worker in flight, and
+        replaced in the output's copy of the pages.
+        """
+        if target_dpi < 1 or not 1 <= jpeg_quality <= 95:
+            self._update_status(
+                "Error: Target DPI must be positive and JPEG quality between 1 and 95.")
+            return
+
+        reader, writer = self._get_pdf_reader_writer(input_path)
+        if not reader:
+            return
+
+        self._update_status(
+            f"Compressing images in '{input_path}' (target {target_dpi} DPI, "
+            f"JPEG quality {jpeg_quality})...")
+        try:
+            images = {}  # writer object number -> [image, longest page side in points]
+            with self._phase("scan"):
+                for page in reader.pages:
+                    self._check_cancelled()
+                    page = writer.add_page(page)
+                    page_side = float(max(page.mediabox.width, page.mediabox.height))
+                    for idnum, image in _image_xobjects(page.get("/Resources")):
+                        entry = images.setdefault(idnum, [image, page_side])
+                        entry[1] = max(entry[1], page_side)
+
+            replaced, size_before, size_after = 0, 0, 0
+            pending = deque()
+
+            def finish(idnum, image, future):
+                nonlocal replaced, size_before, size_after
+                try:
+                    result = future.result()
+                except Exception as img_e:
+                    self._update_status(
+                        f"  Warning: Could not re-encode image object {idnum}. Kept as is. "
+                        f"Error: {img_e}")
+                    return
+                if result is None:
+                    return
+                data, entries = result
+                self._update_status(
+                    f"  Image object {idnum}: {image['/Width']}x{image['/Height']} -> "
+                    f"{entries['/Width']}x{entries['/Height']} {entries['/Filter'][1:]}, "
+                    f"{len(image._data) / 1024:.0f} KB -> {len(data) / 1024:.0f} KB.")
+                replaced += 1
+                size_before += len(image._data)
+                size_after += len(data)
+                _replace_image_data(image, data, entries)
+
+            executor = futures.ThreadPoolExecutor(max_workers=max(1, workers))
+            with self._phase("images"):
+                try:
+                    for idnum, (image, page_side) in images.items():
+                        self._check_cancelled()
+                        pending.append((idnum, image, executor.submit(
+                            _recompress_image, image, page_side, target_dpi, jpeg_quality)))
+                        if len(pending) >= max(1, workers) * 2:
+                            finish(*pending.popleft())
+                    while pending:
+                        self._check_cancelled()
+                        finish(*pending.popleft())
+                finally:
+                    executor.shutdown(cancel_futures=True)
+
+            self._write_output(writer, output_path)
+            self._update_status(
+                f"Images compressed successfully to: {output_path} ({replaced} of "
+                f"{len(images)} images re-encoded, {size_before / 1024:.0f} KB -> "
+                f"{size_after / 1024:.0f} KB).")
+        except Exception as e:
+            self._update_status(f"Error compressing images: {e}")
+
+    @_instrumented
+    @_cached_result(("input_path",), "output_path")
+    def remove_pages(self, input_path, output_path, pages_to_remove, incremental=False):
+        """
+        Removes specified pages from a PDF file. pages_to_remove is a
+        PageSelection, its text form or a list of page numbers. With
+        incremental=True only the changed page tree nodes are appended to a
+        copy of the input (see _save_incremental).
+        """
+        if incremental:
+            self._update_status(
+                f"Removing pages {pages_to_remove} from '{input_path}' (incremental update)...")
+            try:
+                if self._save_incremental(input_path, output_path,
+                                          self._remove_incremental, pages_to_remove):
+                    self._update_status(
+                        f"Pages removed successfully to: {output_path}")
+                else:
+                    self._update_status(
+                        "No pages were removed. Output PDF not created.")
+            except Exception as e:
+                self._update_status(f"Error removing pages: {e}")
+            return
+
         reader, writer = self._get_pdf_reader_writer(input_path)
         if not reader:
             return
@@ -275,7 +3442,9 @@ class PDFMaster:
             f"Removing pages {pages_to_remove} from '{input_path}'...")
 
         try:
+            pages_to_remove = PageSelection.coerce(pages_to_remove).resolve(num_pages)
             for i in range(num_pages):
+                self._check_cancelled()
                 if (i + 1) not in pages_to_remove:
                     writer.add_page(reader.pages[i])
                 else:
@@ -283,8 +3452,7 @@ class PDFMaster:
                     self._update_status(f"  Removed page {i + 1}.")
 
             if pages_removed_count > 0:
-                with open(output_path, 'wb') as output_pdf:
-                    writer.write(output_pdf)
+                self._write_output(writer, output_path)
                 self._update_status(
                     f"Pages removed successfully to: {output_path}")
             else:
@@ -293,13 +3461,189 @@ class PDFMaster:
         except Exception as e:
             self._update_status(f"Error removing pages: {e}")
 
+    @_instrumented
+    @_cached_result(("steps",), "output_path")
+    def run_pipeline(self, steps, output_path):
+        """
+        Runs a chain of operations on page references in memory and writes
+        the result once, instead of writing and re-parsing a file per step.
+
+        Each step is a dict with an "op" key (see parse_pipeline for the text
+        form): {"op": "merge", "inputs": [...]}, {"op": "remove", "pages": [...]},
+        {"op": "rotate", "angle": 90, "pages": [...]}, {"op": "extract",
+        "pages": [...]}, {"op": "replace", "page": n, "source": path} and
+        {"op": "add", "page": n, "source": path}. "pages" may be a
+        PageSelection, its text form or a list of page numbers.
+        """
+        # Each entry is [page object from a (cached) reader, extra rotation].
+        # Rotation is applied to the writer's copies, never the reader's pages.
+        pages = []
+        self._update_status(f"Running pipeline with {len(steps)} step(s)...")
+        try:
+            for number, step in enumerate(steps, 1):
+                self._check_cancelled()
+                op = step["op"]
+                handler = getattr(self, f"_pipeline_{op}", None)
+                if handler is None:
+                    raise ValueError(f"Unknown pipeline operation '{op}'.")
+                pages = handler(pages, step)
+                self._update_status(
+                    f"  Step {number} ({op}): {len(pages)} page(s).")
+
+            if not pages:
+                self._update_status(
+                    "Pipeline produced no pages. Output PDF not created.")
+                return
+
+            writer = PyPDF2.PdfWriter()
+            for page, rotation in pages:
+                self._check_cancelled()
+                added = writer.add_page(page)
+                if rotation:
+                    added.rotate(rotation)
+            self._write_output(writer, output_path)
+            self._update_status(
+                f"Pipeline finished successfully. Output saved to: {output_path}")
+        except Exception as e:
+            self._update_status(f"Error running pipeline: {e}")
+
+    def _pipeline_source_page(self, path):
+        """Returns page 1 of path for the replace/add steps."""
+        reader = self._read_input(path)
+        if not reader.pages:
+            raise ValueError(f"No pages found in {path}.")
+        return reader.pages[0]
+
+    def _pipeline_merge(self, pages, step):
+        pages = list(pages)
+        for path in step["inputs"]:
+            if not os.path.exists(path):
+                self._update_status(
+                    f"Warning: Input file not found: {path}. Skipping.")
+                continue
+            pages.extend([page, 0] for page in self._read_input(path).pages)
+        return pages
+
+    def _pipeline_remove(self, pages, step):
+        remove = PageSelection.coerce(step["pages"]).resolve(len(pages))
+        return [entry for i, entry in enumerate(pages) if (i + 1) not in remove]
+
+    def _pipeline_rotate(self, pages, step):
+        angle = step["angle"]
+        if angle not in [90, 180, 270]:
+            raise ValueError("Rotation angle must be 90, 180, or 270 degrees.")
+        rotate = PageSelection.coerce(step.get("pages"))
+        rotate_all = not rotate
+        rotate = rotate.resolve(len(pages))
+        return [[page, (rotation + angle) % 360 if rotate_all or (i + 1) in rotate
+                 else rotation]
+                for i, (page, rotation) in enumerate(pages)]
+
+    def _pipeline_extract(self, pages, step):
+        selection = PageSelection.coerce(step["pages"])
+        if selection.out_of_range(len(pages)):
+            self._update_status(
+                f"Warning: Pages outside 1-{len(pages)} are skipped.")
+        return [list(pages[page_num - 1])
+                for page_num in selection.resolve(len(pages))]
+
+    def _pipeline_replace(self, pages, step):
+        page_num = step["page"]
+        if not 1 <= page_num <= len(pages):
+            raise ValueError(
+                f"Page number {page_num} is out of range (1-{len(pages)}).")
+        pages = list(pages)
+        pages[page_num - 1] = [self._pipeline_source_page(step["source"]), 0]
+        return pages
+
+    def _pipeline_add(self, pages, step):
+        pages = list(pages)
+        position = min(max(step["page"], 1), len(pages) + 1)
+        pages.insert(position - 1, [self._pipeline_source_page(step["source"]), 0])
+        return pages
+
+
+class JobEngine:
+    """
+    Runs PDFMaster operations on background threads so the GUI stays
+    responsive.
+
+    Each job gets its own PDFMaster with a cancel event; all jobs share one
+    PdfReaderCache. Status messages and job state changes are posted to the
+    thread-safe `events` queue as (kind, job_id, payload) tuples, where kind
+    is "status", "started" or "finished". The GUI drains the queue from the
+    Tk main thread with after(). Jobs submitted while optimize_level is set
+    write optimized output. A metrics_callback receives the metrics record
+    of every job (see PDFMaster); it is called from the worker threads.
+    Jobs share result_cache, a ResultCache, when one is given.
+    """
+
+    def __init__(self, max_workers=2, reader_cache=None, metrics_callback=None,
+                 result_cache=None):
+        self.reader_cache = reader_cache if reader_cache is not None else PdfReaderCache()
+        self.optimize_level = None
+        self.metrics_callback = metrics_callback
+        self.result_cache = result_cache
+        self.events = queue.Queue()
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._cancel_events = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, method_name, *args, **kwargs):
+        """Queues pdf_master.<method_name>(*args, **kwargs); returns the job id."""
+        job_id = next(self._job_ids)
+        cancel_event = threading.Event()
+        with self._lock:
+            self._cancel_events[job_id] = cancel_event
+        pdf_master = PDFMaster(lambda message: self.events.put(("status", job_id, message)),
+                               self.reader_cache, cancel_event, self.optimize_level,
+                               metrics_callback=self.metrics_callback,
+                               result_cache=self.result_cache)
+        self._executor.submit(self._run, job_id, pdf_master,
+                              getattr(pdf_master, method_name), args, kwargs)
+        return job_id
+
+    def _run(self, job_id, pdf_master, operation, args, kwargs):
+        state = "done"
+        self.events.put(("started", job_id, None))
+        try:
+            pdf_master._check_cancelled()
+            operation(*args, **kwargs)
+        except OperationCancelled:
+            state = "cancelled"
+        except Exception as e:
+            self.events.put(("status", job_id, f"Unexpected error: {e}"))
+            state = "failed"
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+            self.events.put(("finished", job_id, state))
+
+    def cancel(self, job_id=None):
+        """Cancels one job, or every active job if job_id is None."""
+        with self._lock:
+            events = (list(self._cancel_events.values()) if job_id is None
+                      else [self._cancel_events.get(job_id)])
+        for event in events:
+            if event is not None:
+                event.set()
+
+    def active_jobs(self):
+        with self._lock:
+            return len(self._cancel_events)
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
 
 class PDFMasterGUI:
     def __init__(self, master):
         self.master = master
         master.title("PDF Master")
         # Slightly increased height for better spacing
-        master.geometry("800x650")
+        master.geometry("800x760")
         master.grid_rowconfigure(0, weight=1)
         master.grid_columnconfigure(0, weight=1)
 
@@ -361,7 +3705,8 @@ class PDFMasterGUI:
                        background=[('selected', self.colors["accent_blue"])],
                        foreground=[('selected', self.colors["text_light"])])
 
-        self.pdf_master = PDFMaster(self.update_status)
+        self.job_engine = JobEngine()
+        self.job_labels = {}  # job_id -> label shown in the jobs list
 
         self.notebook = ttk.Notebook(master, style='TNotebook')
         self.notebook.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
@@ -373,6 +3718,7 @@ class PDFMasterGUI:
         self.create_rotate_pages_tab()
         self.create_add_replace_page_tab()
         self.create_extract_images_tab()
+        self.create_compress_images_tab()
 
         # Status Bar
         self.status_frame = ttk.LabelFrame(
@@ -390,6 +3736,37 @@ class PDFMasterGUI:
         self.status_text_scrollbar.grid(row=0, column=1, sticky="ns")
         self.status_text.config(yscrollcommand=self.status_text_scrollbar.set)
 
+        # Running Jobs
+        self.jobs_frame = ttk.LabelFrame(
+            master, text="Running Jobs", style='TFrame')
+        self.jobs_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=5)
+        self.jobs_frame.grid_columnconfigure(0, weight=1)
+
+        self.jobs_listbox = tk.Listbox(self.jobs_frame, height=3,
+                                       bg=self.colors["entry_bg"], fg=self.colors["text_dark"],
+                                       selectbackground=self.colors["accent_blue"],
+                                       selectforeground=self.colors["text_light"],
+                                       relief="flat", borderwidth=1)
+        self.jobs_listbox.grid(row=0, column=0, rowspan=2,
+                               sticky="ew", padx=5, pady=5)
+        ttk.Button(self.jobs_frame, text="Cancel Selected", command=self._cancel_selected_job).grid(
+            row=0, column=1, padx=5, pady=2, sticky="ew")
+        ttk.Button(self.jobs_frame, text="Cancel All", command=lambda: self.job_engine.cancel()).grid(
+            row=1, column=1, padx=5, pady=2, sticky="ew")
+
+        optimize_frame = ttk.Frame(self.jobs_frame)
+        optimize_frame.grid(row=2, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        self.optimize_output = tk.BooleanVar(value=False)
+        ttk.Checkbutton(optimize_frame, text="Optimize output (object streams, recompress)",
+                        variable=self.optimize_output).grid(row=0, column=0, sticky="w")
+        ttk.Label(optimize_frame, text="Level:").grid(row=0, column=1, padx=(10, 2))
+        self.optimize_level = tk.StringVar(value="6")
+        ttk.Combobox(optimize_frame, textvariable=self.optimize_level, width=3, state="readonly",
+                     values=[str(level) for level in range(1, 10)]).grid(row=0, column=2)
+
+        master.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.master.after(100, self._poll_jobs)
+
         self.update_status(
             "Welcome to PDF Master! Select an operation from the tabs above.")
 
@@ -407,6 +3784,58 @@ class PDFMasterGUI:
         self.status_text.delete(1.0, tk.END)
         self.status_text.config(state="disabled")
 
+    def _clear_status_if_idle(self):
+        """Clears the log before a new job unless other jobs are still logging."""
+        if not self.job_engine.active_jobs():
+            self.clear_status()
+
+    # --- Background Jobs ---
+    def _start_job(self, label, method_name, *args):
+        """Runs a PDFMaster operation on the job engine."""
+        self.job_engine.optimize_level = (int(self.optimize_level.get())
+                                          if self.optimize_output.get() else None)
+        job_id = self.job_engine.submit(method_name, *args)
+        self.job_labels[job_id] = f"#{job_id} {label}"
+        self.jobs_listbox.insert(tk.END, self.job_labels[job_id] + " (queued)")
+
+    def _poll_jobs(self):
+        """Drains job events on the Tk main thread; rescheduled with after()."""
+        for _ in range(500):  # Bounded so a chatty job cannot starve the GUI
+            try:
+                kind, job_id, payload = self.job_engine.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "status":
+                self.update_status(f"[#{job_id}] {payload}")
+            elif kind == "started":
+                self._set_job_row(job_id, self.job_labels[job_id] + " (running)")
+            elif kind == "finished":
+                if payload != "done":
+                    self.update_status(f"[#{job_id}] Job {payload}.")
+                self._set_job_row(job_id, None)
+                del self.job_labels[job_id]
+        self.master.after(100, self._poll_jobs)
+
+    def _set_job_row(self, job_id, text):
+        """Updates (or removes, if text is None) a job's row in the jobs list."""
+        prefix = self.job_labels[job_id]
+        for index, row in enumerate(self.jobs_listbox.get(0, tk.END)):
+            if row.startswith(prefix + " "):
+                self.jobs_listbox.delete(index)
+                if text is not None:
+                    self.jobs_listbox.insert(index, text)
+                break
+
+    def _cancel_selected_job(self):
+        for index in self.jobs_listbox.curselection():
+            job_id = int(self.jobs_listbox.get(index).split()[0][1:])
+            self.job_engine.cancel(job_id)
+            self.update_status(f"[#{job_id}] Cancelling...")
+
+    def _on_close(self):
+        self.job_engine.shutdown()
+        self.master.destroy()
+
     def _create_common_widgets(self, parent_frame, input_label_text="Input PDF:", output_label_text="Output PDF:",
                                show_pages_input=False, show_angle_input=False, show_source_page_input=False,
                                input_is_multiple=False, output_is_folder=False):
@@ -470,7 +3899,7 @@ class PDFMasterGUI:
             pages_frame.grid(row=row_idx, column=0,
                              columnspan=2, sticky="ew", pady=5, padx=5)
             pages_frame.grid_columnconfigure(1, weight=1)
-            ttk.Label(pages_frame, text="Page Numbers (e.g., 1,3,5-7):",
+            ttk.Label(pages_frame, text="Page Numbers (e.g., 1,3,5-7,10-,-1):",
                       style='TLabel').grid(row=0, column=0, padx=5, sticky="w")
             widgets['pages_entry'] = ttk.Entry(
                 pages_frame, width=60, style='TEntry')
@@ -544,27 +3973,21 @@ class PDFMasterGUI:
         listbox_widget.delete(0, tk.END)
         file_list_storage.clear()
 
+    def _add_incremental_option(self, tab, widgets, row_idx, text="Save as incremental update (fast for large files)"):
+        """Adds the incremental-save checkbox to a tab; returns the next row."""
+        widgets['incremental_var'] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tab, text=text, variable=widgets['incremental_var']).grid(
+            row=row_idx, column=0, padx=5, pady=5, sticky="w")
+        return row_idx + 1
+
     def _parse_pages(self, pages_str):
-        """Parses a comma-separated string of page numbers/ranges into a list of integers."""
-        if not pages_str:
-            return []
-        page_list = []
-        try:
-            parts = pages_str.split(',')
-            for part in parts:
-                part = part.strip()
-                if '-' in part:
-                    start, end = map(int, part.split('-'))
-                    if start > end:
-                        raise ValueError(
-                            "Start page cannot be greater than end page in a range.")
-                    page_list.extend(range(start, end + 1))
-                else:
-                    page_list.append(int(part))
-            return sorted(list(set(page_list)))  # Remove duplicates and sort
+        """Parses a comma-separated string of page numbers/ranges into a PageSelection."""
+        try:
+            return PageSelection.parse(pages_str)
         except ValueError as e:
             messagebox.showerror(
-                "Input Error", f"Invalid page number format: {e}. Please use formats like '1,3,5' or '2-5'.")
+                "Input Error", f"Invalid page number format: {e}. Please use formats like "
+                "'1,3,5', '2-5', '1-9:2', '10-' or '-1' (last page).")
             return None
 
     # --- Tab Creation Methods ---
@@ -577,12 +4000,23 @@ class PDFMasterGUI:
                                                        output_label_text="Merged Output PDF:",
                                                        input_is_multiple=True, output_is_folder=False)
 
+        widgets['deduplicate_var'] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tab, text="Store identical fonts and images only once",
+                        variable=widgets['deduplicate_var']).grid(
+            row=row_idx, column=0, padx=5, pady=5, sticky="w")
+        row_idx += 1
+        widgets['streaming_var'] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tab, text="Stream inputs (thousands of files, low memory)",
+                        variable=widgets['streaming_var']).grid(
+            row=row_idx, column=0, padx=5, pady=5, sticky="w")
+        row_idx += 1
+
         merge_button = ttk.Button(
             tab, text="Merge PDFs", command=lambda: self._execute_merge(widgets))
         merge_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_merge(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         input_paths = widgets['input_files']
         output_path = widgets['output_entry'].get()
 
@@ -594,7 +4028,8 @@ class PDFMasterGUI:
                 "Error: Please specify an output file for the merged PDF.")
             return
 
-        self.pdf_master.merge_pdfs(input_paths, output_path)
+        self._start_job("Merge", "merge_pdfs", list(input_paths), output_path,
+                        widgets['deduplicate_var'].get(), widgets['streaming_var'].get())
 
     def create_split_tab(self):
         tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
@@ -610,7 +4045,7 @@ class PDFMasterGUI:
         split_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_split(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         input_path = widgets['input_entry'].get()
         output_folder = widgets['output_entry'].get()
 
@@ -622,7 +4057,7 @@ class PDFMasterGUI:
                 "Error: Please select an output folder for split pages.")
             return
 
-        self.pdf_master.split_pdf(input_path, output_folder)
+        self._start_job("Split", "split_pdf", input_path, output_folder)
 
     def create_extract_pages_tab(self):
         tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
@@ -638,7 +4073,7 @@ class PDFMasterGUI:
         extract_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_extract_pages(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         input_path = widgets['input_entry'].get()
         output_path = widgets['output_entry'].get()
         pages_str = widgets['pages_entry'].get()
@@ -656,8 +4091,8 @@ class PDFMasterGUI:
             self.update_status("Error: Please enter page numbers to extract.")
             return
 
-        self.pdf_master.extract_pages(
-            input_path, output_path, pages_to_extract)
+        self._start_job("Extract Pages", "extract_pages",
+                        input_path, output_path, pages_to_extract)
 
     def create_remove_pages_tab(self):
         tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
@@ -667,13 +4102,14 @@ class PDFMasterGUI:
         widgets, row_idx = self._create_common_widgets(tab, input_label_text="Input PDF:",
                                                        output_label_text="Output PDF (Pages Removed):",
                                                        show_pages_input=True)
+        row_idx = self._add_incremental_option(tab, widgets, row_idx)
 
         remove_button = ttk.Button(
             tab, text="Remove Pages", command=lambda: self._execute_remove_pages(widgets))
         remove_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_remove_pages(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         input_path = widgets['input_entry'].get()
         output_path = widgets['output_entry'].get()
         pages_str = widgets['pages_entry'].get()
@@ -691,7 +4127,8 @@ class PDFMasterGUI:
             self.update_status("Error: Please enter page numbers to remove.")
             return
 
-        self.pdf_master.remove_pages(input_path, output_path, pages_to_remove)
+        self._start_job("Remove Pages", "remove_pages", input_path, output_path,
+                        pages_to_remove, widgets['incremental_var'].get())
 
     def create_rotate_pages_tab(self):
         tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
@@ -701,13 +4138,14 @@ class PDFMasterGUI:
         widgets, row_idx = self._create_common_widgets(tab, input_label_text="Input PDF:",
                                                        output_label_text="Output PDF (Pages Rotated):",
                                                        show_pages_input=True, show_angle_input=True)
+        row_idx = self._add_incremental_option(tab, widgets, row_idx)
 
         rotate_button = ttk.Button(
             tab, text="Rotate Pages", command=lambda: self._execute_rotate_pages(widgets))
         rotate_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_rotate_pages(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         input_path = widgets['input_entry'].get()
         output_path = widgets['output_entry'].get()
         pages_str = widgets['pages_entry'].get()
@@ -724,8 +4162,8 @@ class PDFMasterGUI:
             return
         # pages_to_rotate can be empty if all pages are to be rotated, so no check here.
 
-        self.pdf_master.rotate_pages(
-            input_path, output_path, pages_to_rotate, rotation_angle)
+        self._start_job("Rotate Pages", "rotate_pages", input_path, output_path,
+                        pages_to_rotate, rotation_angle, widgets['incremental_var'].get())
 
     def create_add_replace_page_tab(self):
         tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
@@ -760,13 +4198,15 @@ class PDFMasterGUI:
             target_page_frame, width=10, style='TEntry')
         widgets['target_page_entry'].grid(row=0, column=1, padx=5, sticky="w")
         row_idx += 1
+        row_idx = self._add_incremental_option(
+            tab, widgets, row_idx, "Replace as incremental update (fast for large files)")
 
         perform_button = ttk.Button(
             tab, text="Perform Action", command=lambda: self._execute_add_replace_page(widgets))
         perform_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_add_replace_page(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         main_pdf_path = widgets['input_entry'].get()
         source_page_path = widgets['source_page_entry'].get()
         output_path = widgets['output_entry'].get()
@@ -784,11 +4224,11 @@ class PDFMasterGUI:
             return
 
         if action_type == "add":
-            self.pdf_master.add_page_from_pdf(
-                main_pdf_path, source_page_path, output_path, target_page_num)
+            self._start_job("Add Page", "add_page_from_pdf",
+                            main_pdf_path, source_page_path, output_path, target_page_num)
         elif action_type == "replace":
-            self.pdf_master.replace_page(
-                main_pdf_path, source_page_path, output_path, target_page_num)
+            self._start_job("Replace Page", "replace_page", main_pdf_path, source_page_path,
+                            output_path, target_page_num, widgets['incremental_var'].get())
 
     def create_extract_images_tab(self):
         tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
@@ -799,12 +4239,18 @@ class PDFMasterGUI:
                                                        output_label_text="Output Folder for Images:",
                                                        input_is_multiple=False, output_is_folder=True)
 
+        widgets['deduplicate_var'] = tk.BooleanVar(value=True)
+        ttk.Checkbutton(tab, text="Write repeated images once (adds index.csv)",
+                        variable=widgets['deduplicate_var']).grid(
+            row=row_idx, column=0, padx=5, pady=5, sticky="w")
+        row_idx += 1
+
         extract_button = ttk.Button(
             tab, text="Extract Images", command=lambda: self._execute_extract_images(widgets))
         extract_button.grid(row=row_idx, column=0, pady=10)
 
     def _execute_extract_images(self, widgets):
-        self.clear_status()
+        self._clear_status_if_idle()
         input_path = widgets['input_entry'].get()
         output_folder = widgets['output_entry'].get()
 
@@ -816,14 +4262,476 @@ class PDFMasterGUI:
                 "Error: Please select an output folder for images.")
             return
 
-        self.pdf_master.extract_images(input_path, output_folder)
+        self._start_job("Extract Images", "extract_images", input_path, output_folder,
+                        widgets['deduplicate_var'].get(), os.cpu_count() or 1)
+
+    def create_compress_images_tab(self):
+        tab = ttk.Frame(self.notebook, padding="10", style='TFrame')
+        self.notebook.add(tab, text="Compress Images")
+        tab.grid_columnconfigure(0, weight=1)
+
+        widgets, row_idx = self._create_common_widgets(tab, input_label_text="Input PDF:",
+                                                       output_label_text="Output PDF (Images Compressed):")
+
+        settings_frame = ttk.Frame(tab, style='TFrame')
+        settings_frame.grid(row=row_idx, column=0, columnspan=2, sticky="w", pady=5, padx=5)
+        ttk.Label(settings_frame, text="Target DPI:", style='TLabel').grid(
+            row=0, column=0, padx=5, sticky="w")
+        widgets['dpi_var'] = tk.StringVar(value="150")
+        ttk.Combobox(settings_frame, textvariable=widgets['dpi_var'], width=6,
+                     values=["72", "96", "150", "200", "300"]).grid(row=0, column=1, padx=5)
+        ttk.Label(settings_frame, text="JPEG Quality (1-95):", style='TLabel').grid(
+            row=0, column=2, padx=5, sticky="w")
+        widgets['quality_var'] = tk.StringVar(value="75")
+        ttk.Combobox(settings_frame, textvariable=widgets['quality_var'], width=6,
+                     values=["50", "60", "75", "85", "95"]).grid(row=0, column=3, padx=5)
+        row_idx += 1
+
+        compress_button = ttk.Button(
+            tab, text="Compress Images", command=lambda: self._execute_compress_images(widgets))
+        compress_button.grid(row=row_idx, column=0, pady=10)
+
+    def _execute_compress_images(self, widgets):
+        self._clear_status_if_idle()
+        input_path = widgets['input_entry'].get()
+        output_path = widgets['output_entry'].get()
+
+        if not input_path:
+            self.update_status("Error: Please select an input PDF.")
+            return
+        if not output_path:
+            self.update_status("Error: Please specify an output file.")
+            return
+        try:
+            target_dpi = int(widgets['dpi_var'].get())
+            jpeg_quality = int(widgets['quality_var'].get())
+        except ValueError:
+            messagebox.showerror("Input Error", "Target DPI and JPEG quality must be whole numbers.")
+            return
+        if target_dpi < 1 or not 1 <= jpeg_quality <= 95:
+            messagebox.showerror("Input Error",
+                                 "Target DPI must be positive and JPEG quality between 1 and 95.")
+            return
+
+        self._start_job("Compress Images", "compress_images", input_path, output_path,
+                        target_dpi, jpeg_quality, os.cpu_count() or 1)
 
 
 def main():
+    _load_tkinter()
     root = tk.Tk()
     app = PDFMasterGUI(root)
     root.mainloop()
 
 
+# --- Command Line Interface (CLI) ---
+
+
+def _expand_inputs(items):
+    """
+    Expands CLI input arguments into file paths. Glob patterns expand to
+    their sorted matches, and @FILE reads a manifest with one path or
+    pattern per line (blank lines and lines starting with '#' are
+    skipped; relative entries are relative to the manifest). Raises
+    ValueError for an argument that matches no file.
+    """
+    paths = []
+    for item in items:
+        if item.startswith("@"):
+            manifest = item[1:]
+            with open(manifest) as f:
+                entries = [line.strip() for line in f]
+            base = os.path.dirname(manifest)
+            paths.extend(_expand_inputs(
+                os.path.join(base, entry) for entry in entries
+                if entry and not entry.startswith("#")))
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item))
+            if not matches:
+                raise ValueError(f"No files match '{item}'.")
+            paths.extend(matches)
+        else:
+            paths.append(item)
+    return paths
+
+
+def _page_selection_arg(text):
+    """argparse type that checks a page selection, keeping its text form."""
+    try:
+        PageSelection.parse(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+
+def _int_range_arg(minimum, maximum=None):
+    """Returns an argparse type for whole numbers from minimum to maximum."""
+    def parse(text):
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid whole number: {text!r}")
+        if value < minimum or (maximum is not None and value > maximum):
+            raise argparse.ArgumentTypeError(
+                f"{value} is not between {minimum} and {maximum}" if maximum is not None
+                else f"{value} is less than {minimum}")
+        return value
+    return parse
+
+
+class _CliStatus:
+    """
+    Status callback for CLI runs: prints each message, prefixed with the
+    input's name in batch runs, and records whether any reported an error.
+    """
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.failed = False
+
+    def __call__(self, message):
+        if message.startswith(("Error", "An unexpected error")):
+            self.failed = True
+        print(self.prefix + message, flush=True)
+
+
+def _run_cli_task(prefix, method_name, args, optimize_level, metrics_path=None,
+                  trace_memory=False, cache_dir=None, cache_size=None):
+    """
+    Runs one PDFMaster operation for the CLI; returns True on success.
+    With metrics_path its metrics record is appended there as JSON. With
+    cache_dir results are cached there, up to cache_size MB.
+    """
+    status = _CliStatus(prefix)
+    metrics = JsonLinesMetrics(metrics_path) if metrics_path else None
+    result_cache = ResultCache(cache_dir, cache_size * 1024 * 1024) if cache_dir else None
+    try:
+        pdf_master = PDFMaster(status, optimize_level=optimize_level,
+                               metrics_callback=metrics, trace_memory=trace_memory,
+                               result_cache=result_cache)
+        getattr(pdf_master, method_name)(*args)
+    finally:
+        if metrics:
+            metrics.close()
+    return not status.failed
+
+
+def _run_cli_tasks(tasks, jobs, *options):
+    """
+    Runs (input path, method name, args) tasks, on `jobs` processes when
+    there is more than one; returns the number of failed tasks. options are
+    passed on to _run_cli_task.
+    """
+    batch = len(tasks) > 1
+    prefixes = [f"[{os.path.basename(path)}] " if batch else "" for path, _, _ in tasks]
+    if jobs <= 1 or not batch:
+        return sum(not _run_cli_task(prefix, method_name, args, *options)
+                   for prefix, (path, method_name, args) in zip(prefixes, tasks))
+
+    failed = 0
+    executor = futures.ProcessPoolExecutor(max_workers=jobs)
+    try:
+        submitted = [executor.submit(_run_cli_task, prefix, method_name, args, *options)
+                     for prefix, (path, method_name, args) in zip(prefixes, tasks)]
+        for future in futures.as_completed(submitted):
+            try:
+                succeeded = future.result()
+            except Exception as e:
+                print(f"Error: A batch worker failed: {e}", flush=True)
+                succeeded = False
+            failed += not succeeded
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return failed
+
+
+def _batch_outputs(inputs, output, folders):
+    """
+    Maps each input to its output path. A single input writes to output
+    itself; several inputs write into the output directory, as files of
+    the same name or, with folders=True, as folders named after them.
+    """
+    if len(inputs) == 1:
+        return [output]
+    names = [os.path.basename(path) for path in inputs]
+    if folders:
+        names = [os.path.splitext(name)[0] for name in names]
+    if len(set(names)) != len(names):
+        raise ValueError("Several inputs have the same file name; "
+                         "their outputs would overwrite each other.")
+    os.makedirs(output, exist_ok=True)
+    return [os.path.join(output, name) for name in names]
+
+
+def main_cli(argv=None):
+    """Runs the command line interface; returns the process exit code."""
+    parser = argparse.ArgumentParser(
+        description="PDF Master command line interface.",
+        formatter_class=argparse.RawTextHelpFormatter,
+        epilog="INPUT arguments may be glob patterns (quote them) or @FILE manifests\n"
+               "listing one input per line. With several inputs, -o names a directory\n"
+               "that receives one output per input, and --jobs runs them in parallel."
+    )
+    parser.add_argument("--optimize", type=int, choices=range(1, 10), metavar="LEVEL",
+                        help="Write optimized output: object streams, an xref stream\n"
+                             "and streams recompressed at this Flate level (1-9).")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Input files processed in parallel (default: 1).")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Append a JSON line of timings, peak memory and bytes\n"
+                             "read/written per operation to FILE ('-' for stderr).")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record the peak of Python allocations in the\n"
+                             "metrics (slower).")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="Reuse results of earlier runs on identical inputs with\n"
+                             "the same options, and cache new results in DIR.")
+    parser.add_argument("--cache-size", type=int, default=1024, metavar="MB",
+                        help="Size limit of the --cache directory; the least recently\n"
+                             "used results are deleted beyond it (default: 1024).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser("merge", help="Merge PDFs into one file.")
+    merge_parser.add_argument("inputs", nargs='+', metavar="INPUT", help="PDFs to merge, in order.")
+    merge_parser.add_argument("-o", "--output", required=True, help="Output PDF file path.")
+    merge_parser.add_argument("--deduplicate", action="store_true",
+                              help="Store resources shared by the inputs only once.")
+    merge_parser.add_argument("--streaming", action="store_true",
+                              help="Write pages as each input is read (for thousands of inputs).")
+    merge_parser.add_argument("--max-open-files", type=int, default=8,
+                              help="Inputs open at once with --streaming (default: 8).")
+
+    pipeline_parser = subparsers.add_parser(
+        "pipeline", formatter_class=argparse.RawTextHelpFormatter,
+        help="Chain operations in memory and write the result once.",
+        description="Chain operations in memory and write the result once.\n\n"
+                    "Steps are separated by '|' (quote the whole pipeline):\n"
+                    "  merge FILE [FILE ...] | remove PAGES | rotate ANGLE [PAGES]\n"
+                    "  | extract PAGES | replace PAGE FILE | add POSITION FILE\n\n"
+                    "Example:\n"
+                    "  pipeline -o out.pdf \"merge a.pdf b.pdf | remove 3-4 | rotate 90 1\"")
+    pipeline_parser.add_argument("steps", nargs='+',
+                                 help="Pipeline steps.")
+    pipeline_parser.add_argument("-o", "--output", required=True,
+                                 help="Output PDF file path.")
+
+    split_parser = subparsers.add_parser(
+        "split", formatter_class=argparse.RawTextHelpFormatter,
+        help="Split a PDF into one file per page or into chunks.")
+    split_parser.add_argument("inputs", nargs='+', metavar="INPUT", help="Input PDF files.")
+    split_parser.add_argument("-o", "--output-folder", required=True,
+                              help="Folder for the split files.")
+    chunking = split_parser.add_mutually_exclusive_group()
+    chunking.add_argument("-n", "--pages-per-file", type=int, default=1,
+                          help="Pages per output file (default: 1).")
+    chunking.add_argument("--max-bytes", type=int,
+                          help="Approximate size budget per output file.")
+    chunking.add_argument("--ranges",
+                          help="Explicit page ranges, one file each (e.g., 1-10,11-25,26-).")
+    split_parser.add_argument("-w", "--workers", type=int, default=1,
+                              help="Processes used to write the files (default: 1).")
+    split_parser.add_argument("--benchmark", action="store_true",
+                              help="Time these options against the one-file-per-page\n"
+                                   "serial split instead of writing --output-folder.")
+
+    page_ops = {
+        "extract": ("Keep only the given pages.", "Pages to keep, e.g. 1,3-5."),
+        "remove": ("Remove pages.", "Pages to remove, e.g. 2,5-7."),
+        "rotate": ("Rotate pages.", "Pages to rotate (default: all pages)."),
+    }
+    for name, (help_text, pages_help) in page_ops.items():
+        page_parser = subparsers.add_parser(name, help=help_text)
+        page_parser.add_argument("inputs", nargs='+', metavar="INPUT", help="Input PDF files.")
+        page_parser.add_argument("-p", "--pages", type=_page_selection_arg,
+                                 required=name != "rotate", default="", help=pages_help)
+        page_parser.add_argument("-o", "--output", required=True, help="Output PDF file path.")
+        if name == "rotate":
+            page_parser.add_argument("-a", "--angle", type=int, required=True,
+                                     choices=[90, 180, 270], help="Rotation angle.")
+        if name != "extract":
+            page_parser.add_argument("--incremental", action="store_true",
+                                     help="Append the change to a copy of the input.")
+
+    for name, help_text, page_help in (
+            ("add", "Insert page 1 of a source PDF.", "Position of the new page (1-based)."),
+            ("replace", "Replace a page with page 1 of a source PDF.", "Page to replace.")):
+        page_parser = subparsers.add_parser(name, help=help_text)
+        page_parser.add_argument("inputs", nargs='+', metavar="INPUT", help="Input PDF files.")
+        page_parser.add_argument("-s", "--source", required=True, help="PDF providing the page.")
+        page_parser.add_argument("--page", type=int, required=True, help=page_help)
+        page_parser.add_argument("-o", "--output", required=True, help="Output PDF file path.")
+        if name == "replace":
+            page_parser.add_argument("--incremental", action="store_true",
+                                     help="Append the change to a copy of the input.")
+
+    images_parser = subparsers.add_parser("extract-images", help="Extract embedded images.")
+    images_parser.add_argument("inputs", nargs='+', metavar="INPUT", help="Input PDF files.")
+    images_parser.add_argument("-o", "--output-folder", required=True, help="Folder for the images.")
+    images_parser.add_argument("--deduplicate", action="store_true",
+                               help="Write repeated images once and add index.csv.")
+    images_parser.add_argument("-w", "--workers", type=int, default=1,
+                               help="Threads decoding images (default: 1).")
+
+    compress_parser = subparsers.add_parser("compress-images",
+                                            help="Downsample and re-encode embedded images.")
+    compress_parser.add_argument("inputs", nargs='+', metavar="INPUT", help="Input PDF files.")
+    compress_parser.add_argument("-o", "--output", required=True, help="Output PDF file path.")
+    compress_parser.add_argument("--dpi", type=_int_range_arg(1), default=150,
+                                 help="Target resolution (default: 150).")
+    compress_parser.add_argument("--quality", type=_int_range_arg(1, 95), default=75,
+                                 help="JPEG quality, 1-95 (default: 75).")
+    compress_parser.add_argument("-w", "--workers", type=int, default=1,
+                                 help="Threads re-encoding images (default: 1).")
+
+    scan_parser = subparsers.add_parser(
+        "scan", help="Write page counts and basic properties of many PDFs to CSV/JSONL.")
+    scan_parser.add_argument("inputs", nargs='+', metavar="INPUT",
+                             help="PDF files, or folders searched for .pdf files.")
+    scan_parser.add_argument("-o", "--output", required=True,
+                             help="Results file: JSON lines if it ends in .jsonl, else CSV.")
+    scan_parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                             help="Processes scanning files (default: one per CPU).")
+    scan_parser.add_argument("--no-images", action="store_true",
+                             help="Skip counting images (reads less of each file).")
+
+    index_parser = subparsers.add_parser(
+        "index", help="Add the text of PDFs to a full-text index (only changed files).")
+    index_parser.add_argument("inputs", nargs='+', metavar="INPUT",
+                              help="PDF files, or folders searched for .pdf files.")
+    index_parser.add_argument("--db", required=True, help="Index database file.")
+    index_parser.add_argument("-w", "--workers", type=int, default=1,
+                              help="Processes extracting text (default: 1).")
+    index_parser.add_argument("--keep-missing", action="store_true",
+                              help="Keep indexed files that no longer exist.")
+
+    find_duplicates_parser = subparsers.add_parser(
+        "find-duplicates", help="Report pages that repeat within or across PDFs.")
+    find_duplicates_parser.add_argument("inputs", nargs='+', metavar="INPUT",
+                                        help="PDFs to compare, in order.")
+    find_duplicates_parser.add_argument("--report",
+                                        help="CSV file listing each repeated page.")
+
+    remove_duplicates_parser = subparsers.add_parser(
+        "remove-duplicates", help="Remove pages that repeat an earlier page.")
+    remove_duplicates_parser.add_argument("inputs", nargs='+', metavar="INPUT",
+                                          help="Input PDF files.")
+    remove_duplicates_parser.add_argument("-o", "--output", required=True,
+                                          help="Output PDF file path.")
+    remove_duplicates_parser.add_argument("--across", action="store_true",
+                                          help="Also remove pages that appeared in an "
+                                               "earlier input.")
+
+    search_parser = subparsers.add_parser(
+        "search", help="Search a full-text index; prints matching pages.")
+    search_parser.add_argument("query", nargs='+',
+                               help='Words, "phrases", AND/OR/NOT or prefix* terms.')
+    search_parser.add_argument("--db", required=True, help="Index database file.")
+    search_parser.add_argument("-n", "--limit", type=int, default=20,
+                               help="Maximum number of pages listed (default: 20).")
+
+    args = parser.parse_args(argv)
+    options = (args.optimize, args.metrics, args.trace_memory, args.cache, args.cache_size)
+    if args.command == "merge":
+        try:
+            inputs = _expand_inputs(args.inputs)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return 0 if _run_cli_task("", "merge_pdfs", (
+            inputs, args.output, args.deduplicate, args.streaming, args.max_open_files),
+            *options) else 1
+    if args.command in ("find-duplicates", "remove-duplicates"):
+        try:
+            inputs = _expand_inputs(args.inputs)
+            if args.command == "find-duplicates":
+                task = ("find_duplicate_pages", (inputs, args.report))
+            else:
+                task = ("remove_duplicate_pages", (
+                    inputs, _batch_outputs(inputs, args.output, False), args.across))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return 0 if _run_cli_task("", *task, *options) else 1
+    if args.command == "search":
+        if not os.path.exists(args.db):
+            parser.error(f"No index at {args.db}.")
+        index = TextIndex(args.db)
+        try:
+            matches = index.search(" ".join(args.query), args.limit)
+        finally:
+            index.close()
+        for path, page_num, snippet in matches:
+            print(f"{path}:{page_num}: {' '.join(snippet.split())}")
+        if not matches:
+            print("No matching pages.")
+        return 0 if matches else 1
+    if args.command == "index":
+        try:
+            inputs = _expand_inputs(args.inputs)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return 0 if _run_cli_task("", "index_text", (
+            inputs, args.db, args.workers, not args.keep_missing), *options) else 1
+    if args.command == "scan":
+        try:
+            inputs = _expand_inputs(args.inputs)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        return 0 if _run_cli_task("", "scan_metadata", (
+            inputs, args.output, args.workers, not args.no_images), *options) else 1
+    if args.command == "pipeline":
+        try:
+            steps = parse_pipeline(" ".join(args.steps))
+        except ValueError as e:
+            parser.error(str(e))
+        return 0 if _run_cli_task("", "run_pipeline", (steps, args.output), *options) else 1
+
+    try:
+        inputs = _expand_inputs(args.inputs)
+        if args.command == "split":
+            try:
+                ranges = parse_page_ranges(args.ranges) if args.ranges else None
+            except ValueError as e:
+                parser.error(f"Invalid --ranges: {e}")
+            chunking = dict(pages_per_file=args.pages_per_file,
+                            max_bytes=args.max_bytes, ranges=ranges)
+            if args.benchmark:
+                pdf_master = PDFMaster(optimize_level=args.optimize)
+                for path in inputs:
+                    pdf_master.benchmark_split(path, args.workers, **chunking)
+                return 0
+        folders = args.command in ("split", "extract-images")
+        outputs = _batch_outputs(inputs, args.output_folder if folders else args.output, folders)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    tasks = []
+    for path, output in zip(inputs, outputs):
+        if args.command == "split":
+            task = ("split_pdf", (path, output, args.pages_per_file, args.max_bytes,
+                                  ranges, args.workers))
+        elif args.command == "extract":
+            task = ("extract_pages", (path, output, args.pages))
+        elif args.command == "remove":
+            task = ("remove_pages", (path, output, args.pages, args.incremental))
+        elif args.command == "rotate":
+            task = ("rotate_pages", (path, output, args.pages, args.angle, args.incremental))
+        elif args.command == "add":
+            task = ("add_page_from_pdf", (path, args.source, output, args.page))
+        elif args.command == "replace":
+            task = ("replace_page", (path, args.source, output, args.page, args.incremental))
+        elif args.command == "extract-images":
+            task = ("extract_images", (path, output, args.deduplicate, args.workers))
+        else:
+            task = ("compress_images", (path, output, args.dpi, args.quality, args.workers))
+        tasks.append((path,) + task)
+    failed = _run_cli_tasks(tasks, args.jobs, *options)
+    if len(tasks) > 1:
+        print(f"{len(tasks) - failed} of {len(tasks)} inputs processed successfully.")
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
-    main()
+    # Run the CLI when arguments are given, otherwise open the GUI.
+    if len(sys.argv) > 1:
+        sys.exit(main_cli())
+    else:
+        main()